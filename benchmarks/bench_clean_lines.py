@@ -0,0 +1,123 @@
+"""
+Line cleaning: separate clean_lines + remove_qna_pdf_lines passes vs the single-pass rule filter.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_clean_lines
+    python -m benchmarks.bench_clean_lines --lines 1000000
+
+Builds the extracted lines of a synthetic dump (text plus, per page, the
+vendor watermark, "Exam Dumps" and page number lines and a "Questions and
+Answers PDF" banner), then cleans them with the former two-pass code (kept
+here as the baseline), with filter_lines and with the streaming
+iter_filter_lines. Checks that all three agree and prints the timings.
+"""
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic_pdf import build_exam_lines
+from pdf_content_extraction import filter_lines, iter_filter_lines
+
+LINES_PER_PAGE = 60
+
+
+def legacy_is_integer(s: str) -> bool:
+    try:
+        return str(int(s)) == s
+    except ValueError:
+        return False
+
+
+def legacy_watermark_removals(lines: List[str], i: int) -> List[int]:
+    """The former watermark_removals, kept here as the baseline."""
+    line = lines[i]
+    if not (line.endswith(".COM") or "CERT MAGE" in line):
+        return []
+    n = len(lines)
+    to_remove = [i]
+    prev = lines[i - 1] if i - 1 >= 0 else ""
+    next_ = lines[i + 1] if i + 1 < n else ""
+    next2 = lines[i + 2] if i + 2 < n else ""
+
+    if legacy_is_integer(prev):
+        to_remove.extend(range(max(0, i - 3), i))
+    elif legacy_is_integer(next_):
+        if not legacy_is_integer(next2) and "Exam Dumps" not in next2:
+            to_remove.extend([i + 1, i + 2])
+        else:
+            to_remove.extend(range(i + 1, min(n, i + 4)))
+    elif "Exam Dumps" in prev:
+        to_remove.extend(range(max(0, i - 2), i))
+    elif "Exam Dumps" in next_:
+        to_remove.extend(range(i + 1, min(n, i + 3)))
+    return to_remove
+
+
+def legacy_clean_lines(lines: List[str]) -> List[str]:
+    """The former clean_lines, kept here as the baseline."""
+    to_remove = set()
+    for i in range(len(lines)):
+        to_remove.update(legacy_watermark_removals(lines, i))
+
+    return [line for idx, line in enumerate(lines) if idx not in to_remove]
+
+
+def legacy_remove_qna_pdf_lines(lines: List[str]) -> List[str]:
+    """The former remove_qna_pdf_lines, kept here as the baseline."""
+    result = []
+    skip_next = False
+    for line in lines:
+        if skip_next:
+            skip_next = False
+            continue
+        if "Questions and Answers PDF" in line:
+            skip_next = True
+            continue
+        result.append(line)
+    return result
+
+
+def build_lines(count: int) -> List[str]:
+    """About ``count`` extracted lines, with page furniture every LINES_PER_PAGE lines."""
+    text = build_exam_lines(questions=count // 8 + 1)
+    lines = []
+    for page, offset in enumerate(range(0, len(text), LINES_PER_PAGE), start=2):
+        lines.append("Microsoft Questions and Answers PDF")
+        lines.append(f"{page}/{len(text) // LINES_PER_PAGE + 2}")
+        lines.extend(text[offset:offset + LINES_PER_PAGE])
+        lines.extend(("CERT MAGE", "Exam Dumps", str(page)))
+        if len(lines) >= count:
+            break
+    return lines[:count]
+
+
+def run(count: int, repeat: int) -> None:
+    lines = build_lines(count)
+    variants: Dict[str, Callable[[List[str]], List[str]]] = {
+        "two passes": lambda lines: legacy_remove_qna_pdf_lines(legacy_clean_lines(lines)),
+        "filter_lines": filter_lines,
+        "streaming": lambda lines: list(iter_filter_lines(iter(lines))),
+    }
+
+    outputs = {}
+    print(f"{len(lines)} lines")
+    print(f"{'variant':>14} {'seconds':>9} {'ns/line':>9}")
+    for label, clean in variants.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[label] = clean(lines)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:>14} {best:>9.4f} {best / len(lines) * 1e9:>9.0f}")
+
+    baseline = outputs["two passes"]
+    assert all(output == baseline for output in outputs.values()), "outputs differ"
+    print(f"identical output, {len(lines) - len(baseline)} lines removed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-pass vs single-pass line cleaning")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.lines, args.repeat)
@@ -0,0 +1,126 @@
+"""
+Exact vs MinHash/LSH near-duplicate removal.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_dedup
+    python -m benchmarks.bench_dedup --sizes 5000 20000 40000 --threshold 0.8
+
+Builds synthetic topics where a share of the questions are re-worded copies
+of earlier ones (changed whitespace, punctuation, case, shuffled options or
+one replaced word). Reports how many copies each mode catches, checks the
+"similar" mode against a brute-force pairwise Jaccard pass on the smallest
+size, and times both modes as the question count grows: with LSH banding
+the time per question should stay roughly flat.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import random
+import time
+from typing import Dict, List, Set, Tuple
+
+from near_duplicates import jaccard, question_shingles
+from remove_duplicate_question import remove_duplicate_questions
+
+WORDS = ("data model cloud service network policy storage identity workload compute "
+         "secure deploy monitor region cost backup replica quota tenant gateway").split()
+
+
+def perturb(question: Dict, rng: random.Random) -> Dict:
+    """A copy of ``question`` with a small, dump-typical difference."""
+    copy_ = copy.deepcopy(question)
+    kind = rng.randrange(5)
+    if kind == 0:
+        copy_["question"] = "  " + copy_["question"].replace(" ", "  ") + " "
+    elif kind == 1:
+        copy_["question"] = copy_["question"].replace("?", " ?").replace(",", "")
+    elif kind == 2:
+        copy_["question"] = copy_["question"].upper()
+    elif kind == 3:
+        bodies = [option[3:] for option in copy_["options"]]
+        rng.shuffle(bodies)
+        copy_["options"] = [f"{'ABCDEFG'[i]}. {body}" for i, body in enumerate(bodies)]
+    else:
+        words = copy_["question"].split()
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+        copy_["question"] = " ".join(words)
+    return copy_
+
+
+def build_topics(questions: int, duplicate_share: float, seed: int = 0) -> Tuple[Dict, int]:
+    """Synthetic {"topics": ...} data and the number of planted near-duplicates."""
+    rng = random.Random(seed)
+    originals: List[Dict] = []
+    all_questions = []
+    planted = 0
+    for number in range(1, questions + 1):
+        if originals and rng.random() < duplicate_share:
+            question = perturb(rng.choice(originals), rng)
+            planted += 1
+        else:
+            question = {
+                "question": " ".join(rng.choice(WORDS) for _ in range(25)) + f" case {number}?",
+                "options": [f"{letter}. " + " ".join(rng.choice(WORDS) for _ in range(6))
+                            for letter in "ABCD"],
+                "answer": ["A"],
+                "explanation": "",
+            }
+            originals.append(question)
+        question = dict(question, question_number=str(number))
+        all_questions.append(question)
+
+    per_topic = 500
+    topics = {
+        f"topic{i // per_topic + 1}": {
+            "topic_name": f"Topic {i // per_topic + 1}",
+            "case_study": "",
+            "questions": all_questions[i:i + per_topic],
+        }
+        for i in range(0, len(all_questions), per_topic)
+    }
+    return {"topics": topics}, planted
+
+
+def brute_force_duplicates(data: Dict, threshold: float) -> Set[Tuple[str, str]]:
+    """(topic, question_number) of every question similar to an earlier kept one."""
+    kept = []
+    removed = set()
+    for topic_key, topic in data["topics"].items():
+        for question in topic["questions"]:
+            shingles = question_shingles(question)
+            if any(jaccard(shingles, other) >= threshold for other in kept):
+                removed.add((topic_key, question["question_number"]))
+            else:
+                kept.append(shingles)
+    return removed
+
+
+def run(sizes: List[int], threshold: float, duplicate_share: float) -> None:
+    print(f"{'questions':>10} {'planted':>8} {'mode':>8} {'removed':>8} {'seconds':>9} {'us/question':>12}")
+    for position, size in enumerate(sizes):
+        data, planted = build_topics(size, duplicate_share)
+        for mode in ("exact", "similar"):
+            working = copy.deepcopy(data)
+            duplicates: List[Dict] = []
+            start = time.perf_counter()
+            # remove_duplicate_questions logs every removal
+            with contextlib.redirect_stdout(io.StringIO()):
+                remove_duplicate_questions(working, mode, threshold, duplicates)
+            seconds = time.perf_counter() - start
+            print(f"{size:>10} {planted:>8} {mode:>8} {len(duplicates):>8} "
+                  f"{seconds:>9.3f} {seconds / size * 1e6:>12.1f}")
+            if mode == "similar" and position == 0:
+                expected = brute_force_duplicates(data, threshold)
+                found = {(record["topic"], record["question_number"]) for record in duplicates}
+                print(f"{'':>10} brute force: {len(expected)} duplicates, "
+                      f"LSH found {len(found & expected)}, extra {len(found - expected)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exact vs near-duplicate removal")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 5000, 10000, 20000])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--duplicate-share", type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.sizes, args.threshold, args.duplicate_share)
@@ -0,0 +1,102 @@
+"""
+Extraction latency and peak memory for images=full, refs and none.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_image_modes
+    python -m benchmarks.bench_image_modes --questions 2000 --image-size 800 --images-per-page 2
+
+Generates a synthetic dump with screenshot-sized images and runs
+parse_pdf_and_extract_images once per mode and repeat, each run in a fresh
+process so the reported peak RSS belongs to that mode alone. Checks that
+all modes give the same text lines and that "refs" places an image
+reference wherever "full" does, then prints the timings, peak RSS and the
+bytes each mode wrote to disk.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic_pdf import generate_exam_pdf
+from pdf_content_extraction import IMAGE_MODES, parse_pdf_and_extract_images
+
+IMAGE_PREFIX = "/images/"
+
+
+def _peak_rss_mib() -> float:
+    # VmHWM starts over with the process image; ru_maxrss (KiB on Linux)
+    # would carry over the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _directory_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def measure(pdf_path: str, img_dir: str, images: str) -> Tuple[List[str], Dict[str, float]]:
+    """Worker entry point: extract once in this (fresh) process."""
+    baseline = _peak_rss_mib()
+    start = time.perf_counter()
+    _, lines, _ = parse_pdf_and_extract_images(
+        pdf_path, img_dir, "", image_url_prefix=IMAGE_PREFIX, images=images)
+    return lines, {
+        "seconds": time.perf_counter() - start,
+        "peak_mib": _peak_rss_mib(),
+        "baseline_mib": baseline,
+        "written_mib": _directory_bytes(img_dir) / 2 ** 20,
+    }
+
+
+def run(questions: int, image_size: int, images_per_page: int, repeat: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "synthetic.pdf")
+        pages = generate_exam_pdf(
+            pdf_path, questions=questions, images_per_page=images_per_page, image_size=image_size)
+        print(f"{pages} pages, {questions} questions, {images_per_page} images of "
+              f"{image_size}x{image_size} px per page, PDF {os.path.getsize(pdf_path) / 2 ** 20:.1f} MiB")
+
+        outputs = {}
+        print(f"{'images':>7} {'seconds':>9} {'peak RSS MiB':>13} {'over baseline':>14} {'written MiB':>12}")
+        for mode in IMAGE_MODES:
+            best: Dict[str, float] = {}
+            for i in range(repeat):
+                img_dir = os.path.join(tmp, f"{mode}_{i}")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    lines, numbers = executor.submit(measure, pdf_path, img_dir, mode).result()
+                for name, value in numbers.items():
+                    best[name] = min(best.get(name, value), value)
+            outputs[mode] = lines
+            print(f"{mode:>7} {best['seconds']:>9.3f} {best['peak_mib']:>13.1f} "
+                  f"{best['peak_mib'] - best['baseline_mib']:>14.1f} {best['written_mib']:>12.1f}")
+
+        def text_of(lines: List[str]) -> List[str]:
+            return [line for line in lines if not line.startswith(IMAGE_PREFIX)]
+
+        def layout_of(lines: List[str]) -> List[str]:
+            return [IMAGE_PREFIX if line.startswith(IMAGE_PREFIX) else line for line in lines]
+
+        assert text_of(outputs["full"]) == text_of(outputs["refs"]) == outputs["none"], "text differs"
+        assert layout_of(outputs["full"]) == layout_of(outputs["refs"]), "image positions differ"
+        print("identical text, images referenced at the same positions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="images=full vs refs vs none")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--image-size", type=int, default=600)
+    parser.add_argument("--images-per-page", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.questions, args.image_size, args.images_per_page, args.repeat)
@@ -0,0 +1,102 @@
+"""
+Image URLs rewritten after parsing vs emitted at extraction time.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_image_refs
+    python -m benchmarks.bench_image_refs --questions 5000 --images-per-page 20
+
+Generates an image-heavy synthetic dump and runs extraction + parsing twice:
+once with "<img src='images/...'>" placeholders that are then replaced by a
+recursive walk over the parsed result (how the pipeline used to work), and
+once with ImageIndex writing the public URLs straight into the text. Checks
+that both give the same result and prints the timings.
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic_pdf import generate_exam_pdf
+from parse_pdf_into_json import process_content
+from pdf_content_extraction import parse_pdf_and_extract_images
+from pipeline import image_url_prefix
+from result_model import from_json, to_json
+
+DOCUMENT_NAME = "synthetic"
+
+
+def legacy_replace_img_paths(data: dict, images_list: list) -> dict:
+    """The former pipeline.replace_img_paths, kept here as the baseline."""
+    image_map = {}
+    for full_path in images_list:
+        image_map[os.path.basename(full_path)] = full_path
+
+    def process_item(item):
+        if isinstance(item, dict):
+            return {k: process_item(v) for k, v in item.items()}
+        elif isinstance(item, list):
+            return [process_item(i) for i in item]
+        elif isinstance(item, str):
+            for filename in re.findall(r"<img src='images/([^']+)'>", item):
+                if filename in image_map:
+                    item = item.replace(f"<img src='images/{filename}'>", image_map[filename])
+            return item
+        return item
+
+    return process_item(data)
+
+
+def run_once(pdf_path: str, img_dir: str, direct: bool) -> Tuple[Dict, List[str], Dict[str, float]]:
+    prefix = image_url_prefix(DOCUMENT_NAME)
+    timings = {}
+    start = time.perf_counter()
+    _, lines, images = parse_pdf_and_extract_images(
+        pdf_path, img_dir, "", image_url_prefix=prefix if direct else "")
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # As plain dicts, the only form the former rewrite walked
+    result = from_json(to_json(process_content("\n".join(lines))))
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    urls = [prefix + os.path.basename(image) for image in images]
+    if not direct:
+        result = legacy_replace_img_paths(result, urls)
+    timings["rewrite"] = time.perf_counter() - start
+    return result, urls, timings
+
+
+def run(questions: int, images_per_page: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "synthetic.pdf")
+        pages = generate_exam_pdf(pdf_path, questions=questions, images_per_page=images_per_page)
+        print(f"{pages} pages, {questions} questions, {images_per_page} images per page")
+
+        outputs = {}
+        print(f"{'mode':>12} {'extract':>9} {'parse':>9} {'rewrite':>9} {'total':>9}")
+        for label, direct in (("placeholder", False), ("direct url", True)):
+            best: Dict[str, float] = {}
+            for i in range(repeat):
+                result, urls, timings = run_once(pdf_path, os.path.join(tmp, f"{label}_{i}"), direct)
+                for stage, seconds in timings.items():
+                    best[stage] = min(best.get(stage, seconds), seconds)
+            outputs[label] = (result, urls)
+            print(f"{label:>12} {best['extract']:>9.3f} {best['parse']:>9.3f} "
+                  f"{best['rewrite']:>9.4f} {sum(best.values()):>9.3f}")
+
+        (before, before_urls), (after, after_urls) = outputs.values()
+        assert before == after, "results differ"
+        assert before_urls == after_urls, "image URLs differ"
+        print(f"identical output, {len(after_urls)} images")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Image URL rewriting vs direct URLs")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--images-per-page", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.questions, args.images_per_page, args.repeat)
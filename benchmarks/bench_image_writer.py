@@ -0,0 +1,77 @@
+"""
+Synchronous image writes vs the background ImageWriter.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_image_writer
+    python -m benchmarks.bench_image_writer --questions 2000 --images-per-page 8 --image-size 256
+
+Generates an image-heavy synthetic dump and extracts it with
+images=full, writing each image before moving on (write_threads=0) and
+with background writer threads, with and without temp-file-and-rename.
+Checks that the lines, image paths and written bytes are identical and
+prints the timings. Pass --fsync to sync each run's files before the
+clock stops, which makes the write cost visible on hosts where the page
+cache would otherwise absorb it.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_page_parallel import _read_images
+from benchmarks.synthetic_pdf import generate_exam_pdf
+from pdf_content_extraction import parse_pdf_and_extract_images
+
+
+def _sync_directory(directory: str) -> None:
+    for name in os.listdir(directory):
+        fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def run(questions: int, images_per_page: int, image_size: int, threads: int, repeat: int, fsync: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "synthetic.pdf")
+        pages = generate_exam_pdf(
+            pdf_path, questions=questions, images_per_page=images_per_page, image_size=image_size)
+        print(f"{pages} pages, {images_per_page} images of {image_size}px per page")
+
+        variants = (
+            ("synchronous", 0, False),
+            (f"{threads} threads", threads, False),
+            (f"{threads} threads, atomic", threads, True),
+        )
+        results = {}
+        for label, write_threads, atomic in variants:
+            best = float("inf")
+            for i in range(repeat):
+                img_dir = os.path.join(tmp, f"{write_threads}_{atomic}_{i}")
+                stats = {}
+                start = time.perf_counter()
+                _, lines, images = parse_pdf_and_extract_images(
+                    pdf_path, img_dir, "", stats=stats,
+                    write_threads=write_threads, atomic_writes=atomic)
+                if fsync:
+                    _sync_directory(img_dir)
+                best = min(best, time.perf_counter() - start)
+            results[label] = (lines, images, _read_images(img_dir))
+            print(f"{label:>20}: {best:.3f}s (best of {repeat}), {stats['images_written']} images written")
+
+        baseline = next(iter(results.values()))
+        assert all(result == baseline for result in results.values()), "outputs differ"
+        print("outputs identical")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronous vs background image writes")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--images-per-page", type=int, default=6)
+    parser.add_argument("--image-size", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fsync", action="store_true")
+    args = parser.parse_args()
+    run(args.questions, args.images_per_page, args.image_size, args.threads, args.repeat, args.fsync)
@@ -0,0 +1,106 @@
+"""
+Parser engine scaling, comparison and regression check.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --sizes 1000 4000 16000 64000 --engines linear
+
+First re-renders test_json.json as dump text and checks that the regex
+engine gives back exactly the stored topics. Then, per engine, times
+process_text on synthetic dumps of growing size (with a linear parser the
+time per question stays flat) and on malformed inputs that make
+backtracking patterns go superlinear, and reports whether the engines
+agree on the well-formed dumps.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.synthetic_pdf import build_exam_lines
+from parse_pdf_into_json import PARSER_ENGINES, TopicProcessor
+from result_model import from_json, to_json
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_json.json")
+
+
+def render_dump_text(topics: Dict) -> str:
+    """Render parsed topics back into the text layout the parser reads."""
+    lines: List[str] = []
+    for key, topic in topics.items():
+        if topic["topic_name"]:
+            lines.append(f"Topic {key[len('topic'):]}, {topic['topic_name']}")
+            if topic["case_study"]:
+                lines.append(topic["case_study"])
+        for question in topic["questions"]:
+            lines.append(f"Question: {question['question_number']}")
+            lines.append(question["question"])
+            lines.extend(question["options"])
+            lines.append("Answer: " + "".join(question["answer"]))
+            if question["explanation"]:
+                lines.append("Explanation: " + question["explanation"])
+    return "\n".join(lines)
+
+
+def check_fixture(processor: TopicProcessor) -> None:
+    with open(FIXTURE, encoding="utf-8") as f:
+        expected = json.load(f)["topics"]
+    parsed = from_json(to_json(processor.process_text(render_dump_text(expected))))
+    assert parsed == expected, "process_text output no longer matches test_json.json"
+    questions = sum(len(topic["questions"]) for topic in expected.values())
+    print(f"test_json.json: {len(expected)} topics, {questions} questions round-trip unchanged")
+
+
+# Malformed dumps: (name, builder taking a repetition count)
+MALFORMED_INPUTS = [
+    ("topic headers, no newlines", lambda n: "Topic 1, x " * n),
+    ("case study, no questions", lambda n: "Case Study: 1\ntitle\n" + "line\n" * n),
+    ("one question, run-on options", lambda n: "Question: 1\nstem\n" + "A. option text " * n + "\nAnswer: A"),
+]
+
+
+def best_time(processor: TopicProcessor, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processor.process_text(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_sizes(processors: Dict[str, TopicProcessor], sizes: List[int], repeat: int) -> None:
+    print(f"{'engine':>8} {'questions':>10} {'chars':>11} {'seconds':>9} {'us/question':>12}")
+    for size in sizes:
+        text = "\n".join(build_exam_lines(questions=size, topics=max(1, size // 100)))
+        outputs = []
+        for name, processor in processors.items():
+            seconds = best_time(processor, text, repeat)
+            outputs.append(processor.process_text(text))
+            print(f"{name:>8} {size:>10} {len(text):>11} {seconds:>9.3f} {seconds / size * 1e6:>12.1f}")
+        if len(outputs) > 1:
+            print(f"{'':>8} engines agree: {all(output == outputs[0] for output in outputs)}")
+
+
+def time_malformed(processors: Dict[str, TopicProcessor], counts: List[int]) -> None:
+    print(f"{'engine':>8} {'input':<30} {'count':>7} {'seconds':>9}")
+    for label, build in MALFORMED_INPUTS:
+        for count in counts:
+            text = build(count)
+            for name, processor in processors.items():
+                print(f"{name:>8} {label:<30} {count:>7} {best_time(processor, text, 1):>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="process_text scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000, 8000, 16000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", choices=sorted(PARSER_ENGINES),
+                        default=sorted(PARSER_ENGINES))
+    parser.add_argument("--malformed-counts", type=int, nargs="+", default=[1000, 2000, 4000])
+    args = parser.parse_args()
+
+    check_fixture(TopicProcessor())
+    processors = {name: PARSER_ENGINES[name]() for name in args.engines}
+    time_sizes(processors, args.sizes, args.repeat)
+    time_malformed(processors, args.malformed_counts)
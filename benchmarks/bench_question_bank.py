@@ -0,0 +1,82 @@
+"""
+Question bank lookup cost as the bank grows.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_question_bank
+    python -m benchmarks.bench_question_bank --sizes 100000 1000000 3000000
+
+Fills a temporary bank with random fingerprints up to each size, then
+times QuestionBank.annotate on a 1000-question document of which half is
+already in the bank. Per-question cost should stay flat as the bank grows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from question_bank import QuestionBank, question_fingerprint
+
+DOCUMENT_QUESTIONS = 1000
+FILL_BATCH = 50000
+
+
+def build_document(seed: int) -> Dict:
+    rng = random.Random(seed)
+    questions = [
+        {
+            "question_number": str(number),
+            "question": f"Synthetic question {seed}-{number} {rng.random()}",
+            "options": [f"{letter}. option {rng.random()}" for letter in "ABCD"],
+        }
+        for number in range(1, DOCUMENT_QUESTIONS + 1)
+    ]
+    return {"topic1": {"topic_name": "", "case_study": "", "questions": questions}}
+
+
+def fill(bank: QuestionBank, rows: int, rng: random.Random) -> None:
+    with bank._connect() as conn:
+        for start in range(0, rows, FILL_BATCH):
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (fingerprint, first_document, first_seen) "
+                "VALUES (?, 'filler', 0)",
+                [(rng.getrandbits(128).to_bytes(16, "little"),)
+                 for _ in range(min(FILL_BATCH, rows - start))],
+            )
+
+
+def run(sizes: List[int]) -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = QuestionBank(os.path.join(tmp, "questions.sqlite3"))
+        known = build_document(seed=-1)
+        bank.annotate(known, "known-document")
+
+        print(f"{'bank rows':>10} {'seconds':>9} {'us/question':>12} {'known':>6}")
+        rows = 0
+        for position, size in enumerate(sizes):
+            fill(bank, size - rows, rng)
+            rows = size
+            # Half already-known questions, half new ones
+            document = build_document(seed=position)
+            topic = document["topic1"]
+            topic["questions"] = known["topic1"]["questions"][:DOCUMENT_QUESTIONS // 2] \
+                + topic["questions"][:DOCUMENT_QUESTIONS // 2]
+            start = time.perf_counter()
+            stats = bank.annotate(document, f"document-{position}")
+            seconds = time.perf_counter() - start
+            print(f"{size:>10} {seconds:>9.3f} {seconds / DOCUMENT_QUESTIONS * 1e6:>12.1f} {stats['known']:>6}")
+
+        fingerprint_time = time.perf_counter()
+        for question in known["topic1"]["questions"]:
+            question_fingerprint(question)
+        print(f"fingerprinting alone: "
+              f"{(time.perf_counter() - fingerprint_time) / DOCUMENT_QUESTIONS * 1e6:.1f} us/question")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Question bank lookup scaling")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    run(args.sizes)
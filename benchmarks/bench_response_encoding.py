@@ -0,0 +1,103 @@
+"""
+Size and time of a /process-pdf/ response body, uncompressed vs gzip / zstd.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_response_encoding
+    python -m benchmarks.bench_response_encoding --scale 1 20 --repeat 50
+
+Wraps the parse result in test_json.json in a /process-pdf/ payload, with
+its topics copied ``--scale`` times (see build_payload) to stand in for a
+bigger dump, and times what payload_response does for each content
+coding: serializing the body (result_model.to_json, as PayloadResponse
+does), then compressing it (response_encoding.compress, at each level in
+--gzip-levels / --zstd-levels). Checks that every body decompresses back
+to the uncompressed one.
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+import zstandard
+
+import response_encoding
+from result_model import to_json
+
+FIXTURE = "test_json.json"
+
+
+def shuffled_words(text: str, rng: random.Random) -> str:
+    words = text.split(" ")
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def build_payload(result: Dict, scale: int) -> Dict:
+    """
+    A /process-pdf/ payload holding ``scale`` copies of the fixture's topics.
+
+    Every copy after the first has the words of each question, option and
+    explanation shuffled: the same vocabulary, but no long repeats, which
+    compressors with large windows would otherwise find between copies.
+    """
+    rng = random.Random(0)
+    topics = {}
+    for copy in range(scale):
+        for key, topic in result["topics"].items():
+            if copy:
+                topic = {**topic, "questions": [
+                    {
+                        **question,
+                        "question": shuffled_words(question["question"], rng),
+                        "options": [shuffled_words(option, rng) for option in question["options"]],
+                        "explanation": shuffled_words(question["explanation"], rng),
+                    }
+                    for question in topic["questions"]
+                ]}
+            topics[f"{key}_{copy}" if copy else key] = topic
+    return {"result": {"topics": topics}, "images": [], "image_stats": {}, "duplicates": []}
+
+
+def best_of(repeat: int, fn: Callable[[], bytes]) -> Tuple[float, bytes]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def run(scales: List[int], gzip_levels: List[int], zstd_levels: List[int], repeat: int) -> None:
+    with open(FIXTURE, encoding="utf-8") as f:
+        result = json.load(f)
+
+    for scale in scales:
+        payload = build_payload(result, scale)
+        serialize, body = best_of(repeat, lambda: to_json(payload))
+        print(f"scale {scale}: {sum(len(t['questions']) for t in payload['result']['topics'].values())} questions")
+        print(f"  {'encoding':<10} {'bytes':>10} {'ratio':>7} {'serialize':>10} {'compress':>10} {'total':>10}")
+        print(f"  {'identity':<10} {len(body):>10} {1:>7.2f} {serialize * 1000:>8.2f}ms "
+              f"{0:>8.2f}ms {serialize * 1000:>8.2f}ms")
+
+        variants = [("gzip", level) for level in gzip_levels] + [("zstd", level) for level in zstd_levels]
+        for encoding, level in variants:
+            setattr(response_encoding, f"{encoding.upper()}_LEVEL", level)
+            seconds, compressed = best_of(repeat, lambda: response_encoding.compress(body, encoding))
+            if encoding == "gzip":
+                assert gzip.decompress(compressed) == body
+            else:
+                assert zstandard.ZstdDecompressor().decompress(compressed) == body
+            print(f"  {f'{encoding}-{level}':<10} {len(compressed):>10} {len(body) / len(compressed):>7.2f} "
+                  f"{serialize * 1000:>8.2f}ms {seconds * 1000:>8.2f}ms {(serialize + seconds) * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response body size and time per content coding")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 4, 6, 9])
+    parser.add_argument("--zstd-levels", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.scale, args.gzip_levels, args.zstd_levels, args.repeat)
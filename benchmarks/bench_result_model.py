@@ -0,0 +1,123 @@
+"""
+Result size and serialization: question dicts + json vs slotted records + orjson.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_result_model
+    python -m benchmarks.bench_result_model --questions 50000
+
+Builds the text of a large synthetic dump, then runs what a /process-pdf/
+request does with it after extraction: parse, de-duplicate, send the
+payload from the worker to the API process (pickle), serialize it for the
+result cache and again for the response. Each variant runs in a fresh
+process so the reported peak RSS belongs to it alone. "dicts + json" is
+the former question dicts (kept here as the baseline) with json.dumps and
+.encode(), as ResultCache and JSONResponse used; "records + orjson" is the
+current Question / Topic records with result_model.to_json. Checks that
+both give byte-identical JSON and prints the timings, the size of the
+result cache entry and peak RSS.
+"""
+import argparse
+import json
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_image_modes import _peak_rss_mib
+from benchmarks.synthetic_pdf import build_exam_lines
+from parse_pdf_into_json import TopicProcessor
+from remove_duplicate_question import remove_duplicate_questions
+from result_model import to_json
+
+
+class LegacyTopicProcessor(TopicProcessor):
+    """TopicProcessor building the former topic and question dicts, kept here as the baseline."""
+
+    def process_text(self, text: str) -> Dict:
+        return {key: topic.as_dict() for key, topic in super().process_text(text).items()}
+
+    def assemble_question(
+        self,
+        question_number: str,
+        question_text: str,
+        options: List[str],
+        answer: List[str],
+        explanation: str
+    ) -> Dict:
+        rest_options, final_options = self.split_options(options)
+        if rest_options and final_options:
+            question_text = self.add_rest_to_question(question_text, rest_options)
+            rest_options = final_options
+        return {
+            "question_number": question_number,
+            "question": question_text,
+            "options": rest_options,
+            "answer": answer,
+            "explanation": explanation
+        }
+
+
+def measure(questions: int, legacy: bool) -> Tuple[bytes, Dict[str, float]]:
+    """Worker entry point: run one variant in this (fresh) process."""
+    text = "\n".join(build_exam_lines(questions=questions, topics=max(1, questions // 100)))
+    baseline = _peak_rss_mib()
+    timings = {}
+
+    start = time.perf_counter()
+    processor = LegacyTopicProcessor() if legacy else TopicProcessor()
+    result = remove_duplicate_questions({"topics": processor.process_text(text)})
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # The worker's tree is gone by the time the API process unpickles its copy
+    pickled = pickle.dumps({"result": result, "images": []})
+    del result
+    payload = pickle.loads(pickled)
+    del pickled
+    timings["transfer"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if legacy:
+        cached = json.dumps(payload, ensure_ascii=False)
+        size = len(cached.encode("utf-8"))
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        cached = to_json(payload)
+        size = len(cached)
+        body = to_json(payload)
+    timings["serialize"] = time.perf_counter() - start
+    # What the entry counts against RESULT_CACHE_MAX_BYTES
+    timings["cache_mib"] = size / 2 ** 20
+
+    timings["peak_mib"] = _peak_rss_mib() - baseline
+    return body, timings
+
+
+def run(questions: int, repeat: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    print(f"{questions} questions")
+    print(f"{'variant':>17} {'parse':>7} {'transfer':>9} {'serialize':>10} {'cache MiB':>10} {'peak RSS MiB':>13}")
+    bodies = {}
+    for label, legacy in (("dicts + json", True), ("records + orjson", False)):
+        best: Dict[str, float] = {}
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                body, numbers = executor.submit(measure, questions, legacy).result()
+            for name, value in numbers.items():
+                best[name] = min(best.get(name, value), value)
+        bodies[label] = body
+        print(f"{label:>17} {best['parse']:>7.3f} {best['transfer']:>9.3f} "
+              f"{best['serialize']:>10.3f} {best['cache_mib']:>10.1f} {best['peak_mib']:>13.1f}")
+
+    before, after = bodies.values()
+    assert before == after, "JSON differs"
+    print(f"identical JSON, {len(after) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Question dicts + json vs records + orjson")
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.questions, args.repeat)
@@ -0,0 +1,114 @@
+"""
+Search index latency against a linear scan of the same questions.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --questions 300000 --queries 500
+
+Indexes ``--questions`` synthetic questions (documents of 1000, words
+drawn from a Zipf-like vocabulary so some are everywhere and most are
+rare), then runs random one- or two-word queries through
+SearchIndex.search and through the lower-cased substring filter a client
+would run over the same questions, and prints p50 / p95 / max latency of
+each, split by how common the query words are.
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from search_index import SearchIndex
+
+DOCUMENT_QUESTIONS = 1000
+VOCABULARY = 20000
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+
+
+def build_document(rng: random.Random, vocabulary: List[str], cum_weights: List[float], start: int) -> Dict:
+    def text(words: int) -> str:
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    questions = [
+        {
+            "question_number": str(number),
+            "question": text(25) + "?",
+            "options": [f"{letter}. {text(5)}" for letter in "ABCD"],
+            "answer": [rng.choice("ABCD")],
+            "explanation": text(30) + ".",
+        }
+        for number in range(start, start + DOCUMENT_QUESTIONS)
+    ]
+    return {"topic1": {"topic_name": text(3), "case_study": "", "questions": questions}}
+
+
+def percentiles(timings: List[float]) -> str:
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+    return f"p50 {p50 * 1000:7.2f}ms  p95 {p95 * 1000:7.2f}ms  max {timings[-1] * 1000:7.2f}ms"
+
+
+def timed(queries: List[str], fn: Callable[[str], int]) -> List[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(questions: int, queries: int) -> None:
+    rng = random.Random(0)
+    vocabulary = list(dict.fromkeys(make_word(rng) for _ in range(VOCABULARY)))
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, "search.sqlite3"))
+        haystack: List[str] = []
+        start = time.perf_counter()
+        for position, first in enumerate(range(1, questions + 1, DOCUMENT_QUESTIONS)):
+            document = build_document(rng, vocabulary, cum_weights, first)
+            index.add_topics(document, f"document-{position}", f"dump-{position}")
+            haystack.extend(
+                " ".join([question["question"], *question["options"], question["explanation"]]).lower()
+                for question in document["topic1"]["questions"]
+            )
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(tmp, "search.sqlite3"))
+        print(f"indexed {len(haystack)} questions in {seconds:.1f}s "
+              f"({len(haystack) / seconds:.0f} questions/s, {size / 1024 / 1024:.0f} MiB)")
+
+        def linear(query: str) -> int:
+            words = query.lower().split()
+            return sum(1 for text in haystack if all(word in text for word in words))
+
+        def indexed(query: str) -> int:
+            return index.search(query, limit=20)["total"]
+
+        # Common words come from the head of the vocabulary, rare ones from the tail
+        mixes = {
+            "rare word": lambda: [rng.choice(vocabulary[1000:])],
+            "common + rare": lambda: [rng.choice(vocabulary[:50]), rng.choice(vocabulary[1000:])],
+            "common words": lambda: rng.sample(vocabulary[:50], rng.randint(1, 2)),
+        }
+        for label, pick in mixes.items():
+            sample = [" ".join(pick()) for _ in range(queries)]
+            results = [index.search(query, limit=20)["total"] for query in sample]
+            print(f"{label} (median {sorted(results)[len(results) // 2]} matches)")
+            print(f"  search index  {percentiles(timed(sample, indexed))}")
+            # The scan takes long enough that a tenth of the queries tells the story
+            print(f"  linear scan   {percentiles(timed(sample[:max(queries // 10, 1)], linear))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search index latency")
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.questions, args.queries)
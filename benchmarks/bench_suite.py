@@ -0,0 +1,221 @@
+"""
+Whole-pipeline benchmark suite with JSON results and a baseline check.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_suite --output baseline.json
+    python -m benchmarks.bench_suite --baseline baseline.json
+    python -m benchmarks.bench_suite --scenarios small medium --images full --repeat 5
+
+Generates one synthetic dump per scenario (topics, case studies, images
+and both watermark layouts), then times each stage on it separately:
+parse_pdf_and_extract_images (with its get_text / image_decode /
+image_write / clean breakdown from metrics.record), TopicProcessor.process_text,
+remove_duplicate_questions, and a POST /process-pdf/ through TestClient
+with the result cache turned off. Every stage reports the best of
+``--repeat`` runs. Results are written as JSON (--output); with
+--baseline, each stage is compared against the same stage of a stored
+result file and the exit status is 1 when any stage got slower than
+--tolerance allows.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from functools import partial
+from typing import Callable, Dict, List
+
+import fitz
+
+import metrics
+from benchmarks.synthetic_pdf import generate_exam_pdf
+from parse_pdf_into_json import TopicProcessor
+from pdf_content_extraction import IMAGE_MODES, parse_pdf_and_extract_images
+from pipeline import count_questions, document_image_prefix
+from remove_duplicate_question import remove_duplicate_questions
+
+# generate_exam_pdf arguments per scenario
+SCENARIOS: Dict[str, Dict] = {
+    "small": {"questions": 300, "topics": 3, "case_studies": 1, "images_every": 1,
+              "watermark_style": "mixed"},
+    "medium": {"questions": 2000, "topics": 10, "case_studies": 4, "images_every": 2,
+               "watermark_style": "mixed"},
+    "large": {"questions": 8000, "topics": 40, "case_studies": 10, "images_every": 4,
+              "images_per_page": 2, "watermark_style": "mixed"},
+}
+
+# Differences below this many seconds are noise, whatever the ratio
+NOISE_FLOOR = 0.002
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_stages(pdf_path: str, images: str, repeat: int, tmp: str) -> Dict:
+    """Time extraction, parsing and de-duplication of one PDF in this process."""
+    stages: Dict[str, float] = {}
+    with open(pdf_path, "rb") as f:
+        document_id = hashlib.sha256(f.read()).hexdigest()
+    image_dir = os.path.join(tmp, "images")
+
+    extract_best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        (_, lines, _), run = metrics.record(partial(
+            parse_pdf_and_extract_images, pdf_path, image_dir, "",
+            image_url_prefix=document_image_prefix(document_id), images=images))
+        seconds = time.perf_counter() - start
+        if seconds < extract_best:
+            extract_best = seconds
+            breakdown = run.get("stages", {})
+    stages["extract"] = extract_best
+    stages.update({f"extract.{name}": seconds for name, seconds in breakdown.items()})
+
+    text = "\n".join(lines)
+    processor = TopicProcessor()
+    stages["parse"] = best_of(repeat, lambda: processor.process_text(text))
+    topics = processor.process_text(text)
+
+    # remove_duplicate_questions edits the topics in place: time it on fresh copies
+    dedup_best = float("inf")
+    for _ in range(repeat):
+        copy = processor.process_text(text)
+        start = time.perf_counter()
+        remove_duplicate_questions({"topics": copy})
+        dedup_best = min(dedup_best, time.perf_counter() - start)
+    stages["dedup"] = dedup_best
+
+    return {"lines": len(lines), "questions": count_questions(topics), "stages": stages}
+
+
+def time_end_to_end(client, pdf_path: str, images: str, repeat: int) -> float:
+    with open(pdf_path, "rb") as f:
+        content = f.read()
+    upload_name = "bench_suite_" + os.path.basename(pdf_path)
+
+    def post() -> None:
+        response = client.post(
+            f"/process-pdf/?images={images}",
+            files={"file": (upload_name, content, "application/pdf")})
+        assert response.status_code == 200, response.text
+
+    try:
+        return best_of(repeat, post)
+    finally:
+        # The app writes images=full output under static/images/{upload name}
+        shutil.rmtree(os.path.join("static", "images", os.path.splitext(upload_name)[0]), ignore_errors=True)
+
+
+def app_client(tmp: str):
+    """A TestClient on the app, with the result cache off and its stores under ``tmp``."""
+    os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+    os.environ.setdefault("IMAGE_STORE_DIR", os.path.join(tmp, "image_store"))
+    os.environ.setdefault("JOB_STORE_PATH", os.path.join(tmp, "jobs.sqlite3"))
+    os.environ.setdefault("JOB_UPLOAD_DIR", os.path.join(tmp, "job_uploads"))
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(scenarios: List[str], images: str, repeat: int, end_to_end: bool) -> Dict:
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "images": images,
+        "repeat": repeat,
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        with app_client(tmp) if end_to_end else nullcontext() as client:
+            for name in scenarios:
+                params = SCENARIOS[name]
+                pdf_path = os.path.join(tmp, f"{name}.pdf")
+                pages = generate_exam_pdf(pdf_path, **params)
+                scenario = {"params": params, "pages": pages}
+                scenario.update(time_stages(pdf_path, images, repeat, tmp))
+                if client is not None:
+                    scenario["stages"]["end_to_end"] = time_end_to_end(client, pdf_path, images, repeat)
+                results["scenarios"][name] = scenario
+                print_scenario(name, scenario)
+    return results
+
+
+def print_scenario(name: str, scenario: Dict) -> None:
+    print(f"{name}: {scenario['pages']} pages, {scenario['lines']} lines, {scenario['questions']} questions")
+    for stage, seconds in scenario["stages"].items():
+        print(f"  {stage:<24} {seconds:>9.4f}s")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print each stage against the baseline; returns the stages that regressed."""
+    regressions = []
+    print(f"{'scenario':<8} {'stage':<24} {'baseline':>9} {'current':>9} {'change':>8}")
+    for name, scenario in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:<8} (not in baseline)")
+            continue
+        if before.get("params") != scenario["params"]:
+            print(f"{name:<8} (scenario changed since the baseline, skipped)")
+            continue
+        for stage, seconds in scenario["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None:
+                continue
+            change = (seconds - old) / old if old else 0.0
+            regressed = change > tolerance and seconds - old > NOISE_FLOOR
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<8} {stage:<24} {old:>9.4f} {seconds:>9.4f} {change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name}/{stage}")
+    if baseline.get("images") != results["images"]:
+        print(f"note: the baseline used images={baseline.get('images')}, this run images={results['images']}")
+    if baseline.get("environment") != results["environment"]:
+        print("note: the baseline was recorded in a different environment")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["small", "medium"])
+    parser.add_argument("--images", choices=IMAGE_MODES, default="refs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-end-to-end", action="store_true", help="skip the TestClient request")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="slowdown ratio above which a stage counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.scenarios, args.images, args.repeat, not args.no_end_to_end)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("no regressions")
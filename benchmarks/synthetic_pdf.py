@@ -0,0 +1,163 @@
+"""
+Synthetic exam-dump PDFs for benchmarks.
+
+The generated documents follow the layout the parser expects: a cover page,
+then "Topic N, name" and "Case Study: N" headers, "Question: N" blocks with
+lettered options, an "Answer:" line and an "Explanation:" paragraph, with
+vendor watermark lines ("CERT MAGE" or ".COM" footers with "Exam Dumps" and
+page numbers, "Questions and Answers PDF" banners) and small embedded images
+sprinkled in. Output is deterministic for a given set of arguments.
+"""
+import argparse
+import random
+from typing import List, Tuple
+
+import fitz
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+LINE_HEIGHT = 12
+TOP_MARGIN, BOTTOM_MARGIN = 50, 60
+WATERMARK_STYLES = ("cert-mage", "com", "mixed")
+
+
+def build_exam_lines(
+    questions: int = 300,
+    topics: int = 3,
+    options: int = 4,
+    seed: int = 0,
+    case_studies: int = 0
+) -> List[str]:
+    """
+    Build the text lines of a synthetic dump (without watermarks).
+
+    The questions are spread evenly over ``topics`` topics followed by
+    ``case_studies`` case studies, numbered after the topics so that every
+    section gets its own topicN key.
+    """
+    rng = random.Random(seed)
+    words = ("data model cloud service network policy storage identity "
+             "workload compute secure deploy monitor region cost").split()
+    sections = topics + case_studies
+    per_section = max(1, questions // max(sections, 1))
+    lines = []
+    for number in range(1, questions + 1):
+        section = (number - 1) // per_section
+        if sections and (number - 1) % per_section == 0 and section < sections:
+            section_number = section + 1
+            if section < topics:
+                lines.append(f"Topic {section_number}, Synthetic topic {section_number}")
+                lines.append(f"Background material for topic {section_number}.")
+            else:
+                lines.append(f"Case Study: {section_number}")
+                lines.append(f"Synthetic case study {section_number}")
+                lines.append("Overview. " + " ".join(rng.choice(words) for _ in range(12)) + ".")
+                lines.append("Requirements. " + " ".join(rng.choice(words) for _ in range(12)) + ".")
+        lines.append(f"Question: {number}")
+        lines.append(" ".join(rng.choice(words) for _ in range(12)) + f" scenario {number}?")
+        for letter in "ABCDEFG"[:options]:
+            lines.append(f"{letter}. " + " ".join(rng.choice(words) for _ in range(4)))
+        lines.append(f"Answer: {rng.choice('ABCDEFG'[:options])}")
+        lines.append("Explanation: " + " ".join(rng.choice(words) for _ in range(10)) + ".")
+    return lines
+
+
+def generate_exam_pdf(
+    path: str,
+    questions: int = 300,
+    topics: int = 3,
+    options: int = 4,
+    images_every: int = 1,
+    watermarks: bool = True,
+    seed: int = 0,
+    images_per_page: int = 1,
+    image_size: int = 32,
+    case_studies: int = 0,
+    watermark_style: str = "cert-mage"
+) -> int:
+    """
+    Write a synthetic exam PDF to ``path`` and return its page count.
+
+    Args:
+        path: Output PDF path
+        questions: Number of questions to generate
+        topics: Number of "Topic N," sections to spread the questions over
+        options: Options per question (at most 7, A-G)
+        images_every: Add one small image every N pages (0 = no images)
+        watermarks: Add vendor watermark lines to every page
+        seed: Random seed for the generated wording
+        images_per_page: Distinct images on each page that gets images
+        image_size: Width and height of each image in pixels (screenshots
+            in real dumps are hundreds of pixels wide)
+        case_studies: Number of "Case Study: N" sections after the topics
+        watermark_style: "cert-mage" ends each page with "CERT MAGE", "Exam
+            Dumps" and the page number; "com" opens it with a "Questions and
+            Answers PDF" banner and ends it with the page number, "Exam
+            Dumps" and a "WWW.CERTMAGE.COM" line; "mixed" alternates the two
+    """
+    if watermark_style not in WATERMARK_STYLES:
+        raise ValueError(f"watermark_style must be one of {', '.join(WATERMARK_STYLES)}")
+    lines = build_exam_lines(questions, topics, options, seed, case_studies)
+    doc = fitz.open()
+    doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT).insert_text((72, 72), "Cover page")
+
+    per_page = (PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT - 4
+    page_total = 1 + -(-len(lines) // per_page)
+    for page_number, offset in enumerate(range(0, len(lines), per_page), start=2):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        header, footer = _watermark_lines(watermark_style, page_number, page_total) if watermarks else ((), ())
+        y = TOP_MARGIN
+        for line in (*header, *lines[offset:offset + per_page], *footer):
+            page.insert_text((40, y), line, fontsize=9)
+            y += LINE_HEIGHT
+        if images_every and page_number % images_every == 0:
+            for image_number in range(images_per_page):
+                pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, image_size, image_size), False)
+                pix.clear_with((page_number * 37 + image_number * 101) % 256)
+                if image_number:
+                    # Keep images on the same page distinct (not de-duplicated)
+                    pix.set_pixel(image_number % 32, image_number // 32 % 32, (page_number % 256, 0, 0))
+                if image_size > 32:
+                    # Something to compress, like the text in a screenshot
+                    rng = random.Random(page_number * 1000 + image_number)
+                    for _ in range(image_size):
+                        pix.set_pixel(rng.randrange(image_size), rng.randrange(image_size), (0, 0, 0))
+                x = 480 - (image_number % 10) * 45
+                y_image = 760 - (image_number // 10) * 45
+                page.insert_image(fitz.Rect(x, y_image, x + 40, y_image + 40), pixmap=pix)
+
+    # Compressed streams, as in real dumps
+    doc.save(path, deflate=True)
+    page_count = len(doc)
+    doc.close()
+    return page_count
+
+
+def _watermark_lines(style: str, page_number: int, page_total: int) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Page furniture (header lines, footer lines) the cleaning rules should remove."""
+    if style == "com" or (style == "mixed" and page_number % 2):
+        return (
+            ("Microsoft Questions and Answers PDF", f"{page_number}/{page_total}"),
+            (str(page_number), "Exam Dumps", "WWW.CERTMAGE.COM"),
+        )
+    return (), ("CERT MAGE", "Exam Dumps", str(page_number))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--topics", type=int, default=3)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--images-every", type=int, default=1)
+    parser.add_argument("--no-watermarks", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images-per-page", type=int, default=1)
+    parser.add_argument("--image-size", type=int, default=32)
+    parser.add_argument("--case-studies", type=int, default=0)
+    parser.add_argument("--watermark-style", choices=WATERMARK_STYLES, default="cert-mage")
+    args = parser.parse_args()
+    pages = generate_exam_pdf(
+        args.path, args.questions, args.topics, args.options,
+        args.images_every, not args.no_watermarks, args.seed, args.images_per_page,
+        args.image_size, args.case_studies, args.watermark_style)
+    print(f"Wrote {pages} pages to {args.path}")
@@ -0,0 +1,216 @@
+import mimetypes
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Union
+
+from pdf_content_extraction import open_pdf
+
+
+class DocumentImageStore:
+    """
+    Uploaded PDFs kept by content hash, so their images can be extracted on demand.
+
+    The "refs" image mode writes no image files; it only records each
+    image's xref. ``retain`` keeps a copy of the PDF and ``image`` extracts
+    one image from it the first time it is asked for, then serves the
+    written file from then on. Files are written under a temporary name
+    and renamed into place, so concurrent requests never see a partial
+    file.
+
+    Retained PDFs and image files share one disk budget, tracked in SQLite
+    like ResultCache: every file records its size and last access, and the
+    least recently used ones are deleted once the total exceeds
+    ``max_bytes``. An evicted image is extracted again on its next request;
+    a document whose PDF was evicted is processed again on its next upload.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.pdf_dir = os.path.join(root, "pdfs")
+        self.image_dir = os.path.join(root, "images")
+        self.path = os.path.join(root, "index.sqlite3")
+        os.makedirs(self.pdf_dir, exist_ok=True)
+        os.makedirs(self.image_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access)")
+
+    @classmethod
+    def from_env(cls) -> "DocumentImageStore":
+        """
+        Build a store from the environment.
+
+        IMAGE_STORE_DIR: directory for retained PDFs and extracted images
+            (default: cache/image_store)
+        IMAGE_STORE_MAX_BYTES: disk budget for both (default: 2 GiB, 0 = unbounded)
+        """
+        return cls(
+            root=os.getenv("IMAGE_STORE_DIR", os.path.join("cache", "image_store")),
+            max_bytes=int(os.getenv("IMAGE_STORE_MAX_BYTES", 2 * 1024 * 1024 * 1024)),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def pdf_path(self, document_id: str) -> str:
+        return os.path.join(self.pdf_dir, f"{document_id}.pdf")
+
+    def document_image_dir(self, document_id: str) -> str:
+        """Where a document's images are written, on demand or by extraction itself."""
+        return os.path.join(self.image_dir, document_id)
+
+    def has(self, document_id: str) -> bool:
+        return os.path.exists(self.pdf_path(document_id))
+
+    def has_image(self, document_id: str, name: str) -> bool:
+        """Whether image ``name`` can still be served (see ``image``)."""
+        if name.isdigit():
+            return self.has(document_id)
+        return os.path.isfile(os.path.join(self.document_image_dir(document_id), os.path.basename(name)))
+
+    def retain(self, document_id: str, source: Union[str, bytes]) -> None:
+        """Keep a copy of the PDF at path ``source`` (or of its bytes) under ``document_id``."""
+        path = self.pdf_path(document_id)
+        if os.path.exists(path):
+            self._touch(path)
+            return
+        temp_path = self._temp_path(path)
+        if isinstance(source, str):
+            shutil.copyfile(source, temp_path)
+        else:
+            with open(temp_path, "wb") as f:
+                f.write(source)
+        os.replace(temp_path, path)
+        self._add(path)
+
+    def track_images(self, document_id: str) -> None:
+        """Put the images extraction wrote for ``document_id`` under the disk budget."""
+        directory = self.document_image_dir(document_id)
+        if not os.path.isdir(directory):
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO files (path, size, last_access) VALUES (?, ?, ?)",
+                [
+                    (os.path.join(directory, name), os.path.getsize(os.path.join(directory, name)), now)
+                    for name in os.listdir(directory) if not name.endswith(".tmp")
+                ],
+            )
+            self._evict(conn)
+
+    def image(self, document_id: str, name: str) -> Optional[Tuple[str, str]]:
+        """
+        Path and media type of image ``name`` of a retained PDF.
+
+        ``name`` is either an xref, extracted from the PDF on first use, or
+        the file name of an image extraction had to write (pages whose
+        images could not be tied to an xref).
+
+        Returns:
+            (file path, media type), or None if there is no such image
+        """
+        directory = self.document_image_dir(document_id)
+        if name.endswith(".tmp"):
+            return None
+        if not name.isdigit():
+            path = os.path.join(directory, os.path.basename(name))
+            if os.path.isfile(path):
+                self._touch(path)
+                return path, self.media_type(os.path.splitext(path)[1][1:])
+            return None
+        xref = int(name)
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                stem, ext = os.path.splitext(file_name)
+                if stem == name:
+                    path = os.path.join(directory, file_name)
+                    self._touch(path)
+                    return path, self.media_type(ext[1:])
+        if not self.has(document_id):
+            return None
+
+        pdf_path = self.pdf_path(document_id)
+        doc = open_pdf(pdf_path)
+        try:
+            if not 0 < xref < doc.xref_length():
+                return None
+            base_image = doc.extract_image(xref)
+        except Exception as e:
+            print(f"Error extracting image {xref} of {document_id}: {e}")
+            return None
+        finally:
+            doc.close()
+        if not base_image:
+            return None
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{xref}.{base_image['ext']}")
+        temp_path = self._temp_path(path)
+        with open(temp_path, "wb") as f:
+            f.write(base_image["image"])
+        os.replace(temp_path, path)
+        self._touch(pdf_path)
+        self._add(path)
+        return path, self.media_type(base_image["ext"])
+
+    @staticmethod
+    def media_type(ext: str) -> str:
+        return mimetypes.types_map.get(f".{ext}", "application/octet-stream")
+
+    @staticmethod
+    def _temp_path(path: str) -> str:
+        # Image requests run in the thread pool, so two threads of one
+        # process can write the same file at once
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _touch(self, path: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE files SET last_access = ? WHERE path = ?", (time.time(), path))
+
+    def _add(self, path: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, last_access) VALUES (?, ?, ?)",
+                (path, os.path.getsize(path), time.time()),
+            )
+            self._evict(conn, keep=path)
+
+    def _evict(self, conn: sqlite3.Connection, keep: Optional[str] = None) -> None:
+        if self.max_bytes <= 0:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for path, size in conn.execute(
+                "SELECT path, size FROM files ORDER BY last_access").fetchall():
+            if path == keep:
+                continue
+            conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,219 @@
+"""
+Offline bulk ingestion: run the pipeline over directories of PDFs and write JSONL.
+
+Usage (from the repository root):
+    python ingest.py dumps/ --output results.jsonl
+    python ingest.py "dumps/**/*.pdf" --output results.jsonl --workers 8 --images none
+
+Every PDF goes through the same run_pipeline the API uses (extraction,
+parsing, de-duplication and, with SEARCH_INDEX_PATH / QUESTION_BANK_PATH
+set, the search index / question bank), spread over a process pool. One
+JSON record is appended per document as soon as it finishes: {"type": "file", "path", "filename",
+"document_id", "pages", "seconds", ...the /process-pdf/ body}, or
+{"type": "file_error", "path", "filename", "error"}. Running the same
+command again skips the files the output already holds a "file" record
+for, so an interrupted backfill picks up where it stopped and failed
+files are retried.
+"""
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from image_store import DocumentImageStore
+from pdf_content_extraction import IMAGE_MODES, open_pdf
+from pipeline import run_pipeline
+from result_model import from_json, to_json
+
+
+def find_pdfs(inputs: List[str], recursive: bool = False) -> List[str]:
+    """
+    The PDFs named by ``inputs``: files, directories (their *.pdf files,
+    subdirectories too with ``recursive``) and glob patterns ("**" matches
+    any depth). Returned as sorted absolute paths, each once.
+    """
+    found: Set[str] = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.pdf") if recursive else os.path.join(item, "*.pdf")
+            matches = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(item):
+            matches = glob.glob(item, recursive=True)
+        else:
+            matches = [item]
+        found.update(
+            os.path.abspath(path) for path in matches
+            if os.path.isfile(path) and path.lower().endswith(".pdf")
+        )
+    return sorted(found)
+
+
+def name_clashes(paths: List[str]) -> List[List[str]]:
+    """
+    Groups of paths sharing a file name. With images=full each file's
+    images go to a directory named after it, so such files would
+    overwrite each other's images.
+    """
+    by_name: Dict[str, List[str]] = {}
+    for path in paths:
+        by_name.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+    return [group for group in by_name.values() if len(group) > 1]
+
+
+def completed_paths(output_path: str) -> Set[str]:
+    """Paths the JSONL output already holds a successful record for."""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = from_json(line)
+            except ValueError:
+                continue  # Cut short when an earlier run was killed mid-write
+            if isinstance(record, dict) and record.get("type") == "file":
+                done.add(record["path"])
+    return done
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest_file(path: str, image_root: str, images: str) -> Dict:
+    """
+    Worker entry point: run the pipeline on the PDF at ``path``.
+
+    Images go where the API would put them: static/images/<file name> (under
+    ``image_root``) for "full", the image store for "refs".
+    """
+    start = time.perf_counter()
+    filename = os.path.basename(path)
+    original_filename = os.path.splitext(filename)[0]
+    document_id = file_digest(path)
+
+    doc = open_pdf(path)
+    pages = len(doc)
+    doc.close()
+
+    image_store = DocumentImageStore.from_env() if images == "refs" else None
+    if image_store is not None:
+        image_store.retain(document_id, path)
+        pdf_image_dir = image_store.document_image_dir(document_id)
+    else:
+        pdf_image_dir = os.path.join(image_root, original_filename)
+        if images == "full" and os.path.exists(pdf_image_dir):
+            shutil.rmtree(pdf_image_dir)
+    os.makedirs(pdf_image_dir, exist_ok=True)
+
+    payload = run_pipeline(path, pdf_image_dir, original_filename, None, document_id, False, images)
+    if image_store is not None and payload["image_stats"].get("images_written"):
+        image_store.track_images(document_id)
+
+    return {
+        "type": "file",
+        "path": path,
+        "filename": filename,
+        "document_id": document_id,
+        "pages": pages,
+        "seconds": round(time.perf_counter() - start, 3),
+        **payload,
+    }
+
+
+def run_files(paths: List[str], workers: int, image_root: str, images: str) -> Iterator[Tuple[str, object]]:
+    """
+    Yield (path, record or exception) per file, in completion order.
+
+    At most two files per worker are submitted ahead, so a directory of
+    thousands of PDFs does not queue thousands of futures up front.
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        remaining = iter(paths)
+        pending = {}
+        for path in remaining:
+            pending[executor.submit(ingest_file, path, image_root, images)] = path
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                yield path, future.exception() or future.result()
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    pending[executor.submit(ingest_file, next_path, image_root, images)] = next_path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the PDF pipeline over many files and write JSONL")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file records are appended to")
+    parser.add_argument("-r", "--recursive", action="store_true", help="descend into subdirectories")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--images", choices=IMAGE_MODES, default=os.getenv("PDF_IMAGE_MODE", "refs"),
+                        help="image mode, as for /process-pdf/ (default: PDF_IMAGE_MODE or refs)")
+    parser.add_argument("--image-dir", default=os.path.join("static", "images"),
+                        help="where images=full writes each file's images (default: static/images)")
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.inputs, args.recursive)
+    clashes = name_clashes(paths) if args.images == "full" else []
+    if clashes:
+        parser.error(
+            "with --images full, PDFs need distinct file names (their images go to --image-dir/<name>/): "
+            + "; ".join(", ".join(group) for group in clashes))
+    done = completed_paths(args.output)
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already in {args.output}, {len(todo)} to process")
+    if not todo:
+        return 0
+
+    with open(args.output, "ab") as output:
+        if output.tell() and not _ends_with_newline(args.output):
+            output.write(b"\n")  # Start after a record an earlier run did not finish
+        start = time.perf_counter()
+        pages = failed = 0
+        for count, (path, outcome) in enumerate(run_files(todo, max(args.workers, 1), args.image_dir, args.images), 1):
+            if isinstance(outcome, Exception):
+                failed += 1
+                record = {"type": "file_error", "path": path, "filename": os.path.basename(path),
+                          "error": f"{type(outcome).__name__}: {outcome}"}
+                status = f"failed: {record['error']}"
+            else:
+                record = outcome
+                pages += record["pages"]
+                status = f"{record['pages']} pages in {record['seconds']:.1f}s"
+            output.write(to_json(record) + b"\n")
+            output.flush()
+            elapsed = time.perf_counter() - start
+            print(f"[{count}/{len(todo)}] {path}: {status} ({pages / elapsed:.1f} pages/s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(todo) - failed} files, {pages} pages in {elapsed:.1f}s "
+          f"({pages / elapsed:.1f} pages/s, {(len(todo) - failed) / elapsed:.2f} files/s), {failed} failed")
+    return 1 if failed else 0
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
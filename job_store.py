@@ -0,0 +1,241 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from result_model import from_json, to_json
+from upload import SpooledPDF
+
+
+def job_owner() -> str:
+    """Identifies the process that is running a job, see JobStore.recover()."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobStore:
+    """
+    SQLite-backed records for background /jobs, plus the uploaded PDFs they read.
+
+    A job goes queued -> running -> done | failed. Its progress is a small
+    JSON object (current stage plus counters) that worker processes update
+    in place; like ResultCache, a connection is opened per call so the
+    store can be shared between the API process and the worker pool.
+    Uploads are kept on disk until the job finishes, so jobs interrupted by
+    a restart can be run again.
+    """
+
+    def __init__(self, path: str, upload_dir: str, retention_seconds: int):
+        self.path = path
+        self.upload_dir = upload_dir
+        self.retention_seconds = retention_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(upload_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        """
+        Build a store from the environment.
+
+        JOB_STORE_PATH: SQLite file (default: cache/jobs.sqlite3)
+        JOB_UPLOAD_DIR: where queued PDFs are kept (default: cache/job_uploads)
+        JOB_RETENTION_SECONDS: how long finished jobs are kept (default: 7 days)
+        """
+        return cls(
+            path=os.getenv("JOB_STORE_PATH", os.path.join("cache", "jobs.sqlite3")),
+            upload_dir=os.getenv("JOB_UPLOAD_DIR", os.path.join("cache", "job_uploads")),
+            retention_seconds=int(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600)),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upload_path(self, job_id: str) -> str:
+        """Where the PDF of ``job_id`` is kept while the job is pending."""
+        return os.path.join(self.upload_dir, f"{job_id}.pdf")
+
+    def create(self, filename: str, upload: SpooledPDF) -> str:
+        """Keep ``upload`` on disk, record a new queued job for it and return its id."""
+        job_id = uuid.uuid4().hex
+        # The file is in place before the row exists, so a job is never
+        # visible to another process without its PDF
+        upload.save_to(self.upload_path(job_id))
+        content_hash = upload.content_hash
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, filename, content_hash, status, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, filename, content_hash, json.dumps({"stage": "queued"}), now, now),
+            )
+        return job_id
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job as running in this process; False if someone else has it."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, progress = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (job_owner(), json.dumps({"stage": "waiting"}), time.time(), job_id),
+            )
+            return cursor.rowcount == 1
+
+    def set_progress(self, job_id: str, progress: Dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, result: Dict, **counters: int) -> None:
+        """Store the final payload, add ``counters`` to the progress and drop the upload."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            progress = json.loads(row[0]) if row is not None else {}
+            progress.update(counters, stage="done")
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, progress = ?, updated_at = ? "
+                "WHERE id = ?",
+                (to_json(result), json.dumps(progress), time.time(), job_id),
+            )
+        self._remove_upload(job_id)
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Record why a job failed and drop its upload."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+        self._remove_upload(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the public view of a job, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, filename, status, progress, result, error, created_at, updated_at, content_hash "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "filename": row[1],
+            "status": row[2],
+            "progress": json.loads(row[3]),
+            "result": from_json(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+            "document_id": row[8],
+        }
+
+    def recover(self) -> List[Dict]:
+        """
+        Requeue jobs orphaned by a restart and return every queued job.
+
+        A running job is orphaned when its owner process no longer exists on
+        this host, or when it carries this process's own pid (containers
+        restart with the same pid) - this is only called at startup, before
+        this process has claimed anything. Finished jobs older than the
+        retention period are purged on the way.
+        """
+        host, pid = job_owner().rsplit(":", 1)
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - self.retention_seconds,),
+            )]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+
+            for job_id, owner in conn.execute(
+                    "SELECT id, owner FROM jobs WHERE status = 'running'").fetchall():
+                owner_host, _, owner_pid = (owner or "").rpartition(":")
+                if owner_host == host and (owner_pid == pid or not _pid_alive(int(owner_pid))):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', owner = NULL, progress = ?, updated_at = ? "
+                        "WHERE id = ?",
+                        (json.dumps({"stage": "queued"}), time.time(), job_id),
+                    )
+            queued = conn.execute(
+                "SELECT id, filename, content_hash FROM jobs WHERE status = 'queued' "
+                "ORDER BY created_at").fetchall()
+
+        for job_id in expired:
+            self._remove_upload(job_id)
+        return [
+            {"job_id": job_id, "filename": filename, "content_hash": content_hash}
+            for job_id, filename, content_hash in queued
+        ]
+
+    def _remove_upload(self, job_id: str) -> None:
+        try:
+            os.remove(self.upload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobProgress:
+    """
+    Picklable ``progress(stage, **counters)`` callback for run_pipeline.
+
+    Counters accumulate across stages, so a finished job still shows how
+    many pages were read. Writes are throttled to one per ``min_interval``
+    seconds, except that a stage change is always written.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, min_interval: float = 0.5):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.state: Dict = {"stage": "waiting"}
+        self._last_write = 0.0
+
+    def __call__(self, stage: str, **counters: int) -> None:
+        stage_changed = stage != self.state["stage"]
+        self.state.update(counters, stage=stage)
+        now = time.monotonic()
+        if stage_changed or now - self._last_write >= self.min_interval:
+            self._last_write = now
+            self.store.set_progress(self.job_id, self.state)
@@ -1,18 +1,97 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import shutil
 import os
-import tempfile
+import asyncio
+import hashlib
 import json
-from pdf_content_extraction import parse_pdf_and_extract_images
-from parse_pdf_into_json import TopicProcessor, process_content
 import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterator, List, Literal, Optional, Set
+from urllib.parse import unquote
 import uvicorn
-from remove_duplicate_question import remove_duplicate_questions
+from starlette.concurrency import run_in_threadpool
+from image_store import DocumentImageStore
+from job_store import JobProgress, JobStore
+from metrics import (
+    METRICS_ENABLED, RESULT_CACHE_LOOKUPS, Gauge, RequestMetricsMiddleware, RunMetrics, observe_run, record,
+    record_iter, render as render_metrics,
+)
+from pipeline import (
+    InvalidRangeError, count_questions, decode_cursor, index_cached_questions, iter_pipeline, run_pipeline,
+    run_pipeline_range, DEDUP_MODE, DEDUP_THRESHOLD, PARSER_VERSION, SEARCH_INDEX,
+)
+from remove_duplicate_question import make_duplicate_index, remove_duplicate_questions
+from response_encoding import encode_response, etag_matches, matching_result_etag, negotiate_encoding
+from result_model import to_json
+from result_cache import ResultCache
+from upload import SpooledPDF, UploadLimitMiddleware, spool_upload, spool_zip_pdfs
+from worker_pool import WorkerPool, PoolSaturatedError
+
+# CPU-bound PDF work runs here instead of on the event loop
+worker_pool = WorkerPool.from_env()
+Gauge("pdf_worker_slots_in_use", "Worker pool slots taken by running or queued jobs",
+      function=lambda: worker_pool.in_flight)
+Gauge("pdf_worker_slots", "Worker pool slots (workers plus queue)", function=lambda: worker_pool.capacity)
+
+# Final payloads of previously seen PDFs, keyed by content hash
+result_cache = ResultCache.from_env()
+
+# Background /jobs records, persisted so queued work survives a restart
+job_store = JobStore.from_env()
+
+# Retained PDFs whose images are extracted on demand (images=refs)
+image_store = DocumentImageStore.from_env()
+
+# Keep references to running job tasks so they are not garbage collected
+job_tasks: Set[asyncio.Task] = set()
+
+# Most PDFs one /process-pdfs/ request may carry (ZIP contents included)
+MAX_BATCH_FILES = int(os.getenv("PDF_MAX_BATCH_FILES", 100))
+
+# A document id is the SHA-256 of the PDF
+DOCUMENT_ID_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Image mode when a request does not pick one, see pdf_content_extraction.IMAGE_MODES
+IMAGE_MODE = os.getenv("PDF_IMAGE_MODE", "refs")
+
+# Written into each static/images/<file name>/ directory: the content hash
+# of the PDF whose images it holds
+IMAGE_DIR_OWNER_FILE = ".document"
+
+# Document images never change under their URL (document hash + xref)
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed", "application/octet-stream")
+
+
+class PayloadResponse(JSONResponse):
+    """
+    JSONResponse rendered with result_model.to_json.
 
-app = FastAPI()
+    Payloads hold Question / Topic records and can run to tens of MB, so
+    they skip FastAPI's jsonable_encoder walk and json.dumps' str + encode
+    copies: orjson writes the body bytes in one go.
+    """
+
+    def render(self, content) -> bytes:
+        return to_json(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up jobs that were queued or interrupted before the last shutdown
+    for job in await run_in_threadpool(job_store.recover):
+        start_job(job["job_id"], job["filename"], job["content_hash"])
+    yield
+    # Waits for the jobs still running in the worker processes
+    await run_in_threadpool(worker_pool.shutdown)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -23,6 +102,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads while they stream in, before multipart buffers them
+app.add_middleware(UploadLimitMiddleware)
+
+# Duration and in-progress count of the PDF processing endpoints, see /metrics
+app.add_middleware(RequestMetricsMiddleware, paths={
+    "/process-pdf/": "process-pdf",
+    "/process-pdf/stream": "process-pdf-stream",
+    "/process-pdfs/": "process-pdfs",
+    "/jobs": "jobs",
+})
+
 
 image_dir = "static/images"
 
@@ -51,102 +141,622 @@ def validate_pdf_file(file: UploadFile):
         )
 
 
+def is_zip_upload(file: UploadFile) -> bool:
+    """Tell a ZIP archive from a PDF in a batch upload, validating whichever it is."""
+    if file.filename and file.filename.lower().endswith(".zip"):
+        if file.content_type not in ZIP_CONTENT_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Only PDF files or ZIP archives are allowed"
+            )
+        return True
+    validate_pdf_file(file)
+    return False
+
+
+def image_dir_owner(pdf_image_dir: str) -> Optional[str]:
+    """Content hash of the PDF whose images a static/images/ directory holds, if known."""
+    try:
+        with open(os.path.join(pdf_image_dir, IMAGE_DIR_OWNER_FILE), encoding="ascii") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def images_on_disk(image_urls: List[str], content_hash: str) -> bool:
+    """
+    Check that every /static/... image URL still exists under the static
+    directory, in a directory still holding the images of the PDF with
+    ``content_hash``, and that every /documents/... image can still be served.
+    """
+    owners: Dict[str, Optional[str]] = {}
+    for url in image_urls:
+        if url.startswith("/documents/"):
+            _, _, document_id, _, name = url.split("/")
+            if not image_store.has_image(document_id, name):
+                return False
+            continue
+        path = os.path.join("static", unquote(url[len("/static/"):]))
+        directory = os.path.dirname(path)
+        if directory not in owners:
+            owners[directory] = image_dir_owner(directory)
+        if owners[directory] != content_hash or not os.path.exists(path):
+            return False
+    return True
+
+
+async def cached_payload(cache_key: str, content_hash: str) -> Optional[Dict]:
+    """Return a cached payload whose images are still on disk, or None."""
+    payload = await run_in_threadpool(result_cache.get, cache_key)
+    if payload is None:
+        RESULT_CACHE_LOOKUPS.inc(result="miss")
+        return None
+    if images_on_disk(payload["images"], content_hash):
+        RESULT_CACHE_LOOKUPS.inc(result="hit")
+        return payload
+    # Images were overwritten by a later upload of another PDF with the same name
+    RESULT_CACHE_LOOKUPS.inc(result="stale")
+    await run_in_threadpool(result_cache.delete, cache_key)
+    return None
+
+
+def reset_image_dir(pdf_image_dir: str) -> None:
+    """Clean this specific image directory if it exists and recreate it."""
+    if os.path.exists(pdf_image_dir):
+        shutil.rmtree(pdf_image_dir)
+    os.makedirs(pdf_image_dir)
+
+
+async def prepare_image_dir(
+    source, content_hash: str, original_filename: str, images: str, reset: bool = True
+) -> str:
+    """
+    Set up the directory a run writes its images to, for the given image mode.
+
+    In "refs" mode the PDF is retained and the few images extraction still
+    writes go to the image store, keyed by content hash, so two uploads
+    with the same file name never collide. Otherwise they go to
+    static/images/<file name>, emptied first for "full" unless ``reset``
+    is False (ranges of a document share it, image names are per page)
+    and the directory already holds this PDF's images. The directory then
+    records the PDF's content hash, see images_on_disk.
+    """
+    if images == "refs":
+        await run_in_threadpool(image_store.retain, content_hash, source)
+        pdf_image_dir = image_store.document_image_dir(content_hash)
+    else:
+        pdf_image_dir = os.path.join(image_dir, original_filename)
+        if images == "full":
+            if reset or image_dir_owner(pdf_image_dir) != content_hash:
+                reset_image_dir(pdf_image_dir)
+                with open(os.path.join(pdf_image_dir, IMAGE_DIR_OWNER_FILE), "w", encoding="ascii") as f:
+                    f.write(content_hash)
+            return pdf_image_dir
+    os.makedirs(pdf_image_dir, exist_ok=True)
+    return pdf_image_dir
+
+
+async def track_written_images(content_hash: str, images: str, payload: Dict) -> None:
+    """Put images a "refs" run had to write under the image store's disk budget."""
+    if images == "refs" and payload["image_stats"].get("images_written"):
+        await run_in_threadpool(image_store.track_images, content_hash)
+
+
+def result_cache_key(
+    content_hash: str, drop_known: bool, page_range: str = "", images: str = "full", original_filename: str = ""
+) -> str:
+    """
+    Cache key for a PDF under the current parser settings and request options.
+
+    "full" results point at static/images/<file name>/, so the same PDF
+    uploaded under another name is cached separately.
+    """
+    return ResultCache.make_key(
+        content_hash,
+        PARSER_VERSION + ("-drop-known" if drop_known else "") + page_range
+        + (f"-name-{original_filename}" if images == "full" else f"-images-{images}"))
+
+
+async def payload_response(
+    run: RunMetrics, payload: Optional[Dict], cache: str, cache_key: str, encoding: Optional[str],
+    not_modified: Optional[str] = None
+) -> Response:
+    """
+    Serialize and compress a /process-pdf/ payload, or answer 304 without one
+    when ``not_modified`` holds the If-None-Match ETag that matched.
+
+    The request's stages (upload, cache lookup, the pipeline's own stages,
+    serialization, compression) go out as a Server-Timing header and into
+    /metrics.
+    """
+    headers = {"X-Result-Cache": cache, "Vary": "Accept-Encoding"}
+    if not_modified is not None:
+        response = Response(status_code=304, headers={**headers, "ETag": not_modified})
+    else:
+        with run.stage("serialize"):
+            response = PayloadResponse(content=payload, headers=headers)
+        with run.stage("compress"):
+            await encode_response(response, encoding, cache_key)
+    if METRICS_ENABLED:
+        response.headers["Server-Timing"] = run.server_timing()
+        observe_run(run.as_dict())
+    return response
+
+
 @app.post("/process-pdf/")
-async def process_pdf(file: UploadFile = File(...)):
+async def process_pdf(
+    request: Request,
+    file: UploadFile = File(...),
+    drop_known: bool = False,
+    start_page: Optional[int] = Query(None, ge=1),
+    end_page: Optional[int] = Query(None, ge=1),
+    max_questions: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    images: Literal["full", "refs", "none"] = IMAGE_MODE
+):
+    """
+    Extract, parse and de-duplicate a PDF.
+
+    With any of ``start_page``, ``end_page``, ``max_questions`` or
+    ``cursor`` only part of the document is processed (see
+    run_pipeline_range) and the response carries a "next_cursor" to fetch
+    the following part with.
+
+    ``images=refs`` (the default, see PDF_IMAGE_MODE) writes no images:
+    they are served from the retained PDF by
+    GET /documents/{document_id}/images/{name} on first request.
+    ``images=full`` writes them all to /static/images/ up front and
+    ``images=none`` leaves them out of the result entirely.
+
+    The result is compressed as the Accept-Encoding header allows and
+    carries an ETag naming the document, parser version and options; a
+    re-upload sending it back in If-None-Match gets an empty 304 when the
+    result is still cached.
+    """
     # ✅ Let FastAPI handle HTTPExceptions naturally
     validate_pdf_file(file)
+    ranged = any(value is not None for value in (start_page, end_page, max_questions, cursor))
+    if start_page is not None and end_page is not None and end_page < start_page:
+        raise HTTPException(status_code=400, detail="end_page must not be before start_page")
 
     try:
+        # Fail fast before touching the disk if every worker slot is taken
+        worker_pool.check_capacity()
+
         # Get the filename without extension
         original_filename = os.path.splitext(file.filename)[0]
 
-        # Create a specific directory for this PDF's images
-        pdf_image_dir = os.path.join(image_dir, original_filename)
+        # Stage timings of this request, returned as Server-Timing
+        run = RunMetrics()
 
-        # ✅ Step 1: Clean this specific image directory if it exists
-        if os.path.exists(pdf_image_dir):
-            shutil.rmtree(pdf_image_dir)
-        os.makedirs(pdf_image_dir)
-
-        # ✅ Step 2: Create temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_pdf_path = os.path.join(temp_dir, file.filename)
-            with open(temp_pdf_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # ✅ Step 3: Process PDF
-            _, cleaned_lines, extracted_images = parse_pdf_and_extract_images(
-                pdf_path=temp_pdf_path,
-                output_img_dir=pdf_image_dir,  # Use the specific directory
-                output_txt_path=""
-            )
+        # ✅ Step 1: Read the upload (in memory, or spooled to disk if large)
+        with run.stage("upload"):
+            upload = await spool_upload(file)
+        try:
+            page_range = ""
+            if ranged:
+                try:
+                    resume = decode_cursor(cursor, upload.content_hash) if cursor else None
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                page_range = "-pages-" + hashlib.sha256(
+                    f"{start_page}:{end_page}:{max_questions}:{cursor}".encode()).hexdigest()[:16]
 
-            # ✅ Step 4: Process content
-            text_content = "\n".join(cleaned_lines)
-            result = process_content(text_content)
-
-            full_image_paths = [
-                f"/static/images/{original_filename}/{os.path.basename(img)}" for img in extracted_images]
-
-            def replace_img_paths(data: dict, images_list: list) -> dict:
-                """
-                Replaces all <img src='images/...'> tags in the dictionary with full paths from images_list.
-
-                Args:
-                    data: The dictionary containing questions and image references
-                    images_list: List of full image paths
-
-                Returns:
-                    Dictionary with updated image paths
-                """
-                # Create mapping of base filenames to full paths
-                image_map = {}
-                for full_path in images_list:
-                    filename = os.path.basename(full_path)
-                    image_map[filename] = full_path
-
-                # Recursively process the dictionary
-                def process_item(item):
-                    if isinstance(item, dict):
-                        return {k: process_item(v) for k, v in item.items()}
-                    elif isinstance(item, list):
-                        return [process_item(i) for i in item]
-                    elif isinstance(item, str):
-                        # Replace <img> tags with full paths
-                        matches = re.findall(
-                            r"<img src='images/([^']+)'>", item)
-                        for filename in matches:
-                            if filename in image_map:
-                                item = item.replace(
-                                    f"<img src='images/{filename}'>",
-                                    image_map[filename]
-                                )
-                        return item
-                    else:
-                        return item
-
-                return process_item(data)
-            updated_result = replace_img_paths(result, full_image_paths)
-
-            result = {"topics": updated_result}
-            de_dup_result = remove_duplicate_questions(result)
-
-            return JSONResponse(content={
-                "result": de_dup_result,
-                "images": full_image_paths
-            })
+            # ✅ Step 2: Serve repeated uploads from the result cache
+            cache_key = result_cache_key(upload.content_hash, drop_known, page_range, images, original_filename)
+            encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+            with run.stage("cache_lookup"):
+                payload = await cached_payload(cache_key, upload.content_hash)
+            if payload is not None:
+                await run_in_threadpool(
+                    index_cached_questions, payload["result"]["topics"], upload.content_hash, original_filename,
+                    not ranged)
+                not_modified = matching_result_etag(request, cache_key, encoding)
+                if not_modified is not None:
+                    return await payload_response(run, None, "hit", cache_key, encoding, not_modified)
+                return await payload_response(run, payload, "hit", cache_key, encoding)
+
+            # ✅ Step 3: Prepare this PDF's image directory
+            pdf_image_dir = await prepare_image_dir(
+                upload.source, upload.content_hash, original_filename, images, reset=not ranged)
+
+            # ✅ Step 4: Extract, parse and de-duplicate off the event loop
+            if ranged:
+                try:
+                    payload, pipeline_run = await worker_pool.run(
+                        record, run_pipeline_range, upload.source, pdf_image_dir, original_filename,
+                        start_page or 2, end_page, max_questions, resume, upload.content_hash, drop_known,
+                        images)
+                except InvalidRangeError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            else:
+                payload, pipeline_run = await worker_pool.run(
+                    record, run_pipeline, upload.source, pdf_image_dir, original_filename,
+                    None, upload.content_hash, drop_known, images)
+            run.merge(pipeline_run)
+            await track_written_images(upload.content_hash, images, payload)
+            with run.stage("cache_store"):
+                await run_in_threadpool(result_cache.put, cache_key, payload)
+
+            return await payload_response(run, payload, "miss", cache_key, encoding)
+        finally:
+            upload.cleanup()
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Server is busy, please retry later: {str(e)}"},
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"An unexpected error occurred: {str(e)}"}
         )
 
+@app.get("/documents/{document_id}/images/{name}")
+async def get_document_image(document_id: str, name: str, request: Request):
+    """
+    Serve an image of a PDF processed with images=refs, extracting it on first request.
+
+    The URL names the document by content hash and the image by xref, so
+    its bytes never change: the ETag is derived from the URL alone and a
+    matching If-None-Match is answered 304 without touching the disk.
+    """
+    if not DOCUMENT_ID_PATTERN.fullmatch(document_id):
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers = {"ETag": f'"{document_id}-{name}"', "Cache-Control": IMAGE_CACHE_CONTROL}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    found = await run_in_threadpool(image_store.image, document_id, name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+def ndjson_chunks(events: Iterator[Dict], flush_interval: float = 0.05) -> Iterator[bytes]:
+    """
+    Serialize events as NDJSON, batching lines that arrive within ``flush_interval``.
+
+    Runs in the streaming thread, so each chunk costs one hop back to the
+    event loop rather than one per question.
+    """
+    lines = []
+    last_flush = time.monotonic()
+    for event in events:
+        lines.append(to_json(event) + b"\n")
+        if time.monotonic() - last_flush >= flush_interval:
+            yield b"".join(lines)
+            lines = []
+            last_flush = time.monotonic()
+    if lines:
+        yield b"".join(lines)
+
+
+@app.post("/process-pdf/stream")
+async def process_pdf_stream(file: UploadFile = File(...), drop_known: bool = False):
+    """
+    Same pipeline as /process-pdf/, streamed as NDJSON while the PDF is read.
+
+    One JSON object per line: "topic" and "question" events as soon as they
+    are parsed (duplicates already dropped), then a final "done" event with
+    the image list, or an "error" event if processing fails midway.
+    """
+    validate_pdf_file(file)
+
+    try:
+        worker_pool.check_capacity()
+    except PoolSaturatedError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Server is busy, please retry later: {str(e)}"},
+            headers={"Retry-After": "5"}
+        )
+
+    original_filename = os.path.splitext(file.filename)[0]
+    upload = await spool_upload(file)
+    try:
+        pdf_image_dir = await prepare_image_dir(
+            upload.source, upload.content_hash, original_filename, IMAGE_MODE)
+    except BaseException:
+        upload.cleanup()
+        raise
+
+    async def ndjson_events():
+        try:
+            async for chunk in worker_pool.iterate(
+                    lambda: ndjson_chunks(record_iter(iter_pipeline(
+                        upload.source, pdf_image_dir, original_filename,
+                        upload.content_hash, drop_known, IMAGE_MODE)))):
+                yield chunk
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield json.dumps({"type": "error", "error": f"An unexpected error occurred: {str(e)}"}) + "\n"
+        finally:
+            upload.cleanup()
+            if IMAGE_MODE == "refs":
+                await run_in_threadpool(image_store.track_images, upload.content_hash)
+
+    return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
+
+
+async def spool_batch(files: List[UploadFile], zip_flags: List[bool]) -> List[SpooledPDF]:
+    """
+    Spool every PDF of a batch upload, unpacking ZIP archives in place.
+
+    Raises:
+        HTTPException: 400 for an invalid archive, an empty or oversized
+            batch or, in "full" image mode, two PDFs with the same name (they
+            would share an image directory), 413 for an oversized file
+    """
+    uploads: List[SpooledPDF] = []
+    try:
+        for file, is_zip in zip(files, zip_flags):
+            if is_zip:
+                uploads.extend(await run_in_threadpool(spool_zip_pdfs, file.file))
+            else:
+                uploads.append(await spool_upload(file))
+            if len(uploads) > MAX_BATCH_FILES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Too many PDFs in one batch. Maximum is {MAX_BATCH_FILES}"
+                )
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No PDF files in the batch")
+        names = [os.path.splitext(upload.filename)[0] for upload in uploads]
+        for name in names if IMAGE_MODE == "full" else ():
+            if names.count(name) > 1:
+                raise HTTPException(status_code=400, detail=f"Duplicate file name in batch: {name}.pdf")
+    except BaseException:
+        for upload in uploads:
+            upload.cleanup()
+        raise
+    return uploads
+
+
+async def process_batch_file(upload: SpooledPDF, drop_known: bool, slots: asyncio.Semaphore) -> Dict:
+    """Run one PDF of a batch through the cache and the pipeline, like /process-pdf/."""
+    async with slots:
+        try:
+            original_filename = os.path.splitext(upload.filename)[0]
+            cache_key = result_cache_key(
+                upload.content_hash, drop_known, images=IMAGE_MODE, original_filename=original_filename)
+            payload = await cached_payload(cache_key, upload.content_hash)
+            if payload is not None:
+                await run_in_threadpool(
+                    index_cached_questions, payload["result"]["topics"], upload.content_hash, original_filename)
+                return {"cache": "hit", **payload}
+
+            pdf_image_dir = await prepare_image_dir(
+                upload.source, upload.content_hash, original_filename, IMAGE_MODE)
+            # The batch was admitted as a whole, so its files queue for a
+            # worker instead of failing with 503 halfway through
+            payload, pipeline_run = await worker_pool.run(
+                record, run_pipeline, upload.source, pdf_image_dir, original_filename,
+                None, upload.content_hash, drop_known, IMAGE_MODE, wait=True)
+            observe_run(pipeline_run)
+            await track_written_images(upload.content_hash, IMAGE_MODE, payload)
+            await run_in_threadpool(result_cache.put, cache_key, payload)
+            return {"cache": "miss", **payload}
+        finally:
+            upload.cleanup()
+
+
+def batch_file_event(index: int, upload: SpooledPDF, payload: Dict, batch_index=None) -> bytes:
+    """
+    NDJSON line for a finished batch file.
+
+    With ``batch_index`` (a duplicate index shared by the whole batch) the
+    file's questions already kept from an earlier file are removed and
+    listed under "batch_duplicates".
+    """
+    if batch_index is not None:
+        batch_duplicates: List[Dict] = []
+        remove_duplicate_questions(
+            payload["result"], duplicates=batch_duplicates, index=batch_index, document=upload.filename)
+        payload["batch_duplicates"] = batch_duplicates
+    event = {"type": "file", "index": index, "filename": upload.filename, **payload}
+    return to_json(event) + b"\n"
+
+
+@app.post("/process-pdfs/")
+async def process_pdfs(files: List[UploadFile] = File(...), dedup_across: bool = False, drop_known: bool = False):
+    """
+    Process many PDFs (and/or ZIP archives of PDFs) in one request.
+
+    Files are spread over the worker pool and their results streamed as
+    NDJSON: one "file" event per PDF (the /process-pdf/ body plus "index",
+    "filename" and "cache"), or "file_error" for a PDF that failed, then a
+    final "done" event. Events arrive as files finish; with
+    ``dedup_across=true`` they arrive in upload order instead, and questions
+    already kept from an earlier file of the batch are removed.
+    """
+    zip_flags = [is_zip_upload(file) for file in files]
+
+    try:
+        worker_pool.check_capacity()
+    except PoolSaturatedError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Server is busy, please retry later: {str(e)}"},
+            headers={"Retry-After": "5"}
+        )
+
+    uploads = await spool_batch(files, zip_flags)
+    # Leave the pool's queue to other requests: a batch only ever occupies
+    # as many slots as there are workers
+    slots = asyncio.Semaphore(max(worker_pool.max_workers, 1))
+    tasks = [asyncio.create_task(process_batch_file(upload, drop_known, slots)) for upload in uploads]
+    batch_index = make_duplicate_index(DEDUP_MODE, DEDUP_THRESHOLD) if dedup_across else None
+
+    async def finished_files():
+        """(index, payload or exception) per file, in upload or completion order."""
+        if dedup_across:
+            for index, task in enumerate(tasks):
+                try:
+                    yield index, await task
+                except Exception as e:
+                    yield index, e
+            return
+        positions = {task: index for index, task in enumerate(tasks)}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=positions.get):
+                yield positions[task], task.exception() or task.result()
+
+    async def ndjson_events():
+        failed = 0
+        try:
+            async for index, outcome in finished_files():
+                upload = uploads[index]
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    yield json.dumps({
+                        "type": "file_error", "index": index, "filename": upload.filename,
+                        "error": f"An unexpected error occurred: {str(outcome)}",
+                    }) + "\n"
+                else:
+                    yield await run_in_threadpool(batch_file_event, index, upload, outcome, batch_index)
+            yield json.dumps({"type": "done", "files": len(uploads), "failed": failed}) + "\n"
+        finally:
+            # Client gone or done: stop waiting on whatever has not started yet
+            for task in tasks:
+                task.cancel()
+            for upload in uploads:
+                upload.cleanup()
+
+    return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
+
+
+def start_job(job_id: str, filename: str, content_hash: str) -> None:
+    """Run a stored job in the background of the event loop."""
+    task = asyncio.create_task(run_job(job_id, filename, content_hash))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+
+
+async def run_job(job_id: str, filename: str, content_hash: str) -> None:
+    """Claim a queued job, run the pipeline on its stored upload and record the outcome."""
+    if not await run_in_threadpool(job_store.claim, job_id):
+        return  # Another worker process picked it up
+
+    try:
+        original_filename = os.path.splitext(filename)[0]
+        cache_key = result_cache_key(
+            content_hash, drop_known=False, images=IMAGE_MODE, original_filename=original_filename)
+        payload = await cached_payload(cache_key, content_hash)
+        if payload is None:
+            upload_path = job_store.upload_path(job_id)
+            pdf_image_dir = await prepare_image_dir(upload_path, content_hash, original_filename, IMAGE_MODE)
+
+            # Jobs wait for a free worker instead of failing with 503
+            payload, pipeline_run = await worker_pool.run(
+                record, run_pipeline, upload_path, pdf_image_dir, original_filename,
+                JobProgress(job_store, job_id), content_hash, False, IMAGE_MODE, wait=True)
+            observe_run(pipeline_run)
+            await track_written_images(content_hash, IMAGE_MODE, payload)
+            await run_in_threadpool(result_cache.put, cache_key, payload)
+        else:
+            await run_in_threadpool(
+                index_cached_questions, payload["result"]["topics"], content_hash, original_filename)
+
+        await run_in_threadpool(
+            job_store.finish, job_id, payload,
+            questions_kept=count_questions(payload["result"]["topics"]))
+    except Exception as e:
+        await run_in_threadpool(job_store.fail, job_id, f"An unexpected error occurred: {str(e)}")
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """Accept a PDF, queue it for processing and return the job id right away."""
+    validate_pdf_file(file)
+
+    upload = await spool_upload(file)
+    try:
+        job_id = await run_in_threadpool(job_store.create, file.filename, upload)
+    finally:
+        upload.cleanup()
+
+    start_job(job_id, file.filename, upload.content_hash)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics of this process: per-stage time histograms, page /
+    image / question counters, result cache lookups and in-progress gauges.
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/search")
+async def search_questions(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    document_id: Optional[str] = None
+):
+    """
+    Search the questions of every processed PDF.
+
+    Matches questions holding every word of ``q`` (the last one as a
+    prefix) in their text, options, explanation or topic name, best match
+    first; ``document_id`` limits the search to one PDF.
+    """
+    if SEARCH_INDEX is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if document_id is not None and not DOCUMENT_ID_PATTERN.fullmatch(document_id):
+        raise HTTPException(status_code=400, detail="Invalid document_id")
+    found = await run_in_threadpool(SEARCH_INDEX.search, q, limit, offset, document_id)
+    response = PayloadResponse(content={"query": q, "offset": offset, "limit": limit, **found})
+    return await encode_response(response, negotiate_encoding(request.headers.get("accept-encoding", "")))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    Report a job's status, per-stage progress and, once done, its result.
+
+    A finished job never changes again: it carries an ETag, and polling
+    with it in If-None-Match is answered 304 without the result.
+    """
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    etag_key = None
+    if job["status"] == "done":
+        cache_key = result_cache_key(
+            job["document_id"], False, images=IMAGE_MODE, original_filename=os.path.splitext(job["filename"])[0])
+        etag_key = f"{job_id}:{cache_key}"
+        not_modified = matching_result_etag(request, etag_key, encoding)
+        if not_modified is not None:
+            return Response(status_code=304, headers={"ETag": not_modified, "Vary": "Accept-Encoding"})
+    return await encode_response(PayloadResponse(content=job), encoding, etag_key)
+
+
 # Remove the `if __name__ == "__main__":` block and replace with:
 
 
 def start():
-    """Run the FastAPI app using Uvicorn programmatically."""
+    """
+    Run the FastAPI app using Uvicorn programmatically.
+
+    SERVER_MODE=production runs WEB_CONCURRENCY uvicorn workers under
+    gunicorn instead (see server.py).
+    """
     port = int(os.getenv("PORT", 8000))  # Default to 8000 if PORT not set
+    if os.getenv("SERVER_MODE", "development") == "production":
+        import server
+        server.run("main:app", port)
+        return
     uvicorn.run(
         "main:app",  # Replace "main" with your filename if different
         host="0.0.0.0",
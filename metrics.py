@@ -0,0 +1,353 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+# Set METRICS_ENABLED=0 to turn every recording call into a no-op and hide /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Seconds; covers a tiny page stage up to a long synchronous request
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class RunMetrics:
+    """
+    Time per stage and counters of one pipeline run.
+
+    Stages that happen many times in a run (get_text once per page, a
+    write per image) add up under one name. A run usually happens in a
+    worker process, where the process-wide metrics below are out of
+    reach, so ``record`` ships it back as a plain dict for the API process
+    to observe (see observe_run).
+    """
+
+    __slots__ = ("stages", "counts")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def stage(self, name: str) -> "_Stage":
+        """Context manager adding the time spent in the block to stage ``name``."""
+        return _Stage(self, name)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, other: Dict[str, Dict]) -> None:
+        """Add the stages and counts of a dict from ``as_dict``."""
+        for name, seconds in other.get("stages", {}).items():
+            self.add_time(name, seconds)
+        for name, amount in other.get("counts", {}).items():
+            self.count(name, amount)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {"stages": dict(self.stages), "counts": dict(self.counts)}
+
+    def server_timing(self) -> str:
+        """The stages as a Server-Timing header value (durations in milliseconds)."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+class _Stage:
+    # A plain class rather than @contextmanager: it is entered once per
+    # page and per image, so it should cost next to nothing
+
+    __slots__ = ("run", "name", "start")
+
+    def __init__(self, run: RunMetrics, name: str):
+        self.run = run
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.run.add_time(self.name, time.perf_counter() - self.start)
+
+
+# The run the current thread / task is recording into, if any
+_current_run: ContextVar[Optional[RunMetrics]] = ContextVar("current_run", default=None)
+
+_NO_STAGE = nullcontext()
+
+T = TypeVar("T")
+
+
+def stage(name: str):
+    """Time a block as stage ``name`` of the current run; a no-op outside ``record``."""
+    run = _current_run.get()
+    if run is None:
+        return _NO_STAGE
+    return run.stage(name)
+
+
+def add_time(name: str, seconds: float) -> None:
+    """Add ``seconds`` to stage ``name`` of the current run, if any."""
+    run = _current_run.get()
+    if run is not None:
+        run.add_time(name, seconds)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add ``amount`` to counter ``name`` of the current run, if any."""
+    run = _current_run.get()
+    if run is not None:
+        run.count(name, amount)
+
+
+def merge(run_dict: Dict[str, Dict]) -> None:
+    """Fold a run ``record`` returned (e.g. from a sub-process) into the current run, if any."""
+    run = _current_run.get()
+    if run is not None:
+        run.merge(run_dict)
+
+
+def record(fn: Callable[..., Any], *args: Any) -> Tuple[Any, Dict[str, Dict]]:
+    """
+    Call ``fn(*args)`` while recording its stages and counters.
+
+    A module-level function so it can be handed to a worker process in
+    place of ``fn``. Returns (fn's result, RunMetrics.as_dict()); the dict
+    is empty when metrics are disabled.
+    """
+    if not METRICS_ENABLED:
+        return fn(*args), {}
+    run = RunMetrics()
+    token = _current_run.set(run)
+    try:
+        return fn(*args), run.as_dict()
+    finally:
+        _current_run.reset(token)
+
+
+def record_iter(items: Iterator[T]) -> Iterator[T]:
+    """
+    Drive the generator ``items`` while recording its stages and counters.
+
+    The streaming counterpart of ``record``: each step may run on a
+    different thread, so the run is made current around every step rather
+    than once, and it is added to the process-wide metrics (observe_run)
+    when the generator ends or is closed.
+    """
+    if not METRICS_ENABLED:
+        yield from items
+        return
+    run = RunMetrics()
+    try:
+        while True:
+            token = _current_run.set(run)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                _current_run.reset(token)
+            yield item
+    finally:
+        observe_run(run.as_dict())
+
+
+class Metric:
+    """One Prometheus metric family; values are keyed by their label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """A value set directly, or read from ``function`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        function: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {_number(self.function())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DURATION_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # Per label values: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = self._label_text(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "pdf_stage_seconds", "Time spent per processing stage of a PDF", ("stage",))
+REQUEST_SECONDS = Histogram(
+    "pdf_request_seconds", "Time to answer a PDF processing request, body included", ("endpoint",))
+RUN_ITEMS = Counter(
+    "pdf_items_total", "Pages, images and questions processed, by kind", ("kind",))
+RESULT_CACHE_LOOKUPS = Counter(
+    "pdf_result_cache_lookups_total", "Result cache lookups, by outcome", ("result",))
+REQUESTS_IN_PROGRESS = Gauge(
+    "pdf_requests_in_progress", "PDF processing requests being answered", ("endpoint",))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing the requests to ``paths`` (path -> endpoint label).
+
+    A request counts as in progress, and its duration runs, until the last
+    body chunk is sent, so streamed NDJSON responses are timed in full.
+    """
+
+    def __init__(self, app, paths: Dict[str, str]):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.paths.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if endpoint is None or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc(endpoint=endpoint)
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if not finished:
+                finished = True
+                REQUESTS_IN_PROGRESS.dec(endpoint=endpoint)
+                REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+        async def timed_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            finish()
+
+
+def observe_run(run: Dict[str, Dict]) -> None:
+    """Add a run shipped back by ``record`` to the process-wide metrics."""
+    for name, seconds in run.get("stages", {}).items():
+        STAGE_SECONDS.observe(seconds, stage=name)
+    for name, amount in run.get("counts", {}).items():
+        RUN_ITEMS.inc(amount, kind=name)
@@ -0,0 +1,187 @@
+import hashlib
+import re
+from array import array
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+# Words of normalized text: case, punctuation and whitespace differences vanish
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# "A. ", "B) " ... in front of an option
+OPTION_LETTER_PATTERN = re.compile(r"^\s*[A-Ga-g][.)]\s*")
+
+# Extracted image references, as placeholders ("<img src='images/x.png'>")
+# or as public URLs ("/static/images/<pdf>/x.png", "/documents/<hash>/images/<xref>")
+IMAGE_REF_PATTERN = re.compile(r"(?:<img src=')?(?:/static/|/documents/[0-9a-f]+/)?images/(?:[^\s'\"<>]*/)?([^\s'\"<>/]+)(?:'>)?")
+
+
+def question_texts(question: Dict) -> List[str]:
+    """The question text and its options with the option letters stripped."""
+    texts = [question.get("question", "")]
+    texts.extend(OPTION_LETTER_PATTERN.sub("", option) for option in question.get("options", []))
+    return texts
+
+
+def question_images(question: Dict) -> FrozenSet[str]:
+    """
+    Paths of the images a question refers to.
+
+    Whole paths, not file names: in "refs" mode an image is named after
+    its xref, so the same name in two PDFs is usually a different image.
+    """
+    return frozenset(
+        match.group(0).removeprefix("<img src='").removesuffix("'>")
+        for text in question_texts(question) for match in IMAGE_REF_PATTERN.finditer(text))
+
+
+def question_shingles(question: Dict, shingle_size: int = 3) -> FrozenSet[str]:
+    """
+    Word n-gram shingles of a question's text plus its options.
+
+    Options are shingled one by one with their letter stripped, so the
+    same options in a different order give the same set. Image references
+    are left out; see question_images.
+    """
+    shingles = set()
+    for text in question_texts(question):
+        words = WORD_PATTERN.findall(IMAGE_REF_PATTERN.sub(" ", text).lower())
+        if len(words) <= shingle_size:
+            if words:
+                shingles.add(" ".join(words))
+            continue
+        for i in range(len(words) - shingle_size + 1):
+            shingles.add(" ".join(words[i:i + shingle_size]))
+    return frozenset(shingles)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _shingle_hashes(shingle: str, num_perm: int) -> List[int]:
+    """``num_perm`` independent 32-bit hashes of a shingle (stable across processes, unlike hash())."""
+    return array("I", hashlib.shake_128(shingle.encode("utf-8")).digest(4 * num_perm)).tolist()
+
+
+def _false_negative_probability(threshold: float, bands: int, rows: int, steps: int = 100) -> float:
+    """Integral of P(not a candidate) over similarities above ``threshold``."""
+    width = (1.0 - threshold) / steps
+    return sum(
+        (1 - (threshold + (i + 0.5) * width) ** rows) ** bands
+        for i in range(steps)
+    ) * width
+
+
+def _false_positive_probability(threshold: float, bands: int, rows: int, steps: int = 100) -> float:
+    """Integral of P(candidate) over similarities below ``threshold``."""
+    width = threshold / steps
+    return sum(
+        1 - (1 - ((i + 0.5) * width) ** rows) ** bands
+        for i in range(steps)
+    ) * width
+
+
+def lsh_bands(threshold: float, num_perm: int, false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """
+    Pick (bands, rows per band) for ``num_perm`` hashes and a Jaccard threshold.
+
+    Candidates are verified with the exact Jaccard similarity, so a false
+    positive only costs a set comparison while a false negative is a missed
+    duplicate; missed duplicates are weighted accordingly.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = (
+            false_negative_weight * _false_negative_probability(threshold, bands, rows)
+            + (1 - false_negative_weight) * _false_positive_probability(threshold, bands, rows)
+        )
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashLSHIndex:
+    """
+    Incremental near-duplicate index over questions (MinHash + LSH banding).
+
+    Each question is reduced to a set of word shingles (text and options),
+    summarized by ``num_perm`` MinHash values and bucketed by bands of
+    those values. Only questions sharing a bucket are compared, using the
+    exact Jaccard similarity of their shingle sets, so indexing n questions
+    costs O(n) instead of O(n^2) pairwise comparisons.
+
+    Questions must also refer to the same images to match: templated items
+    ("HOTSPOT - For each of the following statements...") share all their
+    text and only differ by the image holding the actual question.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self._shingles: List[FrozenSet[str]] = []
+        self._images: List[FrozenSet[str]] = []
+        self._refs: List[Hashable] = []
+        # Questions without a single word only match on identical images
+        self._wordless_refs: Dict[FrozenSet[str], Hashable] = {}
+
+    def signature(self, shingles: FrozenSet[str]) -> List[int]:
+        """MinHash signature: per hash function, the minimum over all shingles."""
+        rows = [_shingle_hashes(shingle, self.num_perm) for shingle in shingles]
+        if len(rows) == 1:
+            return rows[0]
+        return list(map(min, *rows))
+
+    def match(self, question: Dict, ref: Hashable) -> Optional[Tuple[Hashable, float]]:
+        """
+        Return (ref of the most similar indexed question, similarity) if one
+        reaches the threshold; otherwise index ``question`` under ``ref`` and
+        return None.
+        """
+        shingles = question_shingles(question, self.shingle_size)
+        images = question_images(question)
+        if not shingles:
+            if images in self._wordless_refs:
+                return self._wordless_refs[images], 1.0
+            self._wordless_refs[images] = ref
+            return None
+
+        signature = self.signature(shingles)
+        band_keys = [
+            tuple(signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+        best = None
+        checked = set()
+        for band, key in enumerate(band_keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if self._images[candidate] != images:
+                    continue
+                similarity = jaccard(shingles, self._shingles[candidate])
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+        if best is not None:
+            return self._refs[best[0]], best[1]
+
+        position = len(self._refs)
+        self._refs.append(ref)
+        self._shingles.append(shingles)
+        self._images.append(images)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(position)
+        return None
@@ -1,7 +1,11 @@
 import json
 import re
 import os
-from typing import Dict, List, Union, Pattern, Match, Optional, Tuple
+from bisect import bisect_left
+from copy import deepcopy
+from typing import Dict, Iterable, Iterator, List, Union, Pattern, Match, Optional, Tuple
+
+from result_model import Question, Topic, jsonable
    
 
 class TopicProcessor:
@@ -20,6 +24,25 @@ class TopicProcessor:
             re.IGNORECASE
         )
         self.explanation_pattern = re.compile(r"Explanation:\s*(.+?)(?=(?:Question: \d+|Topic \d+, |Case Study: \d+|$))", re.DOTALL)
+        self.case_study_text_pattern = re.compile(
+            r"(Topic \d+\s*, |Case Study: \d+\n).+?\n(.+?)(?=Question: \d+)", re.DOTALL)
+
+        # Single-pass tokenizer: every topic / case-study / question header and
+        # every marker that ends a question body, in document order
+        self.boundary_pattern = re.compile(
+            r"(Topic \d+\s*,)"                      # topic header
+            r"|(Case Study: \d+)"                    # case study header
+            r"|((?i:question)[:\s]*(\d+))"           # question header
+            r"|(?i:topic \d+, |case study: \d+)"     # other question terminators
+        )
+        # Header-only versions of topic_pattern / case_study_pattern
+        self.topic_header_pattern = re.compile(r"Topic (\d+)\s*,\s*(.+?)\n(?=.)", re.DOTALL)
+        self.case_study_header_pattern = re.compile(r"Case Study: (\d+)\n(.+?)\n(?=.)", re.DOTALL)
+        self.topic_terminator_pattern = re.compile(r"Topic \d+, ", re.IGNORECASE)
+        self.case_study_prefix_pattern = re.compile(r"Topic \d+\s*, |Case Study: \d+\n")
+        self.exact_question_pattern = re.compile(r"Question: \d")
+        # One shared tuple per distinct answer, see assemble_question
+        self.answer_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
 
     # def process_text(self, text: str) -> Dict:
     #     """
@@ -52,76 +75,180 @@ class TopicProcessor:
     #     #     f.write(json_string)
     #     return all_topics_data
 
-    def process_text(self, text: str) -> Dict:
-        """New version that handles questions before topics
-    
-          Process text content and return structured data.
-        
-          Args:
-              text: The text content to process
-            
-          Returns:
-              Dictionary containing processed topic data
+    def process_text(self, text: str) -> Dict[str, Topic]:
         """
+        Process text content and return structured data.
+
+        The text is tokenized once (see ``scan_boundaries``); topics, case
+        studies and questions are then built from the recorded offsets, so
+        every question body is parsed once. Questions before the first topic
+        go to ``topic0``.
+
+        Args:
+            text: The text content to process
+
+        Returns:
+            Topic records (see result_model) keyed "topic<N>"
+        """
+        sections, question_spans = self.scan_boundaries(text)
+        positions = [span[1] for span in question_spans]
+        built = {}
+
+        def question_at(index: int, limit: int) -> Question:
+            # Inside a section a question also stops at the section's end
+            number, _, body_start, end = question_spans[index]
+            key = (index, min(end, limit))
+            if key in built:
+                return deepcopy(built[key])
+            built[key] = self.build_question(number, text[body_start:key[1]])
+            return built[key]
+
+        def questions_in_section(start: int, end: int) -> List[Question]:
+            return [
+                question_at(j, end)
+                for j in range(bisect_left(positions, start), bisect_left(positions, end))
+                if question_spans[j][2] < end
+            ]
+
+        def questions_outside_sections(start: int, end: int) -> List[Question]:
+            return [
+                question_at(j, len(text))
+                for j in range(bisect_left(positions, start), bisect_left(positions, end))
+            ]
 
         all_topics_data = {}
-        
-        # Get ALL questions first (with their positions)
-        all_questions = {
-            q_match.start(): self.process_question_match(q_match)
-            for q_match in self.question_pattern.finditer(text)
-        }
-        
-        # Process topics (original logic but tracks positions)
-        topics_found = self.extract_topics(text)
-        
+
+        # Topics first, then case studies, matching the order topics used to be collected in
+        topics_found = (
+            [section for section in sections if section[0] == "topic"]
+            + [section for section in sections if section[0] == "case_study"]
+        )
+
         if not topics_found:
-            # Original fallback if no topics found
-            all_topics_data["topic0"] = {
-                "topic_name": "",
-                "case_study": self.extract_case_study_text(text),
-                "questions": list(all_questions.values())
-            }
-        else:
-            prev_topic_end = 0
-            for i, topic_match in enumerate(topics_found):
-                topic_start = topic_match.start()
-                topic_data = self.process_topic_match(topic_match)
-                topic_num = topic_data["number"]
-                
-                # Assign questions between topics to previous topic (or topic0)
-                questions_in_gap = [
-                    q for pos, q in all_questions.items()
-                    if prev_topic_end <= pos < topic_start
-                ]
-                
-                if i == 0 and questions_in_gap:  # Questions before first topic
-                    all_topics_data["topic0"] = {
-                        "topic_name": "",
-                        "case_study": "",
-                        "questions": questions_in_gap
-                    }
-                
-                # Add the topic itself
-                all_topics_data[f"topic{topic_num}"] = topic_data["data"]
-                prev_topic_end = topic_match.end()
-            
-            # Handle questions after last topic
-            remaining_questions = [
-                q for pos, q in all_questions.items()
-                if pos >= prev_topic_end
-            ]
-            if remaining_questions:
-                if "topic0" not in all_topics_data:
-                    all_topics_data["topic0"] = {
-                        "topic_name": "General Questions",
-                        "case_study": "",
-                        "questions": []
-                    }
-                all_topics_data["topic0"]["questions"].extend(remaining_questions)
-        
+            all_topics_data["topic0"] = Topic(
+                topic_name="",
+                case_study=self.extract_case_study_text(text),
+                questions=questions_outside_sections(0, len(text) + 1)
+            )
+            return all_topics_data
+
+        prev_topic_end = 0
+        for i, (kind, number, name, start, _, end) in enumerate(topics_found):
+            # Questions before the first topic get their own topic0
+            if i == 0:
+                questions_in_gap = questions_outside_sections(prev_topic_end, start)
+                if questions_in_gap:
+                    all_topics_data["topic0"] = Topic(
+                        topic_name="",
+                        case_study="",
+                        questions=questions_in_gap
+                    )
+
+            all_topics_data[f"topic{number}"] = Topic(
+                topic_name=name if kind == "topic" else f"Case Study {number}",
+                case_study=self.section_case_study_text(text, start, end),
+                questions=questions_in_section(start, end)
+            )
+            prev_topic_end = end
+
+        # Handle questions after the last topic
+        remaining_questions = questions_outside_sections(prev_topic_end, len(text) + 1)
+        if remaining_questions:
+            if "topic0" not in all_topics_data:
+                all_topics_data["topic0"] = Topic(topic_name="General Questions", case_study="")
+            all_topics_data["topic0"]["questions"].extend(remaining_questions)
+
         return all_topics_data
 
+    def scan_boundaries(
+        self, text: str
+    ) -> Tuple[List[Tuple[str, str, str, int, int, int]], List[Tuple[str, int, int, int]]]:
+        """
+        Walk the text once and record where sections and questions start and end.
+
+        A topic or case study runs to the next topic / case-study header; a
+        question body runs to the next question terminator. Bodies need at
+        least one character and stop before a trailing newline at the end of
+        the text, exactly like the lazy ``(.+?)`` groups and ``$`` of the
+        full patterns. Topics and case studies are tracked independently,
+        as two separate ``finditer`` passes would.
+
+        Returns:
+            Tuple containing:
+            - Sections as (kind, number, name, start, header_end, end)
+            - Questions as (number, start, body_start, end), in document order
+        """
+        sections = []
+        questions = []
+        open_sections = {"topic": None, "case_study": None}
+        open_question = None  # (number, start, body_start)
+        text_length = len(text)
+
+        def end_of_text(body_start: int) -> int:
+            if text.endswith("\n") and text_length - 1 > body_start:
+                return text_length - 1
+            return text_length
+
+        for token in self.boundary_pattern.finditer(text):
+            pos = token.start()
+            topic_header = token.group(1)
+
+            if topic_header is not None or token.group(2) is not None:
+                for kind, section in open_sections.items():
+                    if section is not None and pos > section[4]:
+                        sections.append(section + (pos,))
+                        open_sections[kind] = None
+
+            # "Topic 1 ," ends a topic but not a question
+            is_terminator = topic_header is None or self.topic_terminator_pattern.match(text, pos)
+            if open_question is not None and is_terminator and pos > open_question[2]:
+                questions.append(open_question + (pos,))
+                open_question = None
+
+            if topic_header is not None:
+                if open_sections["topic"] is None:
+                    header = self.topic_header_pattern.match(text, pos)
+                    if header:
+                        open_sections["topic"] = (
+                            "topic", header.group(1), header.group(2).strip(), pos, header.end())
+            elif token.group(2) is not None:
+                if open_sections["case_study"] is None:
+                    header = self.case_study_header_pattern.match(text, pos)
+                    if header:
+                        open_sections["case_study"] = (
+                            "case_study", header.group(1), "", pos, header.end())
+            elif token.group(3) is not None and open_question is None:
+                body_start = token.end() + 1
+                if text[token.end():body_start] == "\n" and body_start < text_length:
+                    open_question = (token.group(4), pos, body_start)
+
+        if open_question is not None:
+            questions.append(open_question + (end_of_text(open_question[2]),))
+        for section in open_sections.values():
+            if section is not None:
+                sections.append(section + (end_of_text(section[4]),))
+        return sections, questions
+
+    def section_case_study_text(self, text: str, start: int, end: int) -> str:
+        """
+        Case study text of one section: everything between the header line
+        and the first "Question: N" marker. Same result as
+        ``extract_case_study_text`` on the section text, without re-scanning it.
+        """
+        prefix = self.case_study_prefix_pattern.search(text, start, end)
+        if prefix is None:
+            return ""
+        # Skip the rest of the header line (at least one character)
+        line_end = text.find("\n", prefix.end() + 1, end)
+        if line_end == -1:
+            return ""
+        case_study_start = line_end + 1
+        marker = self.exact_question_pattern.search(text, case_study_start, end)
+        if marker is None or marker.start() == case_study_start:
+            return ""
+        case_study_text = text[case_study_start:marker.start()].strip()
+        return case_study_text if case_study_text and not case_study_text.isspace() else ""
+
     def extract_topics(self, text: str) -> List[Match]:
         """Extract all topic matches from text."""
         topic_matches = list(self.topic_pattern.finditer(text))
@@ -142,21 +269,17 @@ class TopicProcessor:
 
         return {
             "number": topic_number,
-            "data": {
-                "topic_name": topic_name,
-                "case_study": case_study_text or '',
-                "questions": questions
-            }
+            "data": Topic(
+                topic_name=topic_name,
+                case_study=case_study_text or '',
+                questions=questions
+            )
         }
 
     def extract_case_study_text(self, text: str) -> str:
         """Extract case study text from content."""
 
-        case_study_match = re.search(
-            r"(?s)(Topic \d+\s*, |Case Study: \d+\n).+?\n(.+?)(?=Question: \d+)",
-            text,
-            re.DOTALL
-        )
+        case_study_match = self.case_study_text_pattern.search(text)
         if case_study_match:
             case_study_text = case_study_match.group(2).strip()
             case_study_text = re.sub(r'Question: \d+.*', '', case_study_text, flags=re.DOTALL)
@@ -164,7 +287,7 @@ class TopicProcessor:
             return case_study_text if case_study_text and not case_study_text.isspace() else ""
         return ""
 
-    def extract_questions(self, text: str) -> List[Dict]:
+    def extract_questions(self, text: str) -> List[Question]:
         """Extract questions from text content."""
         questions = []
        
@@ -173,11 +296,13 @@ class TopicProcessor:
             questions.append(question_data)
         return questions
 
-    def process_question_match(self, question_match: Match) -> Dict:
+    def process_question_match(self, question_match: Match) -> Question:
         """Process a single question match and return structured data."""
-        question_number = question_match.group(1)
+        return self.build_question(question_match.group(1), question_match.group(2))
 
-        full_question_text = question_match.group(2).strip()
+    def build_question(self, question_number: str, question_body: str) -> Question:
+        """Build the question from its number and the text following its header."""
+        full_question_text = question_body.strip()
         
         # Split text at "Answer:" to separate options from answer/explanation
         parts = re.split(r'Correct Answer|Answer:', full_question_text, 1)
@@ -186,18 +311,7 @@ class TopicProcessor:
 
         # Extract answer
         answer_match = self.answer_pattern.search(answer_explanation_text)
-        if answer_match and answer_match.group(1).strip():
-            answer_text = answer_match.group(1).strip()
-            answer_text = answer_text.replace(',', '')
-            
-            if ' ' in answer_text:
-                # Space-separated answers (like "A B C")
-                answer = [a.strip() for a in answer_text.split() if a.strip() in ['A', 'B', 'C', 'D', 'E', 'F', 'G']]
-            else:
-                # Concatenated answers (like "ABC")
-                answer = [letter for letter in answer_text if letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G']]
-        else:
-            answer = []
+        answer = self.answer_letters(answer_match.group(1)) if answer_match else []
         
         # Extract explanation
         explanation_match = self.explanation_pattern.search(answer_explanation_text)
@@ -221,24 +335,47 @@ class TopicProcessor:
             question_text = question_text.replace(option_text, "").strip()
         
         question_text = self.clean_question_text(question_text)
+        return self.assemble_question(question_number, question_text, options, answer, explanation)
+
+    def answer_letters(self, answer_text: str) -> List[str]:
+        """Turn the text captured after "Answer:" into a list of option letters."""
+        answer_text = answer_text.strip()
+        if not answer_text:
+            return []
+        answer_text = answer_text.replace(',', '')
+
+        if ' ' in answer_text:
+            # Space-separated answers (like "A B C")
+            return [a.strip() for a in answer_text.split() if a.strip() in ['A', 'B', 'C', 'D', 'E', 'F', 'G']]
+        # Concatenated answers (like "ABC")
+        return [letter for letter in answer_text if letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G']]
+
+    def assemble_question(
+        self,
+        question_number: str,
+        question_text: str,
+        options: List[str],
+        answer: List[str],
+        explanation: str
+    ) -> Question:
+        """
+        Build the question, folding repeated option letters into the question text.
+
+        Dumps only use a handful of distinct answers, so each answer tuple
+        is stored once and shared by every question with that answer.
+        """
         rest_options, final_options = self.split_options(options)
         if rest_options and final_options:
             question_text = self.add_rest_to_question(question_text, rest_options)
-
-            return {
-                "question_number": question_number,
-                "question": question_text,
-                "options": final_options,
-                "answer": answer,
-                "explanation": explanation
-            }
-        return {
-                "question_number": question_number,
-                "question": question_text,
-                "options": rest_options,
-                "answer": answer,
-                "explanation": explanation
-            }
+            rest_options = final_options
+        answer_tuple = tuple(answer)
+        return Question(
+            question_number=question_number,
+            question=question_text,
+            options=tuple(rest_options),
+            answer=self.answer_tuples.setdefault(answer_tuple, answer_tuple),
+            explanation=explanation
+        )
 
     def clean_question_text(self, question_text: str) -> str:
         """Clean the question text by removing option lines."""
@@ -302,18 +439,222 @@ class TopicProcessor:
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, filename)
         with open(output_path, "w") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+            json.dump(data, f, indent=4, ensure_ascii=False, default=jsonable)
         return output_path
 
-def process_content(text: str) -> Dict:
+class LineTopicProcessor(TopicProcessor):
+    """
+    Line-oriented state machine parser with guaranteed O(n) running time.
+
+    Produces the same structure as TopicProcessor. Every line is classified
+    once with anchored checks (question / topic / case-study header, option,
+    answer, explanation) and fed through a small state machine, so no
+    pattern can backtrack across the document, however malformed it is.
+
+    Differences from the regex engine, all on input the regex engine
+    mis-parses anyway: headers and options are only recognised at the start
+    of a line (so "Plan B. then" or "see Question 12" inside a sentence are
+    left alone), a bare "B." line starts option B instead of being glued
+    to the previous option, case-study text runs to the first question
+    header in any spelling, and sections are emitted in document order.
+    """
+
+    ANSWER_CHARACTERS = frozenset("ABCDEFG, \t")
+
+    def __init__(self):
+        super().__init__()
+        # All line patterns are anchored and free of nested quantifiers
+        self.question_header_line = re.compile(r"question[:\s]*(\d+)", re.IGNORECASE)
+        self.topic_header_line = re.compile(r"Topic (\d+)\s*,\s*(.*)")
+        self.case_study_header_line = re.compile(r"Case Study: (\d+)")
+        self.option_line = re.compile(r"([A-G])\.(?:\s+(.*))?")
+
+    def process_text(self, text: str) -> Dict[str, Topic]:
+        """
+        Process text content and return structured data.
+
+        Args:
+            text: The text content to process
+
+        Returns:
+            Topic records (see result_model) keyed "topic<N>"
+        """
+        all_topics_data = {}
+        current = None
+        for kind, key, data in self.iter_events(text.split("\n")):
+            if kind == "topic":
+                current = Topic(**data)
+                all_topics_data[key] = current
+            else:
+                current["questions"].append(data)
+        return all_topics_data
+
+    def is_boundary(self, line: str) -> bool:
+        """Whether ``line`` starts a question, topic or case study."""
+        stripped = line.strip()
+        return bool(
+            self.question_header_line.fullmatch(stripped)
+            or self.topic_header_line.match(stripped)
+            or self.case_study_header_line.fullmatch(stripped)
+        )
+
+    def iter_events(
+        self,
+        lines: Iterable[str],
+        topic: Optional[Tuple[str, str, str]] = None
+    ) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        Parse lines incrementally.
+
+        Yields ("topic", key, {"topic_name", "case_study"}) when a topic's
+        header and case-study text are complete, and ("question", key,
+        question) as soon as each question is complete. Questions before the
+        first topic belong to "topic0", or to ``topic`` (key, topic_name,
+        case_study) when resuming inside a topic that was already reported.
+        """
+        if topic is not None:
+            key, name, case_study = topic
+            topic = [key, name, [case_study] if case_study else [], True]
+        # [key, topic_name, case_study_lines, emitted]
+        awaiting_name = False
+        skip_title = False
+        question = None       # [number, body_lines]
+
+        def start_topic_if_needed():
+            nonlocal topic
+            if topic is None:
+                topic = ["topic0", "", [], False]
+            if not topic[3]:
+                topic[3] = True
+                return ("topic", topic[0], {
+                    "topic_name": topic[1],
+                    "case_study": "\n".join(topic[2]).strip(),
+                })
+            return None
+
+        for line in lines:
+            stripped = line.strip()
+
+            header = self.question_header_line.fullmatch(stripped)
+            if header:
+                if question is not None:
+                    yield ("question", topic[0], self.build_question_from_lines(*question))
+                event = start_topic_if_needed()
+                if event:
+                    yield event
+                question = [header.group(1), []]
+                awaiting_name = skip_title = False
+                continue
+
+            topic_header = self.topic_header_line.match(stripped)
+            case_header = None if topic_header else self.case_study_header_line.fullmatch(stripped)
+            if topic_header or case_header:
+                if question is not None:
+                    yield ("question", topic[0], self.build_question_from_lines(*question))
+                    question = None
+                if topic is not None and not topic[3]:
+                    yield start_topic_if_needed()
+                if topic_header:
+                    topic = [f"topic{topic_header.group(1)}", topic_header.group(2).strip(), [], False]
+                    awaiting_name = not topic[1]
+                    skip_title = False
+                else:
+                    topic = [f"topic{case_header.group(1)}", f"Case Study {case_header.group(1)}", [], False]
+                    awaiting_name = False
+                    skip_title = True
+                continue
+
+            if question is not None:
+                question[1].append(line)
+            elif topic is not None:
+                if awaiting_name:
+                    if stripped:
+                        topic[1] = stripped
+                        awaiting_name = False
+                elif skip_title:
+                    skip_title = False
+                else:
+                    topic[2].append(line)
+
+        if question is not None:
+            yield ("question", topic[0], self.build_question_from_lines(*question))
+        if topic is not None and not topic[3] and topic[0] != "topic0":
+            yield start_topic_if_needed()
+
+    def build_question_from_lines(self, question_number: str, body_lines: List[str]) -> Question:
+        """Build the question from the lines following its header."""
+        question_lines = []
+        options = []  # [letter, content_lines]
+        answer = []
+        explanation_lines = None
+        index = 0
+
+        # Question text and options up to the answer line
+        while index < len(body_lines):
+            line = body_lines[index]
+            stripped = line.strip()
+            if stripped.startswith("Answer:") or stripped.startswith("Correct Answer"):
+                break
+            option = self.option_line.fullmatch(stripped)
+            if option:
+                options.append([option.group(1), [option.group(2) or ""]])
+            elif options:
+                options[-1][1].append(line)
+            else:
+                question_lines.append(line)
+            index += 1
+
+        if index < len(body_lines):
+            # Answer letters: rest of the answer line, plus any following
+            # lines made only of letters / commas
+            stripped = body_lines[index].strip()
+            prefix = "Answer:" if stripped.startswith("Answer:") else "Correct Answer"
+            rest = stripped[len(prefix):].lstrip(": \t")
+            tail = [rest]
+            index += 1
+            if set(rest) <= self.ANSWER_CHARACTERS:
+                while index < len(body_lines) and body_lines[index].strip() \
+                        and set(body_lines[index].strip()) <= self.ANSWER_CHARACTERS:
+                    tail.append(body_lines[index].strip())
+                    index += 1
+                answer = self.answer_letters("\n".join(tail))
+            # Explanation: everything after the first "Explanation:" marker
+            after_answer = [rest] + body_lines[index:]
+            for position, line in enumerate(after_answer):
+                marker = line.find("Explanation:")
+                if marker != -1:
+                    explanation_lines = [line[marker + len("Explanation:"):]] + after_answer[position + 1:]
+                    break
+
+        question_text = self.clean_question_text("\n".join(question_lines).strip())
+        option_texts = [
+            f"{letter}. " + "\n".join(content).strip() for letter, content in options
+        ]
+        explanation = "\n".join(explanation_lines).strip() if explanation_lines else ""
+        return self.assemble_question(question_number, question_text, option_texts, answer, explanation)
+
+
+# Parser engines selectable through process_content / PARSER_ENGINE
+PARSER_ENGINES = {
+    "regex": TopicProcessor,
+    "linear": LineTopicProcessor,
+}
+
+
+def process_content(text: str, engine: Optional[str] = None) -> Dict[str, Topic]:
     """
     Convenience function to process content without instantiating TopicProcessor.
     
     Args:
         text: Text content to process
+        engine: "regex" (TopicProcessor) or "linear" (LineTopicProcessor);
+            defaults to the PARSER_ENGINE environment variable, then "regex"
         
     Returns:
-        Processed topic data as dictionary
+        Topic records (see result_model) keyed "topic<N>"
     """
-    processor = TopicProcessor()
+    engine = engine or os.getenv("PARSER_ENGINE", "regex")
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"Unknown parser engine {engine!r}, expected one of {sorted(PARSER_ENGINES)}")
+    processor = PARSER_ENGINES[engine]()
     return processor.process_text(text)
\ No newline at end of file
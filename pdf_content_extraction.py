@@ -1,46 +1,261 @@
 import fitz
 import os
-from typing import Tuple, List
+import hashlib
+import re
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import compress, islice, repeat
+import operator
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple, List
 import shutil
 
+import metrics
+from metrics import count, stage
+
+# Canonical integers only: what str(int(s)) == s accepts, without raising
+INTEGER_PATTERN = re.compile(r"0|-?[1-9][0-9]*")
+
 def is_integer(s: str) -> bool:
-    try:
-        return str(int(s)) == s
-    except ValueError:
-        return False
+    return INTEGER_PATTERN.fullmatch(s) is not None
 
-def clean_lines(lines: List[str]) -> List[str]:
+# Per-line flags the cleaning rules test, see LineFlags
+FLAG_INTEGER = 1  # A page number
+FLAG_EXAM_DUMPS = 2  # Contains "Exam Dumps"
+
+class CleaningRule:
     """
-    Refined logic:
-    - Match lines with '.COM' or 'CERT MAGE'
-    - Remove those lines and intelligently decide how many surrounding lines to remove
-    """
-    to_remove = set()
-    n = len(lines)
-
-    for i, line in enumerate(lines):
-        if line.endswith(".COM") or "CERT MAGE" in line:
-            match_idx = i
-            to_remove.add(match_idx)
-            # breakpoint()
-            prev = lines[i - 1] if i - 1 >= 0 else ""
-            next_ = lines[i + 1] if i + 1 < n else ""
-            next2 = lines[i + 2] if i + 2 < n else ""
-
-            if is_integer(prev):
-                to_remove.update(range(max(0, i - 3), i))
-            elif is_integer(next_):
-                if not is_integer(next2) and "Exam Dumps" not in next2:
-                    to_remove.update([i + 1, i + 2])
-                else:
-                    to_remove.update(range(i + 1, min(n, i + 4)))
-            elif "Exam Dumps" in prev:
-                to_remove.update(range(max(0, i - 2), i))
-            elif "Exam Dumps" in next_:
-                to_remove.update(range(i + 1, min(n, i + 3)))
-            
+    One rule of the line cleaning filter (see iter_filter_lines).
+
+    A line triggers the rule when it contains one of ``markers`` or ends
+    with one of ``suffixes`` (plain text, no regexes: every line is
+    scanned for them, see iter_filter_lines). A window rule drops
+    every line ``removals(flags, i)`` returns for a triggering line ``i``,
+    deciding from the LineFlags of the lines around it; ``back`` and
+    ``ahead`` bound how far it may look or reach, which is all the
+    streaming filter has to hold back. A rule with ``drop_next_kept``
+    instead runs on the lines the window rules kept and drops the
+    triggering line together with the next kept line.
+
+    New vendor watermarks are added by appending a rule to CLEANING_RULES.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        markers: Tuple[str, ...] = (),
+        suffixes: Tuple[str, ...] = (),
+        removals: Optional[Callable[["LineFlags", int], Iterable[int]]] = None,
+        back: int = 0,
+        ahead: int = 0,
+        drop_next_kept: bool = False
+    ):
+        self.name = name
+        self.markers = markers
+        self.suffixes = suffixes
+        self.removals = removals
+        self.back = back
+        self.ahead = ahead
+        self.drop_next_kept = drop_next_kept
+
+    def triggered_by(self, line: str) -> bool:
+        return line.endswith(self.suffixes) or any(marker in line for marker in self.markers)
+
+def _triggered(rules: List[CleaningRule], lines: List[str], start: int = 0) -> List[int]:
+    """
+    Sorted indices (offset by ``start``) of the ``lines`` that trigger any of ``rules``.
+
+    Each marker and the suffixes are looked for with one map() over all
+    lines, which keeps the per-line work in C.
+    """
+    found: Set[int] = set()
+    positions = range(start, start + len(lines))
+    suffixes = tuple(suffix for rule in rules for suffix in rule.suffixes)
+    if suffixes:
+        found.update(compress(positions, map(str.endswith, lines, repeat(suffixes))))
+    for marker in {marker for rule in rules for marker in rule.markers}:
+        found.update(compress(positions, map(operator.contains, lines, repeat(marker))))
+    return sorted(found)
+
+class LineFlags:
+    """
+    FLAG_* bits of the lines of a window, each computed once, on first use.
+
+    Rules only look at the few lines around a trigger, so the flags of
+    every other line are never computed.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self._flags: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __getitem__(self, i: int) -> int:
+        flags = self._flags.get(i)
+        if flags is None:
+            line = self.lines[i]
+            flags = FLAG_INTEGER if is_integer(line) else 0
+            if "Exam Dumps" in line:
+                flags |= FLAG_EXAM_DUMPS
+            self._flags[i] = flags
+        return flags
+
+    def reset(self) -> None:
+        """Forget computed flags after the window's lines moved."""
+        self._flags.clear()
+
+def vendor_watermark_removals(flags: LineFlags, i: int) -> Iterable[int]:
+    """
+    Indices to drop for the '.COM' / 'CERT MAGE' watermark at line ``i``.
+
+    Decides from the neighbouring page numbers and "Exam Dumps" lines how
+    much page furniture goes with it; looks at most 3 lines back and 3
+    lines ahead.
+    """
+    n = len(flags)
+    prev = flags[i - 1] if i - 1 >= 0 else 0
+    next_ = flags[i + 1] if i + 1 < n else 0
+    next2 = flags[i + 2] if i + 2 < n else 0
+
+    if prev & FLAG_INTEGER:
+        return range(max(0, i - 3), i + 1)
+    if next_ & FLAG_INTEGER:
+        if not next2 & (FLAG_INTEGER | FLAG_EXAM_DUMPS):
+            return (i, i + 1, i + 2)
+        return range(i, min(n, i + 4))
+    if prev & FLAG_EXAM_DUMPS:
+        return range(max(0, i - 2), i + 1)
+    if next_ & FLAG_EXAM_DUMPS:
+        return range(i, min(n, i + 3))
+    return (i,)
+
+CLEANING_RULES: List[CleaningRule] = [
+    CleaningRule(
+        "vendor-watermark", markers=("CERT MAGE",), suffixes=(".COM",),
+        removals=vendor_watermark_removals, back=3, ahead=3,
+    ),
+    # The "Questions and Answers PDF" banner and the line after it
+    CleaningRule("qna-pdf-banner", markers=("Questions and Answers PDF",), drop_next_kept=True),
+]
+
+def _without(lines: List[str], drop: Iterable[int]) -> List[str]:
+    """``lines`` minus the indices in ``drop``, copied a slice at a time."""
+    kept: List[str] = []
+    start = 0
+    for idx in sorted(drop):
+        if idx >= len(lines):
+            break
+        if idx >= start:
+            kept.extend(lines[start:idx])
+            start = idx + 1
+    kept.extend(lines[start:])
+    return kept
+
+class LineFilter:
+    """
+    Single-pass cleaning filter over lines fed in batches (see iter_filter_lines).
+
+    The few triggering lines of a batch are found with C-level scans (see
+    _triggered); only those lines and their neighbours' LineFlags are
+    looked at in Python, and kept lines are copied a slice at a time
+    between the dropped ones. A line is released once no later match can
+    reach back to it, so at most ``back`` + ``ahead`` lines are held
+    between batches.
+    """
+
+    def __init__(self, rules: Optional[List[CleaningRule]] = None):
+        rules = CLEANING_RULES if rules is None else rules
+        self.window_rules = [rule for rule in rules if not rule.drop_next_kept]
+        self.banner_rules = [rule for rule in rules if rule.drop_next_kept]
+        self.back = max((rule.back for rule in self.window_rules), default=0)
+        self.ahead = max((rule.ahead for rule in self.window_rules), default=0)
+        self.window: List[str] = []
+        self.flags = LineFlags(self.window)
+        self.to_remove: Set[int] = set()
+        self.checked = 0  # Window index of the next line to test for a match
+        self.skip_next = False  # The last line released was a banner
+
+    def feed(self, lines: List[str]) -> List[str]:
+        """Add ``lines`` and return the lines that are now final and kept."""
+        self.window.extend(lines)
+        # Lines whose ``ahead`` lines have all arrived can be matched
+        return self._release(len(self.window) - self.ahead, self.back)
+
+    def finish(self) -> List[str]:
+        """Return the kept lines still held back at the end of the input."""
+        return self._release(len(self.window), 0)
+
+    def _release(self, stop: int, back: int) -> List[str]:
+        window = self.window
+        if stop > self.checked:
+            single = len(self.window_rules) == 1
+            for i in _triggered(self.window_rules, window[self.checked:stop], self.checked):
+                for rule in self.window_rules:
+                    if single or rule.triggered_by(window[i]):
+                        self.to_remove.update(rule.removals(self.flags, i))
+            self.checked = stop
+
+        final = self.checked - back
+        if final <= 0:
+            return []
+        kept = _without(window[:final], self.to_remove) if self.to_remove else window[:final]
+
+        if self.banner_rules:
+            banners = _triggered(self.banner_rules, kept)
+            if banners or self.skip_next:
+                skipped = {0} if self.skip_next else set()
+                for idx in banners:
+                    if idx not in skipped:
+                        skipped.update((idx, idx + 1))
+                self.skip_next = len(kept) in skipped
+                kept = _without(kept, skipped)
+
+        del window[:final]
+        self.flags.reset()
+        self.to_remove = {idx - final for idx in self.to_remove if idx >= final}
+        self.checked -= final
+        return kept
+
+def iter_filter_lines(
+    lines: Iterable[str],
+    rules: Optional[List[CleaningRule]] = None,
+    batch: int = 64
+) -> Iterator[str]:
+    """
+    Streaming filter_lines: lines are read and cleaned ``batch`` at a time.
+
+    At most ``batch`` + ``back`` + ``ahead`` lines are held (see LineFilter).
+    """
+    line_filter = LineFilter(rules)
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, batch))
+        if not chunk:
+            break
+        yield from line_filter.feed(chunk)
+    yield from line_filter.finish()
+
+def filter_lines(lines: List[str], rules: Optional[List[CleaningRule]] = None) -> List[str]:
+    """Apply every cleaning rule (default: CLEANING_RULES) in one pass."""
+    line_filter = LineFilter(rules)
+    return line_filter.feed(lines) + line_filter.finish()
+
+def _rules(drop_next_kept: bool) -> List[CleaningRule]:
+    return [rule for rule in CLEANING_RULES if rule.drop_next_kept == drop_next_kept]
+
+def clean_lines(lines: List[str]) -> List[str]:
+    """Remove vendor watermark lines and the page furniture around them."""
+    return filter_lines(lines, _rules(drop_next_kept=False))
 
-    return [line for idx, line in enumerate(lines) if idx not in to_remove]
+def iter_clean_lines(lines: Iterable[str], batch: int = 64) -> Iterator[str]:
+    """Streaming clean_lines: same output, but only a small window is held."""
+    return iter_filter_lines(lines, _rules(drop_next_kept=False), batch)
+
+def iter_remove_qna_pdf_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Streaming remove_qna_pdf_lines."""
+    return iter_filter_lines(lines, _rules(drop_next_kept=True), batch=1)
 
 def remove_qna_pdf_lines(lines: List[str]) -> List[str]:
     """
@@ -52,64 +267,428 @@ def remove_qna_pdf_lines(lines: List[str]) -> List[str]:
     Returns:
         Filtered list with the target line and the next line removed
     """
-    filtered_lines = []
-    skip_next = False
-    
-    for line in lines:
-        if skip_next:
-            skip_next = False
-            continue
-        
-        if 'Questions and Answers PDF' in line:
-            skip_next = True
-            continue
-        
-        filtered_lines.append(line)
-    
-    return filtered_lines
+    return list(iter_remove_qna_pdf_lines(lines))
+
+def open_pdf(pdf_path: str = "", pdf_stream: Optional[bytes] = None) -> fitz.Document:
+    """Open a PDF from an in-memory buffer if one is given, otherwise from disk."""
+    if pdf_stream is not None:
+        return fitz.open(stream=pdf_stream, filetype="pdf")
+    return fitz.open(pdf_path)
 
 def ensure_directory_exists(directory: str) -> None:
     """Create directory if it doesn't exist."""
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def parse_pdf_and_extract_images(
-    pdf_path: str,
-    output_img_dir: str = "static/images",
-    output_txt_path: str = "extracted_text.txt"
-) -> Tuple[str, List[str], List[str]]:
+# How extraction handles images: "full" decodes and writes every image,
+# "refs" only records where each image is (see ImageIndex.refer) and "none"
+# leaves them out of the text entirely
+IMAGE_MODES = ("full", "refs", "none")
+
+# get_text("dict") flags that skip image blocks, so no image is ever decoded
+TEXT_ONLY_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# "/Name Do" paints an XObject; "BI" starts an inline image
+XOBJECT_DRAW_PATTERN = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s+Do\b")
+INLINE_IMAGE_PATTERN = re.compile(rb"\bBI\b")
+
+class PageLine(str):
+    """A text line that remembers the page (0-based index) it was read from."""
+
+    def __new__(cls, text: str, page: int):
+        line = super().__new__(cls, text)
+        line.page = page
+        return line
+
+def write_file(full_path: str, data: bytes, atomic: bool = False) -> None:
     """
-    Parses the PDF and returns both the output path and extracted lines.
-    
+    Write ``data`` to ``full_path``; with ``atomic``, to a temporary file
+    renamed into place, so a reader never sees a half-written image.
+    """
+    if not atomic:
+        with open(full_path, "wb") as f:
+            f.write(data)
+        return
+    temp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class ImageWriter:
+    """
+    Writes image files on background threads while extraction carries on.
+
+    Images are handed over in batches of up to ``batch_size`` files (or
+    ``batch_bytes``), each written by one thread in one go: handing every
+    small file to a thread on its own costs about as much as writing it.
+    At most ``max_batches`` batches wait to be written (``submit`` blocks
+    until one finishes), so a dump full of large screenshots cannot pile
+    up in memory. Each target directory is created once, on first use.
+    Write errors do not interrupt extraction; ``close`` waits for every
+    pending write and returns them as (full path, error) pairs.
+    """
+
+    def __init__(
+        self,
+        threads: int = 1,
+        atomic: bool = False,
+        batch_size: int = 32,
+        batch_bytes: int = 8 * 1024 * 1024,
+        max_batches: int = 4
+    ):
+        self.atomic = atomic
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="image-writer")
+        self._slots = threading.BoundedSemaphore(max_batches)
+        self._batch: List[Tuple[str, bytes]] = []
+        self._batched_bytes = 0
+        self._directories: Set[str] = set()
+        self._errors: List[Tuple[str, Exception]] = []
+        self._lock = threading.Lock()
+
+    def submit(self, full_path: str, data: bytes) -> None:
+        """Queue ``data`` to be written to ``full_path``."""
+        directory = os.path.dirname(full_path)
+        if directory not in self._directories:
+            os.makedirs(directory, exist_ok=True)
+            self._directories.add(directory)
+        self._batch.append((full_path, data))
+        self._batched_bytes += len(data)
+        if len(self._batch) >= self.batch_size or self._batched_bytes >= self.batch_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand the images queued so far to a writer thread."""
+        if not self._batch:
+            return
+        batch, self._batch, self._batched_bytes = self._batch, [], 0
+        # Waiting for a free slot is the only write time extraction sees
+        with stage("image_write"):
+            self._slots.acquire()
+        try:
+            self._executor.submit(self._write_batch, batch)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _write_batch(self, batch: List[Tuple[str, bytes]]) -> None:
+        try:
+            for full_path, data in batch:
+                try:
+                    write_file(full_path, data, self.atomic)
+                except Exception as e:
+                    with self._lock:
+                        self._errors.append((full_path, e))
+        finally:
+            self._slots.release()
+
+    def close(self) -> List[Tuple[str, Exception]]:
+        """Write what is still queued, wait for every write; returns the writes that failed."""
+        try:
+            self.flush()
+        finally:
+            with stage("image_write"):
+                self._executor.shutdown(wait=True)
+        return self._errors
+
+class ImageIndex:
+    """
+    Per-document record of saved images, so each distinct image is decoded
+    and written once.
+
+    ``xref_paths`` short-circuits repeated references to the same PDF image
+    object before ``doc.extract_image`` is called; ``hash_paths`` catches
+    identical bytes stored under different xrefs (or inline images without
+    one). Every later placeholder points at the first file written.
+
+    With a ``url_prefix``, images are referenced in the text by their final
+    public URL (prefix + file name) instead of an ``<img src='images/...'>``
+    placeholder, so nothing has to rewrite the parsed result afterwards.
+
+    In the "refs" image mode nothing is written: ``refs`` lists each PDF
+    image object (xref, page, bbox) once, for extraction on demand.
+
+    With a ``writer``, files are handed to it instead of being written
+    before ``save`` returns; ``finish_writes`` then has to be called once
+    extraction is done.
+    """
+
+    def __init__(self, url_prefix: str = "", writer: Optional[ImageWriter] = None):
+        self.url_prefix = url_prefix
+        self.writer = writer
+        self.write_errors = 0
+        self.xref_paths: Dict[int, Tuple[str, int]] = {}
+        self.hash_paths: Dict[str, str] = {}
+        # (relative_path, sha256, size) for every file actually written, in order
+        self.written: List[Tuple[str, str, int]] = []
+        self.duplicate_images = 0
+        self.bytes_saved = 0
+        self.refs: List[Dict] = []
+        # Content digest of each referenced image, keyed by name
+        self.ref_digests: Dict[str, str] = {}
+        self._referenced: Set[int] = set()
+
+    def reference(self, relative_path: str) -> str:
+        """The text line standing in for the image saved at ``relative_path``."""
+        if self.url_prefix:
+            return self.url_prefix + os.path.basename(relative_path)
+        return f"<img src='{relative_path}'>"
+
+    def is_referenced(self, xref: int) -> bool:
+        return xref in self._referenced
+
+    def refer(
+        self,
+        xref: int,
+        page_index: int,
+        bbox: Tuple[float, float, float, float],
+        digest: Optional[str] = None
+    ) -> str:
+        """
+        Record image ``xref`` without extracting it and return its text line.
+
+        ``digest`` identifies the image's content (see xref_digest) for the
+        question bank; it is only needed the first time an xref is seen.
+        """
+        if xref in self._referenced:
+            self.duplicate_images += 1
+        else:
+            self._referenced.add(xref)
+            self.refs.append({"name": str(xref), "xref": xref, "page": page_index + 1, "bbox": list(bbox)})
+            if digest is not None:
+                self.ref_digests[str(xref)] = digest
+        return self.reference(os.path.join("images", str(xref)))
+
+    def lookup_xref(self, xref: int) -> Optional[str]:
+        """Return the path already saved for ``xref``, counting it as a duplicate."""
+        if xref not in self.xref_paths:
+            return None
+        relative_path, size = self.xref_paths[xref]
+        self.duplicate_images += 1
+        self.bytes_saved += size
+        return relative_path
+
+    def save(
+        self,
+        img_bytes: bytes,
+        img_filename: str,
+        output_img_dir: str,
+        xref: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        """
+        Write ``img_bytes`` unless identical bytes were already saved.
+
+        Returns:
+            Tuple of (relative path to reference, whether a new file was written)
+        """
+        digest = hashlib.sha256(img_bytes).hexdigest()
+        relative_path = self.hash_paths.get(digest)
+        is_new = relative_path is None
+        if is_new:
+            full_path = os.path.join(output_img_dir, img_filename)
+            if self.writer is not None:
+                self.writer.submit(full_path, img_bytes)
+            else:
+                try:
+                    with stage("image_write"):
+                        write_file(full_path, img_bytes)
+                except Exception:
+                    self.write_errors += 1
+                    raise
+            # Store relative path for web access
+            relative_path = os.path.join("images", img_filename)
+            self.hash_paths[digest] = relative_path
+            self.written.append((relative_path, digest, len(img_bytes)))
+        else:
+            self.duplicate_images += 1
+            self.bytes_saved += len(img_bytes)
+        if xref is not None:
+            self.xref_paths[xref] = (relative_path, len(img_bytes))
+        return relative_path, is_new
+
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "images_written": len(self.written),
+            "duplicate_images": self.duplicate_images,
+            "bytes_saved": self.bytes_saved,
+        }
+        if self.refs:
+            stats["images_referenced"] = len(self.refs)
+        if self.write_errors:
+            stats["image_write_errors"] = self.write_errors
+        return stats
+
+    def finish_writes(self, lines: List[str], extracted_images: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Wait for the writer's pending writes and drop the images that failed.
+
+        Lines referencing a failed image become the same "<image could not
+        be extracted>" placeholder a synchronous write error gives, and the
+        image is forgotten (not listed, not hashed, not de-duplicated
+        against). Returns the updated (lines, extracted_images).
+        """
+        if self.writer is None:
+            return lines, extracted_images
+        errors = self.writer.close()
+        self.writer = None
+        if not errors:
+            return lines, extracted_images
+
+        failed = set()
+        for full_path, error in errors:
+            print(f"Error saving image: {error}")
+            failed.add(os.path.join("images", os.path.basename(full_path)))
+        self.write_errors += len(errors)
+        self.written = [entry for entry in self.written if entry[0] not in failed]
+        self.hash_paths = {digest: path for digest, path in self.hash_paths.items() if path not in failed}
+        self.xref_paths = {xref: entry for xref, entry in self.xref_paths.items() if entry[0] not in failed}
+        failed_lines = {self.reference(path) for path in failed}
+        return (
+            ["<image could not be extracted>" if line in failed_lines else line for line in lines],
+            [path for path in extracted_images if path not in failed],
+        )
+
+    def digests(self) -> Dict[str, str]:
+        """SHA-256 of every written image, keyed by file name, and xref_digest of every referenced one."""
+        digests = {os.path.basename(path): digest for path, digest, _ in self.written}
+        digests.update(self.ref_digests)
+        return digests
+
+
+def xref_digest(doc: fitz.Document, xref: int) -> Optional[str]:
+    """
+    SHA-256 of an image's stream as stored in the PDF, without decoding it.
+
+    The same image embedded in two PDFs has the same stream bytes but not
+    the same xref, so this is what tells the question bank two "refs"
+    mode questions show the same image. It differs from the digest of the
+    decoded file "full" mode writes.
+    """
+    try:
+        data = doc.xref_stream_raw(xref)
+    except (RuntimeError, ValueError):
+        return None
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+def _image_placements(page: fitz.Page) -> Optional[Dict[int, Tuple[int, Tuple[float, ...]]]]:
+    """
+    Block number -> (xref, bbox) of every image on ``page``, without decoding any.
+
+    get_image_info lists the image blocks in drawing order but without their
+    xref (asking for it hashes every image); the page's content stream
+    gives the same drawing order by resource name, and the names map to
+    xrefs. Returns None when the two cannot be lined up (inline images,
+    images inside form XObjects, names that are not images); such a page
+    is extracted in full instead.
+    """
+    infos = page.get_image_info()
+    if not infos:
+        return {}
+    items = page.get_images(full=True)
+    if any(item[-1] != 0 for item in items):
+        return None
+    contents = page.read_contents()
+    if INLINE_IMAGE_PATTERN.search(contents):
+        return None
+    xrefs_by_name = {item[7].encode(): item[0] for item in items}
+    drawn = [xrefs_by_name.get(name) for name in XOBJECT_DRAW_PATTERN.findall(contents)]
+    if len(drawn) != len(infos) or None in drawn:
+        return None
+    return {info["number"]: (xref, tuple(info["bbox"])) for info, xref in zip(infos, drawn)}
+
+def extract_page_range(
+    doc: fitz.Document,
+    start: int,
+    stop: int,
+    output_img_dir: str,
+    image_index: Optional[ImageIndex] = None,
+    on_page: Optional[Callable[[], None]] = None,
+    images: str = "full"
+) -> Tuple[List[str], List[str]]:
+    """
+    Extracts text lines and image placeholders for pages ``start``..``stop - 1``.
+
     Args:
-        pdf_path: Path to the PDF file
+        doc: Open PyMuPDF document
+        start: Index of the first page to process
+        stop: Index one past the last page to process
         output_img_dir: Directory to save extracted images
-        output_txt_path: Path to save extracted text
-        
+        image_index: Images already saved for this document (shared across calls)
+        on_page: Called after each page is done
+        images: Image mode, see IMAGE_MODES
+
     Returns:
-        Tuple containing:
-        - Path to the output text file
-        - List of extracted and cleaned text lines
-        - List of extracted image paths
+        Tuple of (lines with image placeholders, relative paths of newly written images)
     """
-    # Ensure the image directory exists
-    ensure_directory_exists(output_img_dir)
-    
-    # Create static directory if using relative paths
-    if not os.path.isabs(output_img_dir):
-        ensure_directory_exists("static")
-    
-    doc = fitz.open(pdf_path)
     lines_with_placeholders = []
     extracted_images = []
+    for page_lines, page_images in iter_page_range(
+            doc, start, stop, output_img_dir, image_index, images):
+        lines_with_placeholders.extend(page_lines)
+        extracted_images.extend(page_images)
+        if on_page is not None:
+            on_page()
+
+    return lines_with_placeholders, extracted_images
+
+def iter_page_range(
+    doc: fitz.Document,
+    start: int,
+    stop: int,
+    output_img_dir: str,
+    image_index: Optional[ImageIndex] = None,
+    images: str = "full"
+) -> Iterator[Tuple[List[str], List[str]]]:
+    """
+    Page-by-page extract_page_range.
+
+    With ``images="none"`` or ``"refs"`` the text is read without image
+    blocks, so no image is decoded; "refs" then places a reference line
+    for each image where its block would have been.
+
+    Yields:
+        (lines with image placeholders, relative paths of newly written images)
+        for each page; unless ``image_index`` has a writer, a page's images
+        are on disk by the time it is yielded
+    """
+    if image_index is None:
+        image_index = ImageIndex()
 
-    for page_index in range(1, len(doc)):  # Skip first and last pages
+    for page_index in range(start, stop):
+        lines_with_placeholders = []
+        extracted_images = []
         page = doc[page_index]
-        page_dict = page.get_text("dict")
+        with stage("get_text"):
+            placements = {} if images == "none" else _image_placements(page) if images == "refs" else None
+            if placements is None:
+                page_dict = page.get_text("dict")
+            else:
+                page_dict = page.get_text("dict", flags=TEXT_ONLY_FLAGS)
+        count("pages")
+        if placements is not None:
+            # Image blocks are numbered in the same sequence as text blocks
+            page_dict["blocks"] = sorted(
+                page_dict["blocks"] + [
+                    {"number": number, "xref_ref": xref, "bbox": bbox}
+                    for number, (xref, bbox) in placements.items()
+                ],
+                key=lambda block: block["number"],
+            )
         image_count = 0
 
         for block in page_dict["blocks"]:
-            if "image" in block:
+            if "xref_ref" in block:
+                xref = block["xref_ref"]
+                digest = None if image_index.is_referenced(xref) else xref_digest(doc, xref)
+                lines_with_placeholders.append(image_index.refer(xref, page_index, block["bbox"], digest))
+            elif "image" in block:
                 image_obj = block["image"]
                 image_count += 1
 
@@ -117,20 +696,17 @@ def parse_pdf_and_extract_images(
                     xref = image_obj.get("xref")
                     if xref is not None:
                         try:
-                            base_image = doc.extract_image(xref)
-                            ext = base_image["ext"]
-                            img_bytes = base_image["image"]
-                            img_filename = f"page_{page_index + 1}_img_{image_count}.{ext}"
-                            full_path = os.path.join(output_img_dir, img_filename)
-                            
-                            # Save the image
-                            with open(full_path, "wb") as f:
-                                f.write(img_bytes)
-                            
-                            # Store relative path for web access
-                            relative_path = os.path.join("images", img_filename)
-                            lines_with_placeholders.append(f"<img src='{relative_path}'>")
-                            extracted_images.append(relative_path)
+                            relative_path = image_index.lookup_xref(xref)
+                            if relative_path is None:
+                                with stage("image_decode"):
+                                    base_image = doc.extract_image(xref)
+                                ext = base_image["ext"]
+                                img_filename = f"page_{page_index + 1}_img_{image_count}.{ext}"
+                                relative_path, is_new = image_index.save(
+                                    base_image["image"], img_filename, output_img_dir, xref)
+                                if is_new:
+                                    extracted_images.append(relative_path)
+                            lines_with_placeholders.append(image_index.reference(relative_path))
                         except Exception as e:
                             print(f"Error extracting image: {e}")
                             lines_with_placeholders.append("<image could not be extracted>")
@@ -140,14 +716,11 @@ def parse_pdf_and_extract_images(
                 elif isinstance(image_obj, bytes):
                     try:
                         img_filename = f"page_{page_index + 1}_img_{image_count}.jpg"
-                        full_path = os.path.join(output_img_dir, img_filename)
-                        with open(full_path, "wb") as f:
-                            f.write(image_obj)
-                        
-                        # Store relative path for web access
-                        relative_path = os.path.join("images", img_filename)
-                        lines_with_placeholders.append(f"<img src='{relative_path}'>")
-                        extracted_images.append(relative_path)
+                        relative_path, is_new = image_index.save(
+                            image_obj, img_filename, output_img_dir)
+                        if is_new:
+                            extracted_images.append(relative_path)
+                        lines_with_placeholders.append(image_index.reference(relative_path))
                     except Exception as e:
                         print(f"Error saving image: {e}")
                         lines_with_placeholders.append("<image could not be extracted>")
@@ -160,11 +733,263 @@ def parse_pdf_and_extract_images(
                     if text_line:
                         lines_with_placeholders.append(text_line)
 
+        yield lines_with_placeholders, extracted_images
+
+def _page_counter(
+    start: int,
+    stop: int,
+    progress: Optional[Callable[[int, int], None]]
+) -> Optional[Callable[[], None]]:
+    """Adapt a (pages_done, pages_total) callback to extract_page_range's ``on_page``."""
+    if progress is None:
+        return None
+    done = 0
+
+    def on_page() -> None:
+        nonlocal done
+        done += 1
+        progress(done, stop - start)
+
+    return on_page
+
+def _image_writer(images: str, write_threads: int, atomic_writes: bool) -> Optional[ImageWriter]:
+    """The background writer for an extraction, or None to write images synchronously."""
+    if images == "none" or write_threads < 1:
+        return None
+    return ImageWriter(write_threads, atomic_writes)
+
+def _extract_page_range_worker(
+    pdf_path: str,
+    pdf_stream: Optional[bytes],
+    start: int,
+    stop: int,
+    output_img_dir: str,
+    image_url_prefix: str = "",
+    images: str = "full",
+    write_threads: int = 0,
+    atomic_writes: bool = False
+) -> Tuple[List[str], List[str], ImageIndex]:
+    """Worker entry point: open the PDF in this process and extract one chunk."""
+    doc = open_pdf(pdf_path, pdf_stream)
+    image_index = ImageIndex(image_url_prefix, _image_writer(images, write_threads, atomic_writes))
+    try:
+        lines, images = extract_page_range(
+            doc, start, stop, output_img_dir, image_index, images=images)
+    except BaseException:
+        image_index.finish_writes([], [])
+        raise
+    finally:
+        doc.close()
+    # Every file is on disk before the chunk is merged (or deleted as a duplicate)
+    lines, images = image_index.finish_writes(lines, images)
+    return lines, images, image_index
+
+def split_page_range(start: int, stop: int, chunks: int) -> List[Tuple[int, int]]:
+    """Split ``range(start, stop)`` into at most ``chunks`` contiguous (start, stop) pairs."""
+    total = max(stop - start, 0)
+    chunks = max(1, min(chunks, total))
+    size, extra = divmod(total, chunks)
+    ranges = []
+    for i in range(chunks):
+        chunk_stop = start + size + (1 if i < extra else 0)
+        if chunk_stop > start:
+            ranges.append((start, chunk_stop))
+        start = chunk_stop
+    return ranges
+
+def _merge_chunk_images(
+    image_index: ImageIndex,
+    chunk_lines: List[str],
+    chunk_images: List[str],
+    chunk_index: ImageIndex,
+    output_img_dir: str
+) -> Tuple[List[str], List[str]]:
+    """
+    Fold one chunk's images into the document-wide index.
+
+    Images a chunk wrote that an earlier chunk already saved are deleted and
+    their placeholders repointed, which leaves the same files and lines the
+    serial path would have produced.
+    """
+    image_index.duplicate_images += chunk_index.duplicate_images
+    image_index.bytes_saved += chunk_index.bytes_saved
+    image_index.write_errors += chunk_index.write_errors
+    for ref in chunk_index.refs:
+        image_index.refer(ref["xref"], ref["page"] - 1, ref["bbox"], chunk_index.ref_digests.get(ref["name"]))
+
+    remapped = {}
+    for relative_path, digest, size in chunk_index.written:
+        canonical = image_index.hash_paths.get(digest)
+        if canonical is None:
+            image_index.hash_paths[digest] = relative_path
+            image_index.written.append((relative_path, digest, size))
+        else:
+            remapped[image_index.reference(relative_path)] = image_index.reference(canonical)
+            remapped[relative_path] = canonical
+            os.remove(os.path.join(output_img_dir, os.path.basename(relative_path)))
+            image_index.duplicate_images += 1
+            image_index.bytes_saved += size
+
+    if not remapped:
+        return chunk_lines, chunk_images
+    return (
+        [remapped.get(line, line) for line in chunk_lines],
+        [path for path in chunk_images if path not in remapped],
+    )
+
+def _extract_pages_parallel(
+    pdf_path: str,
+    pdf_stream: Optional[bytes],
+    output_img_dir: str,
+    page_workers: int,
+    image_index: ImageIndex,
+    progress: Optional[Callable[[int, int], None]] = None,
+    start: int = 1,
+    stop: Optional[int] = None,
+    images: str = "full",
+    write_threads: int = 0,
+    atomic_writes: bool = False
+) -> Tuple[List[str], List[str]]:
+    """
+    Extract pages ``start``..``stop`` - 1 in ``page_workers`` processes and merge in page order.
+
+    Every chunk writes its own images (file names only depend on the page
+    number and image position), and images repeated across chunks are
+    folded back by content hash, so the merged output is identical to the
+    serial path. ``progress`` is called as each chunk is merged.
+    """
+    doc = open_pdf(pdf_path, pdf_stream)
+    stop = len(doc) if stop is None else min(stop, len(doc))
+
+    ranges = split_page_range(start, stop, page_workers)
+    if len(ranges) <= 1:
+        try:
+            return extract_page_range(
+                doc, start, stop, output_img_dir, image_index,
+                _page_counter(start, stop, progress), images)
+        finally:
+            doc.close()
     doc.close()
 
+    lines_with_placeholders = []
+    extracted_images = []
+    with ProcessPoolExecutor(
+        max_workers=len(ranges),
+        mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                metrics.record, _extract_page_range_worker, pdf_path, pdf_stream, chunk_start, chunk_stop,
+                output_img_dir, image_index.url_prefix, images, write_threads, atomic_writes)
+            for chunk_start, chunk_stop in ranges
+        ]
+        # Futures are collected in submission order, i.e. page order
+        for (_, chunk_stop), future in zip(ranges, futures):
+            (chunk_lines, chunk_images, chunk_index), chunk_run = future.result()
+            # Stage times of the chunks add up, so they can exceed the wall time
+            metrics.merge(chunk_run)
+            chunk_lines, chunk_images = _merge_chunk_images(
+                image_index, chunk_lines, chunk_images, chunk_index, output_img_dir)
+            lines_with_placeholders.extend(chunk_lines)
+            extracted_images.extend(chunk_images)
+            if progress is not None:
+                progress(chunk_stop - start, stop - start)
+
+    return lines_with_placeholders, extracted_images
+
+def parse_pdf_and_extract_images(
+    pdf_path: str,
+    output_img_dir: str = "static/images",
+    output_txt_path: str = "extracted_text.txt",
+    page_workers: int = 1,
+    stats: Optional[Dict[str, int]] = None,
+    pdf_stream: Optional[bytes] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    image_hashes: Optional[Dict[str, str]] = None,
+    image_url_prefix: str = "",
+    start: int = 1,
+    stop: Optional[int] = None,
+    images: str = "full",
+    image_refs: Optional[List[Dict]] = None,
+    write_threads: int = 1,
+    atomic_writes: bool = False
+) -> Tuple[str, List[str], List[str]]:
+    """
+    Parses the PDF and returns both the output path and extracted lines.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        output_img_dir: Directory to save extracted images
+        output_txt_path: Path to save extracted text
+        page_workers: Number of processes to split the page range across
+            (1 = extract serially in this process)
+        stats: Optional dict that is filled with extraction counters
+            (images_written, duplicate_images, bytes_saved, and
+            image_write_errors when writes failed)
+        pdf_stream: PDF content already in memory; when given, ``pdf_path``
+            is ignored and nothing is read from disk
+        progress: Optional callback receiving (pages_done, pages_total) as
+            extraction advances
+        image_hashes: Optional dict that is filled with the SHA-256 of every
+            written image, keyed by file name
+        image_url_prefix: When given, images appear in the lines as
+            ``image_url_prefix + file name`` instead of an
+            ``<img src='images/...'>`` placeholder
+        start: First page to read (0-based index; page 0 is the cover)
+        stop: Page index to stop before (default: the end of the document);
+            pages outside ``start``..``stop`` are never touched
+        images: "full" writes every image, "refs" writes none and references
+            each by xref, "none" leaves images out (see IMAGE_MODES)
+        image_refs: Optional list that is filled with the images referenced
+            in "refs" mode: name, xref, page (1-based) and bbox
+        write_threads: Threads writing image files in the background while
+            pages are read (0 = write each image before moving on); the
+            function returns once every write is done
+        atomic_writes: Write each image to a temporary file and rename it
+            into place
+        
+    Returns:
+        Tuple containing:
+        - Path to the output text file
+        - List of extracted and cleaned text lines
+        - List of extracted image paths (each distinct image once)
+    """
+    # Ensure the image directory exists
+    ensure_directory_exists(output_img_dir)
+    
+    # Create static directory if using relative paths
+    if not os.path.isabs(output_img_dir):
+        ensure_directory_exists("static")
+    
+    image_index = ImageIndex(image_url_prefix, _image_writer(images, write_threads, atomic_writes))
+    try:
+        if page_workers > 1:
+            lines_with_placeholders, extracted_images = _extract_pages_parallel(
+                pdf_path, pdf_stream, output_img_dir, page_workers, image_index, progress, start, stop,
+                images, write_threads, atomic_writes)
+        else:
+            doc = open_pdf(pdf_path, pdf_stream)
+            stop = len(doc) if stop is None else min(stop, len(doc))
+            lines_with_placeholders, extracted_images = extract_page_range(
+                doc, start, stop, output_img_dir, image_index,  # Skip the cover page
+                _page_counter(start, stop, progress), images)
+            doc.close()
+    except BaseException:
+        image_index.finish_writes([], [])
+        raise
+    lines_with_placeholders, extracted_images = image_index.finish_writes(
+        lines_with_placeholders, extracted_images)
+
+    if stats is not None:
+        stats.update(image_index.stats())
+    if image_hashes is not None:
+        image_hashes.update(image_index.digests())
+    if image_refs is not None:
+        image_refs.extend(image_index.refs)
+
     # Apply post-filtering rules
-    cleaned_lines = clean_lines(lines_with_placeholders)
-    cleaned_lines = remove_qna_pdf_lines(cleaned_lines)
+    with stage("clean"):
+        cleaned_lines = filter_lines(lines_with_placeholders)
 
     # Write to file if path is provided
     if output_txt_path:
@@ -174,6 +999,53 @@ def parse_pdf_and_extract_images(
 
     return output_txt_path, cleaned_lines, extracted_images
 
+def iter_pdf_lines(
+    pdf_path: str = "",
+    output_img_dir: str = "static/images",
+    pdf_stream: Optional[bytes] = None,
+    image_index: Optional[ImageIndex] = None,
+    extracted_images: Optional[List[str]] = None,
+    start: int = 1,
+    stop: Optional[int] = None,
+    tag_pages: bool = False,
+    clean_batch: int = 64,
+    images: str = "full"
+) -> Iterator[str]:
+    """
+    Streaming parse_pdf_and_extract_images: yields cleaned lines as pages are read.
+
+    Produces the same lines as the serial path. Newly written images are
+    appended to ``extracted_images`` before any line referring to them is
+    yielded, and ``image_index`` can be passed in to read the stats after
+    (and to reference images by URL, see ImageIndex).
+
+    With ``tag_pages`` the lines are PageLine objects carrying their page
+    index. Lines are held back ``clean_batch`` at a time for the watermark
+    cleaning, so a consumer that stops early makes the reader run ahead
+    by at most that many lines.
+    """
+    ensure_directory_exists(output_img_dir)
+    if image_index is None:
+        image_index = ImageIndex()
+
+    def raw_lines() -> Iterator[str]:
+        doc = open_pdf(pdf_path, pdf_stream)
+        try:
+            page_index = start
+            for page_lines, page_images in iter_page_range(
+                    doc, start, len(doc) if stop is None else min(stop, len(doc)),
+                    output_img_dir, image_index, images):
+                if extracted_images is not None:
+                    extracted_images.extend(page_images)
+                if tag_pages:
+                    page_lines = [PageLine(line, page_index) for line in page_lines]
+                page_index += 1
+                yield from page_lines
+        finally:
+            doc.close()
+
+    return iter_filter_lines(raw_lines(), batch=clean_batch)
+
 # if __name__ == "__main__":
 #     pdf_file = "/Users/dev/Documents/pdf_parser_final/docs/Cert-Empire-CISSP-Exam-Demo-PDF.pdf"
 #     output_path, lines, images = parse_pdf_and_extract_images(
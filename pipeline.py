@@ -0,0 +1,520 @@
+import base64
+import json
+import os
+import re
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+from metrics import count, stage
+from pdf_content_extraction import ImageIndex, iter_pdf_lines, open_pdf, parse_pdf_and_extract_images
+from parse_pdf_into_json import LineTopicProcessor, process_content
+from question_bank import QuestionBank
+from result_model import Topic
+from remove_duplicate_question import duplicate_record, make_duplicate_index, remove_duplicate_questions
+from search_index import SearchIndex
+
+# Text-to-JSON engine, see parse_pdf_into_json.PARSER_ENGINES
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "regex")
+
+# "exact" (normalized text) or "similar" (MinHash/LSH near-duplicates, see
+# remove_duplicate_question.make_duplicate_index)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "exact")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))
+
+# Questions seen in earlier uploads (None unless QUESTION_BANK_PATH is set)
+QUESTION_BANK = QuestionBank.from_env()
+
+# Full-text index of the questions of every processed document, see GET /search
+SEARCH_INDEX = SearchIndex.from_env()
+
+# Bump whenever extraction, parsing or de-duplication output changes; cached
+# results produced by an older version (or other settings) are then ignored.
+PARSER_VERSION = (
+    f"3-{PARSER_ENGINE}-{DEDUP_MODE}"
+    + (f"-{DEDUP_THRESHOLD}" if DEDUP_MODE == "similar" else "")
+    + ("-bank" if QUESTION_BANK is not None else "")
+)
+
+# Anything in an image URL the watermark cleaning or the parser engines could
+# mistake for a marker, see image_url_prefix
+TEXT_MARKER_PATTERN = re.compile(
+    r"question[:\s]*\d|topic \d|case study:|answer|explanation:|cert mage|exam dumps",
+    re.IGNORECASE,
+)
+
+# Processes each PDF's page range is split across (1 = serial extraction)
+PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", 1))
+
+# Threads writing extracted images in the background (0 = write synchronously),
+# and whether each image is written to a temporary file and renamed into place
+IMAGE_WRITE_THREADS = int(os.getenv("PDF_IMAGE_WRITE_THREADS", 1))
+ATOMIC_IMAGE_WRITES = os.getenv("PDF_ATOMIC_IMAGE_WRITES", "0") == "1"
+
+
+class InvalidRangeError(ValueError):
+    """Raised by run_pipeline_range for a range that starts past the last page."""
+
+
+def image_url_prefix(original_filename: str) -> str:
+    """
+    URL prefix of a document's extracted images.
+
+    Images are referenced by URL in the extracted text itself, so a file
+    name that the cleaning or parsing rules would react to (e.g.
+    "Question 12 Exam Dumps") is percent-encoded, digits included; the URL
+    still resolves to the same directory.
+    """
+    if TEXT_MARKER_PATTERN.search(original_filename):
+        original_filename = "".join(
+            f"%{ord(char):02X}" if char.isdigit() and char.isascii() else quote(char, safe="")
+            for char in original_filename
+        )
+    return f"/static/images/{original_filename}/"
+
+
+def document_image_prefix(document_id: str) -> str:
+    """URL prefix of the images of a document processed with ``images="refs"``."""
+    return f"/documents/{document_id}/images/"
+
+
+def image_payload(
+    extracted_images: List[str],
+    image_refs: List[Dict],
+    image_digests: Dict[str, str],
+    url_prefix: str,
+    document_id: str
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Public image URLs of a run and the image identities the question bank matches on.
+
+    Referenced images are identified by the hash of their stream (see
+    pdf_content_extraction.xref_digest), so the same image matches across
+    documents; one whose stream could not be read falls back to document
+    and xref.
+    """
+    urls = [url_prefix + os.path.basename(img) for img in extracted_images]
+    urls.extend(url_prefix + ref["name"] for ref in image_refs)
+    identities = dict(image_digests)
+    for ref in image_refs:
+        identities.setdefault(ref["name"], f"{document_id}/{ref['xref']}")
+    return urls, identities
+
+
+def count_questions(topics: Dict) -> int:
+    """Total number of questions across all topics."""
+    return sum(len(topic["questions"]) for topic in topics.values())
+
+
+def count_run(payload: Dict) -> None:
+    """Record a run's question and image counts with the metrics (see metrics.record)."""
+    kept = count_questions(payload["result"]["topics"])
+    count("questions_kept", kept)
+    dropped = payload.get("question_bank", {}).get("dropped", 0)
+    count("questions_parsed", kept + dropped + len(payload["duplicates"]))
+    count("duplicates", len(payload["duplicates"]))
+    for name in ("images_written", "duplicate_images", "images_referenced"):
+        count(name, payload["image_stats"].get(name, 0))
+
+
+def index_questions(topics: Dict, document_id: str, original_filename: str, replace: bool = True) -> None:
+    """Add a document's parsed questions to the search index, if there is one (see SearchIndex.add_topics)."""
+    if SEARCH_INDEX is None or not document_id:
+        return
+    with stage("search_index"):
+        SEARCH_INDEX.add_topics(topics, document_id, original_filename, replace)
+
+
+def index_cached_questions(topics: Dict, document_id: str, original_filename: str, replace: bool = True) -> None:
+    """
+    Index the questions of a result served from the result cache, unless the
+    document is in the search index already.
+
+    A cached result never went through the pipeline while the index was on
+    (or was indexed, then evicted), and the cache key does not change when
+    SEARCH_INDEX_PATH is set.
+    """
+    if SEARCH_INDEX is None or not document_id or SEARCH_INDEX.has_document(document_id):
+        return
+    SEARCH_INDEX.add_topics(topics, document_id, original_filename, replace)
+
+
+def run_pipeline(
+    pdf_source: Union[str, bytes],
+    pdf_image_dir: str,
+    original_filename: str,
+    progress: Optional[Callable[..., None]] = None,
+    document_id: str = "",
+    drop_known: bool = False,
+    images: str = "full"
+) -> Dict:
+    """
+    Run extraction -> parsing -> de-duplication for a single PDF.
+
+    This is a plain module-level function so it can be shipped to a worker
+    process; everything it needs is passed in and the return value is a
+    picklable payload, serialized with result_model.to_json.
+
+    Args:
+        pdf_source: Path to the PDF file on disk, or the PDF bytes themselves
+        pdf_image_dir: Directory the extracted images are written to
+        original_filename: Upload filename without extension, used in image URLs
+        progress: Optional ``progress(stage, **counters)`` callback, called as
+            each stage starts or advances: "extracting" (pages_done,
+            pages_total), "parsing", "deduplicating" (questions_parsed). It
+            must be picklable when the pipeline runs in a worker process.
+        document_id: Identifies the PDF (its content hash) in the question bank
+            and the search index
+        drop_known: Drop questions the question bank first saw in another
+            document instead of only flagging them
+        images: "full" writes every image to ``pdf_image_dir``; "refs" only
+            writes those it cannot tie to an xref and points at the
+            /documents/{document_id}/images/ route, which extracts the others
+            on demand; "none" leaves images out
+
+    Returns:
+        Dictionary with the de-duplicated "result", the public "images" paths,
+        "image_stats" (images written, duplicates skipped, bytes saved),
+        "image_refs" in "refs" mode (name, xref, page and bbox of each image),
+        "duplicates" (each removed question and the question it matched) and,
+        with a question bank configured, "question_bank" (new / known /
+        dropped counts); questions then carry "question_id" and "already_known"
+    """
+    def report(stage: str, **counters: int) -> None:
+        if progress is not None:
+            progress(stage, **counters)
+
+    extraction_stats: Dict[str, int] = {}
+    image_digests: Dict[str, str] = {}
+    image_refs: List[Dict] = []
+    url_prefix = document_image_prefix(document_id) if images == "refs" else image_url_prefix(original_filename)
+    with stage("extract"):
+        _, cleaned_lines, extracted_images = parse_pdf_and_extract_images(
+            pdf_path=pdf_source if isinstance(pdf_source, str) else "",
+            pdf_stream=pdf_source if isinstance(pdf_source, bytes) else None,
+            output_img_dir=pdf_image_dir,
+            output_txt_path="",
+            page_workers=PAGE_WORKERS,
+            stats=extraction_stats,
+            progress=lambda done, total: report("extracting", pages_done=done, pages_total=total),
+            image_hashes=image_digests,
+            image_url_prefix=url_prefix,
+            images=images,
+            image_refs=image_refs,
+            write_threads=IMAGE_WRITE_THREADS,
+            atomic_writes=ATOMIC_IMAGE_WRITES
+        )
+
+    report("parsing")
+    with stage("parse"):
+        text_content = "\n".join(cleaned_lines)
+        result = process_content(text_content, engine=PARSER_ENGINE)
+
+    # Image references in the text already are the public URLs
+    full_image_paths, image_hashes = image_payload(
+        extracted_images, image_refs, image_digests, url_prefix, document_id)
+
+    report("deduplicating", questions_parsed=count_questions(result))
+    duplicates: List[Dict] = []
+    with stage("dedup"):
+        de_dup_result = remove_duplicate_questions(
+            {"topics": result}, DEDUP_MODE, DEDUP_THRESHOLD, duplicates)
+
+    payload = {
+        "result": de_dup_result,
+        "images": full_image_paths,
+        "image_stats": extraction_stats,
+        "duplicates": duplicates
+    }
+    if image_refs:
+        payload["image_refs"] = image_refs
+    if QUESTION_BANK is not None:
+        with stage("question_bank"):
+            payload["question_bank"] = QUESTION_BANK.annotate(
+                de_dup_result["topics"], document_id, image_hashes, drop_known)
+    index_questions(de_dup_result["topics"], document_id, original_filename)
+    count_run(payload)
+    return payload
+
+
+def encode_cursor(document_id: str, page: int, boundary: int, topic: Tuple[str, str, str]) -> str:
+    """
+    Opaque token for resuming a document at a header line.
+
+    The position is the ``boundary``-th question / topic / case-study header
+    on page index ``page``; ``topic`` is the (key, topic_name, case_study)
+    the text there belongs to.
+    """
+    state = {"doc": document_id, "page": page, "boundary": boundary, "topic": list(topic)}
+    packed = zlib.compress(json.dumps(state, ensure_ascii=False).encode("utf-8"))
+    return base64.urlsafe_b64encode(packed).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, document_id: str) -> Dict:
+    """
+    Read back an encode_cursor token.
+
+    Raises:
+        ValueError: if the cursor is malformed (or points before the first
+            page) or was issued for another PDF
+    """
+    try:
+        packed = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(zlib.decompress(packed))
+        page, boundary = int(state["page"]), int(state["boundary"])
+        key, name, case_study = (str(value) for value in state["topic"])
+        owner = state["doc"]
+    except (ValueError, TypeError, KeyError, zlib.error):
+        raise ValueError("Invalid cursor")
+    if page < 0 or boundary < 0:
+        raise ValueError("Invalid cursor")
+    if owner != document_id:
+        raise ValueError("Cursor was issued for a different PDF")
+    return {"page": page, "boundary": boundary, "topic": (key, name, case_study)}
+
+
+def run_pipeline_range(
+    pdf_source: Union[str, bytes],
+    pdf_image_dir: str,
+    original_filename: str,
+    start_page: int = 2,
+    end_page: Optional[int] = None,
+    max_questions: Optional[int] = None,
+    cursor: Optional[Dict] = None,
+    document_id: str = "",
+    drop_known: bool = False,
+    images: str = "full"
+) -> Dict:
+    """
+    run_pipeline over part of a PDF, stopping as soon as enough questions are parsed.
+
+    Pages are read lazily with the linear engine (as in iter_pipeline), so
+    pages after the last question needed are never extracted. A range holds
+    the questions that start between ``start_page`` and ``end_page``; the
+    last one is read on past ``end_page`` until it is complete, so no
+    question is ever split between two ranges.
+
+    Args:
+        pdf_source, pdf_image_dir, original_filename, document_id, drop_known,
+        images: As for run_pipeline
+        start_page: First page to read (1-based; page 1 is the cover)
+        end_page: Last page a question of the range may start on
+            (default: the last page)
+        max_questions: Stop once this many questions are parsed
+        cursor: A decoded "next_cursor" of an earlier range of the same PDF
+            (see decode_cursor); replaces ``start_page``
+
+    Returns:
+        run_pipeline's payload for the range, plus "pages" (first and last
+        page read, total page count) and "next_cursor", the token to
+        continue after this range with, or None at the end of the document.
+        Duplicates are only looked for within the range.
+
+    Raises:
+        InvalidRangeError: if ``start_page`` (or the cursor's page) is past
+            the last page
+    """
+    pdf_path = pdf_source if isinstance(pdf_source, str) else ""
+    pdf_stream = pdf_source if isinstance(pdf_source, bytes) else None
+    doc = open_pdf(pdf_path, pdf_stream)
+    page_count = len(doc)
+    doc.close()
+
+    start = cursor["page"] if cursor is not None else start_page - 1
+    if start >= page_count:
+        raise InvalidRangeError(
+            "Invalid cursor" if cursor is not None else f"start_page is past the last page ({page_count})")
+    seed_topic = cursor["topic"] if cursor is not None else None
+
+    url_prefix = document_image_prefix(document_id) if images == "refs" else image_url_prefix(original_filename)
+    image_index = ImageIndex(url_prefix)
+    extracted_images: List[str] = []
+    processor = LineTopicProcessor()
+    lines = iter_pdf_lines(
+        pdf_path=pdf_path,
+        pdf_stream=pdf_stream,
+        output_img_dir=pdf_image_dir,
+        image_index=image_index,
+        extracted_images=extracted_images,
+        start=start,
+        tag_pages=True,
+        clean_batch=1,
+        images=images
+    )
+
+    # The last header line the parser has read: whether it starts a
+    # question, its (page, n-th header on that page) position, and whether
+    # it lies past end_page
+    fed = {"question": False, "position": None, "past_end": False, "page": start, "exhausted": False}
+
+    def feed() -> Iterator[str]:
+        page, boundaries = None, 0
+        # Resuming: skip to the header line the cursor points at
+        skipping = cursor is not None
+        for line in lines:
+            if line.page != page:
+                page, boundaries = line.page, 0
+            position = None
+            if processor.is_boundary(line):
+                position = (page, boundaries)
+                boundaries += 1
+            if skipping:
+                if position is None or (page == start and position[1] < cursor["boundary"]):
+                    continue
+                skipping = False
+            fed["page"] = page
+            if position is not None:
+                fed["question"] = bool(processor.question_header_line.fullmatch(line.strip()))
+                fed["position"] = position
+                fed["past_end"] = end_page is not None and page >= end_page
+            yield line
+        fed["exhausted"] = True
+
+    topics: Dict[str, Topic] = {}
+    if seed_topic is not None:
+        topics[seed_topic[0]] = Topic(topic_name=seed_topic[1], case_study=seed_topic[2])
+
+    def topic_state(key: str) -> Tuple[str, str, str]:
+        return (key, topics[key]["topic_name"], topics[key]["case_study"])
+
+    parsed = 0
+    resume_at = None  # (position, topic state) the next range starts from
+    for kind, key, data in processor.iter_events(feed(), seed_topic):
+        # Events are emitted when the next header line is read, so once a
+        # range is full that header line is where the next range starts
+        full = not fed["exhausted"] and (
+            fed["past_end"] or (max_questions is not None and parsed >= max_questions))
+        if kind == "topic":
+            if full and fed["question"]:
+                # The topic's first question starts the next range
+                resume_at = (fed["position"], (key, data["topic_name"], data["case_study"]))
+                break
+            topics[key] = Topic(**data)
+        else:
+            topics.setdefault(key, {"topic_name": "", "case_study": "", "questions": []})["questions"].append(data)
+            parsed += 1
+            full = full or (not fed["exhausted"] and max_questions is not None and parsed >= max_questions)
+        if full:
+            resume_at = (fed["position"], topic_state(key))
+            break
+    lines.close()
+
+    # A resumed topic is reported again only if the range added questions to it
+    if seed_topic is not None and not topics[seed_topic[0]]["questions"]:
+        del topics[seed_topic[0]]
+
+    full_image_paths, image_hashes = image_payload(
+        extracted_images, image_index.refs, image_index.digests(), url_prefix, document_id)
+    duplicates: List[Dict] = []
+    with stage("dedup"):
+        de_dup_result = remove_duplicate_questions(
+            {"topics": topics}, DEDUP_MODE, DEDUP_THRESHOLD, duplicates)
+    payload = {
+        "result": de_dup_result,
+        "images": full_image_paths,
+        "image_stats": image_index.stats(),
+        "duplicates": duplicates,
+        "pages": {"start": start + 1, "end": fed["page"] + 1, "total": page_count},
+        "next_cursor": None if resume_at is None else encode_cursor(document_id, *resume_at[0], resume_at[1]),
+    }
+    if image_index.refs:
+        payload["image_refs"] = image_index.refs
+    if QUESTION_BANK is not None:
+        with stage("question_bank"):
+            payload["question_bank"] = QUESTION_BANK.annotate(
+                de_dup_result["topics"], document_id, image_hashes, drop_known)
+    index_questions(de_dup_result["topics"], document_id, original_filename, replace=False)
+    count_run(payload)
+    return payload
+
+
+def iter_pipeline(
+    pdf_source: Union[str, bytes],
+    pdf_image_dir: str,
+    original_filename: str,
+    document_id: str = "",
+    drop_known: bool = False,
+    images: str = "full"
+) -> Iterator[Dict]:
+    """
+    Streaming run_pipeline: yields events while the PDF is still being read.
+
+    Pages are extracted and cleaned lazily, the linear parser engine emits
+    each topic and question as soon as it is complete, and duplicates are
+    dropped on the fly (first occurrence wins, as in remove_duplicate_questions).
+    Events, in document order:
+
+        {"type": "topic", "topic": key, "topic_name": ..., "case_study": ...}
+        {"type": "question", "topic": key, "question": {...}}
+        {"type": "duplicate", **duplicate_record(...)}
+        {"type": "done", "images": [...], "image_stats": {...}}
+
+    With a question bank configured, questions are annotated (or dropped)
+    one at a time as in run_pipeline and "done" carries "question_bank".
+    The questions are added to the search index together, once the whole
+    PDF has been read.
+    ``images`` is as for run_pipeline; in "refs" mode "done" also carries
+    "image_refs". The run's counters are recorded as in run_pipeline
+    before "done" is yielded (see metrics.record_iter).
+
+    The regex engine needs the whole text, so the stream always uses the
+    linear engine; its output only differs from the regex engine's on
+    malformed dumps (see LineTopicProcessor).
+    """
+    url_prefix = document_image_prefix(document_id) if images == "refs" else image_url_prefix(original_filename)
+    image_index = ImageIndex(url_prefix)
+    extracted_images: List[str] = []
+    duplicate_index = make_duplicate_index(DEDUP_MODE, DEDUP_THRESHOLD)
+    bank_stats = {"new": 0, "known": 0, "dropped": 0}
+
+    lines = iter_pdf_lines(
+        pdf_path=pdf_source if isinstance(pdf_source, str) else "",
+        pdf_stream=pdf_source if isinstance(pdf_source, bytes) else None,
+        output_img_dir=pdf_image_dir,
+        image_index=image_index,
+        extracted_images=extracted_images,
+        images=images
+    )
+    # What the search index gets once the stream is done, as in process_text
+    topics: Dict[str, Dict] = {}
+    duplicates: List[Dict] = []
+    # Image identities only change when a page brings new images
+    image_hashes: Dict[str, str] = {}
+    hashed_images = (0, 0)
+    for kind, key, data in LineTopicProcessor().iter_events(lines):
+        if kind == "topic":
+            topics[key] = {**data, "questions": []}
+            yield {"type": "topic", "topic": key, **data}
+            continue
+
+        found = duplicate_index.match(data, (key, data["question_number"]))
+        if found is not None:
+            duplicates.append(duplicate_record(key, data, *found))
+            yield {"type": "duplicate", **duplicates[-1]}
+            continue
+
+        if QUESTION_BANK is not None:
+            topic = {"questions": [data]}
+            if hashed_images != (len(extracted_images), len(image_index.refs)):
+                hashed_images = (len(extracted_images), len(image_index.refs))
+                _, image_hashes = image_payload(
+                    extracted_images, image_index.refs, image_index.digests(), url_prefix, document_id)
+            for name, seen in QUESTION_BANK.annotate(
+                    {key: topic}, document_id, image_hashes, drop_known).items():
+                bank_stats[name] += seen
+            if not topic["questions"]:
+                continue
+
+        topics.setdefault(key, {"topic_name": "", "case_study": "", "questions": []})["questions"].append(data)
+        yield {"type": "question", "topic": key, "question": data}
+
+    index_questions(topics, document_id, original_filename)
+    full_image_paths, _ = image_payload(
+        extracted_images, image_index.refs, image_index.digests(), url_prefix, document_id)
+    done = {"type": "done", "images": full_image_paths, "image_stats": image_index.stats()}
+    if image_index.refs:
+        done["image_refs"] = image_index.refs
+    if QUESTION_BANK is not None:
+        done["question_bank"] = bank_stats
+    count_run({**done, "result": {"topics": topics}, "duplicates": duplicates})
+    yield done
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from near_duplicates import IMAGE_REF_PATTERN, question_texts
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+
+def question_fingerprint(question: Dict, image_hashes: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    128-bit fingerprint of a question's normalized text and options.
+
+    Text is lower-cased with whitespace collapsed, option letters are
+    stripped and options sorted, and image references are replaced by the
+    image's content hash when known, since image file names depend on the
+    page they were extracted from.
+    """
+    image_hashes = image_hashes or {}
+
+    def normalize(text: str) -> str:
+        text = IMAGE_REF_PATTERN.sub(
+            lambda match: f" image:{image_hashes.get(match.group(1), match.group(1))} ", text)
+        return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+    texts = [normalize(text) for text in question_texts(question)]
+    canonical = "\x1f".join([texts[0]] + sorted(texts[1:]))
+    return hashlib.sha256(canonical.encode("utf-8")).digest()[:16]
+
+
+def question_id(fingerprint: bytes) -> str:
+    """Stable public id of a question: the same question gets the same id in every upload."""
+    return "q_" + fingerprint.hex()
+
+
+class QuestionBank:
+    """
+    Persistent index of every question seen across uploads, stored in SQLite.
+
+    Rows are keyed by question_fingerprint in a WITHOUT ROWID table, so a
+    lookup is a single primary-key probe whose cost stays flat (a handful
+    of page reads) as the bank grows to millions of rows; a document's
+    questions are looked up in chunked IN (...) queries. Each question
+    remembers the document it was first seen in, so re-processing that
+    same document does not report its own questions as already known.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS questions (
+                    fingerprint BLOB PRIMARY KEY,
+                    first_document TEXT NOT NULL,
+                    first_seen REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+
+    @classmethod
+    def from_env(cls) -> Optional["QuestionBank"]:
+        """
+        Build a bank from the environment.
+
+        QUESTION_BANK_PATH: SQLite file (default: unset, the bank is disabled)
+        """
+        path = os.getenv("QUESTION_BANK_PATH", "")
+        return cls(path) if path else None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        # WAL stays consistent with NORMAL; only the last commits can be lost
+        # on power failure, and stream annotation commits once per question
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, fingerprints: Iterable[bytes], document_id: str) -> Dict[bytes, str]:
+        """
+        Add unseen fingerprints under ``document_id``.
+
+        Returns:
+            Mapping of each fingerprint to the document it was first seen in
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        first_documents: Dict[bytes, str] = {}
+        with self._connect() as conn:
+            # Take the write lock up front so two uploads registering the
+            # same new question cannot both claim to have seen it first
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(fingerprints), LOOKUP_CHUNK):
+                chunk = fingerprints[start:start + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                first_documents.update(conn.execute(
+                    f"SELECT fingerprint, first_document FROM questions "
+                    f"WHERE fingerprint IN ({placeholders})",
+                    chunk,
+                ))
+            new_rows = [
+                (fingerprint, document_id, time.time())
+                for fingerprint in fingerprints if fingerprint not in first_documents
+            ]
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (fingerprint, first_document, first_seen) "
+                "VALUES (?, ?, ?)",
+                new_rows,
+            )
+        for fingerprint, document, _ in new_rows:
+            first_documents[fingerprint] = document
+        return first_documents
+
+    def annotate(
+        self,
+        topics: Dict,
+        document_id: str,
+        image_hashes: Optional[Dict[str, str]] = None,
+        drop_known: bool = False
+    ) -> Dict[str, int]:
+        """
+        Give every question a stable "question_id" and an "already_known" flag.
+
+        A question is already known when the bank first saw it in another
+        document. With ``drop_known`` such questions are removed instead.
+
+        Returns:
+            Counters: "new", "known" and "dropped" questions
+        """
+        located: List[Tuple[Dict, bytes]] = [
+            (question, question_fingerprint(question, image_hashes))
+            for topic in topics.values()
+            for question in topic["questions"]
+        ]
+        first_documents = self.register((fingerprint for _, fingerprint in located), document_id)
+
+        stats = {"new": 0, "known": 0, "dropped": 0}
+        known_ids = set()
+        for question, fingerprint in located:
+            question["question_id"] = question_id(fingerprint)
+            question["already_known"] = first_documents[fingerprint] != document_id
+            if question["already_known"]:
+                stats["known"] += 1
+                known_ids.add(id(question))
+            else:
+                stats["new"] += 1
+
+        if drop_known and known_ids:
+            for topic in topics.values():
+                kept = [question for question in topic["questions"] if id(question) not in known_ids]
+                stats["dropped"] += len(topic["questions"]) - len(kept)
+                topic["questions"] = kept
+        return stats
@@ -1,24 +1,101 @@
-def remove_duplicate_questions(json_data):
+from near_duplicates import MinHashLSHIndex
+
+DEDUP_MODES = ("exact", "similar")
+
+
+def question_key(question):
+    """Key two questions are considered duplicates under (normalized question text)."""
+    return question["question"].strip().lower()
+
+
+class ExactDuplicateIndex:
+    """Same interface as MinHashLSHIndex, matching on question_key only."""
+
+    def __init__(self):
+        self._refs = {}
+
+    def match(self, question, ref):
+        """Return (ref of the earlier identical question, 1.0), or index this one and return None."""
+        key = question_key(question)
+        if key in self._refs:
+            return self._refs[key], 1.0
+        self._refs[key] = ref
+        return None
+
+
+def make_duplicate_index(mode="exact", threshold=0.8):
+    """
+    Build the index used to spot duplicates.
+
+    "exact" drops questions whose normalized text was already seen;
+    "similar" also drops near-duplicates (whitespace, punctuation, small
+    wording or option-order differences) whose text + options shingle sets
+    reach ``threshold`` Jaccard similarity.
+    """
+    if mode == "exact":
+        return ExactDuplicateIndex()
+    if mode == "similar":
+        return MinHashLSHIndex(threshold=threshold)
+    raise ValueError(f"Unknown dedup mode {mode!r}, expected one of {DEDUP_MODES}")
+
+
+def duplicate_record(topic_key, question, match, similarity):
+    """
+    Describe a removed question and the kept question it matched.
+
+    ``match`` is the (topic, question number) ref of the kept question, or
+    (document, topic, question number) when it may come from another PDF.
+    """
+    record = {
+        "topic": topic_key,
+        "question_number": question["question_number"],
+    }
+    if len(match) == 3:
+        record["matched_document"] = match[0]
+    record.update(
+        matched_topic=match[-2],
+        matched_question_number=match[-1],
+        similarity=round(similarity, 4),
+    )
+    return record
+
+
+def remove_duplicate_questions(json_data, mode="exact", threshold=0.8, duplicates=None,
+                               index=None, document=None):
     """Remove duplicate questions from all topics in the JSON data.
     Handles dynamic topic keys (topic0, topic1, etc.) and maintains question uniqueness across all topics.
+
+    Args:
+        json_data: {"topics": {...}} as produced by the parser
+        mode: "exact" or "similar", see make_duplicate_index
+        threshold: Jaccard similarity for the "similar" mode
+        duplicates: Optional list that receives one duplicate_record per
+            removed question, naming the question it matched
+        index: Optional index from make_duplicate_index to keep using, so
+            questions seen in earlier calls (other PDFs) count as duplicates
+        document: Name of the PDF ``json_data`` comes from, recorded with
+            each kept question so matches across PDFs can name it
     """
-    seen_questions = set()
-    # breakpoint()
+    if index is None:
+        index = make_duplicate_index(mode, threshold)
     # Iterate through all topics in the JSON data
     for topic_key, topic_data in json_data["topics"].items():
-        # breakpoint()
         cleaned_questions = []
         
         # Process each question in the current topic
         for question in topic_data["questions"]:
-            question_text = question["question"].strip().lower()  # Normalize for comparison
+            ref = (topic_key, question["question_number"])
+            found = index.match(question, ref if document is None else (document,) + ref)
             
-            if question_text not in seen_questions:
-                seen_questions.add(question_text)
+            if found is None:
                 cleaned_questions.append(question)
             else:
+                match, similarity = found
                 print(f"Removing duplicate question from {topic_key}: "
-                      f"Q{question['question_number']} - {question['question'][:50]}...")
+                      f"Q{question['question_number']} - {question['question'][:50]}... "
+                      f"(matches {' '.join(match[:-1])} Q{match[-1]}, similarity {similarity:.2f})")
+                if duplicates is not None:
+                    duplicates.append(duplicate_record(topic_key, question, match, similarity))
         
         # Update the current topic with cleaned questions
         topic_data["questions"] = cleaned_questions
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from result_model import from_json, to_json
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of final /process-pdf/ payloads, stored in SQLite.
+
+    Entries are keyed by the SHA-256 of the uploaded PDF bytes plus the
+    parser version, so bumping ``PARSER_VERSION`` invalidates every entry
+    produced by older parsing code. A connection is opened per call, which
+    keeps the cache safe to use from several worker processes.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        if self.enabled:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS results (
+                        key TEXT PRIMARY KEY,
+                        payload TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """
+        Build a cache from the environment.
+
+        RESULT_CACHE_PATH: SQLite file (default: cache/results.sqlite3)
+        RESULT_CACHE_MAX_BYTES: total payload budget (default: 256 MiB, 0 = disabled)
+        """
+        return cls(
+            path=os.getenv("RESULT_CACHE_PATH", os.path.join("cache", "results.sqlite3")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(content_hash: str, parser_version: str) -> str:
+        """Combine the document hash and parser version into a cache key."""
+        return f"{content_hash}:{parser_version}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached payload for ``key`` and mark it recently used."""
+        if not self.enabled:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        return from_json(row[0])
+
+    def put(self, key: str, payload: Dict) -> None:
+        """Store ``payload`` under ``key``, evicting least recently used entries."""
+        if not self.enabled:
+            return
+        # Stored as the UTF-8 bytes to_json writes, without decoding them to str
+        data = to_json(payload)
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        """Drop a single entry (e.g. when its images are gone from disk)."""
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+                "SELECT key, size FROM results ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
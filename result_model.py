@@ -0,0 +1,113 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+# Fields a Question only has once the question bank annotated it; they are
+# left out of the JSON until then, like the keys they replace
+OPTIONAL_FIELDS = ("question_id", "already_known")
+
+
+class Record:
+    """
+    Dict-style access to a slotted result record.
+
+    Parsed results used to be plain dicts, and cached payloads still are
+    (they come back from JSON); de-duplication, the question bank and the
+    pipeline keep reading and writing ``question["question"]`` and
+    ``topic["questions"]``, so both work on either.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+        if value is None and key in OPTIONAL_FIELDS:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __reduce__(self) -> Tuple[type, Tuple[Any, ...]]:
+        # Pickled positionally (results travel from worker processes):
+        # no per-record state dict repeating the field names
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The record as the dict it is serialized as (optional fields only when set)."""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in OPTIONAL_FIELDS:
+            if data.get(name, True) is None:
+                del data[name]
+        return data
+
+
+@dataclass(slots=True)
+class Question(Record):
+    """
+    One parsed question.
+
+    Serialized as {"question_number", "question", "options", "answer",
+    "explanation"}, plus "question_id" and "already_known" once the
+    question bank annotated it. Options and answer letters are tuples;
+    identical answer tuples are shared (see TopicProcessor.assemble_question).
+    """
+
+    question_number: str
+    question: str
+    options: Tuple[str, ...]
+    answer: Tuple[str, ...]
+    explanation: str
+    question_id: Optional[str] = None
+    already_known: Optional[bool] = None
+
+
+@dataclass(slots=True)
+class Topic(Record):
+    """A topic or case study: {"topic_name", "case_study", "questions"}."""
+
+    topic_name: str
+    case_study: str
+    questions: List[Question] = field(default_factory=list)
+
+
+def jsonable(obj: Any) -> Dict[str, Any]:
+    """``default`` hook for json / orjson: records become their dicts."""
+    if isinstance(obj, Record):
+        return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_json(data: Any) -> bytes:
+    """
+    Serialize a payload (dicts, lists and records) to UTF-8 JSON.
+
+    orjson writes bytes directly, without the intermediate str json.dumps
+    builds and the copy .encode() makes; records go through ``jsonable``.
+    """
+    return orjson.dumps(data, default=jsonable, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def from_json(data: bytes) -> Any:
+    """Parse JSON written by to_json (or any JSON text) back into plain dicts and lists."""
+    return orjson.loads(data)
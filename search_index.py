@@ -0,0 +1,283 @@
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from near_duplicates import question_texts
+from result_model import from_json, to_json
+
+# Image references in question text: "/documents/<id>/images/<file>",
+# "/static/images/<dir>/<file>" or an "<img src='images/...'>" placeholder
+IMAGE_URL_PATTERN = re.compile(r"(?:<img src=')?\S*images/[^\s'\"<>]+(?:'>)?")
+
+SEARCH_WORD_PATTERN = re.compile(r"\w+")
+
+# bm25 weight of each indexed column, in table order: a hit in the question
+# text counts most, one in the topic name least
+COLUMN_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+# Words of a query beyond this many are ignored
+MAX_QUERY_WORDS = 32
+
+# The last word of a query is only matched as a prefix from this length on:
+# one or two letters would expand to a large part of the vocabulary
+MIN_PREFIX_LENGTH = 3
+
+# Scoring costs about a microsecond per match, so a query matching more
+# questions than this is ranked among its most recently indexed matches
+MAX_RANKED_MATCHES = 10000
+
+
+def searchable_text(text: str) -> str:
+    return IMAGE_URL_PATTERN.sub(" ", text)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a free-text query, or None if it has no words.
+
+    Every word must appear (in any indexed column); the last one is
+    matched as a prefix, so results follow the user while they type. Words
+    are quoted, so FTS5 operators and punctuation in the query are taken
+    literally instead of raising a syntax error.
+    """
+    words = SEARCH_WORD_PATTERN.findall(query)[:MAX_QUERY_WORDS]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Full-text index of every parsed question, stored in SQLite FTS5.
+
+    Each question is a row of ``search_questions`` (its document, topic and
+    JSON record) plus a row of the ``search_fts`` inverted index over its
+    text, options, explanation and topic name; triggers keep the two in
+    step. Indexing a whole document replaces the questions it had; rows are
+    keyed by (document, topic, question number), so indexing one range of
+    it at a time updates its questions in place. ``search_documents``
+    counts each document's questions, and once there are more than
+    ``max_questions`` in all, the least recently indexed documents are
+    dropped (0 = unbounded). Queries are ranked by
+    bm25 with the weights in COLUMN_WEIGHTS and only read the posting
+    lists of their words; with the scoring capped at MAX_RANKED_MATCHES,
+    answering stays in the milliseconds with a hundred thousand questions
+    indexed, whichever words are searched for.
+    """
+
+    def __init__(self, path: str, max_questions: int = 0):
+        self.path = path
+        self.max_questions = max_questions
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS search_questions (
+                    id INTEGER PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    question_number TEXT NOT NULL,
+                    question_text TEXT NOT NULL,
+                    options_text TEXT NOT NULL,
+                    explanation_text TEXT NOT NULL,
+                    topic_name TEXT NOT NULL,
+                    case_study TEXT NOT NULL,
+                    record BLOB NOT NULL,
+                    UNIQUE (document_id, topic, question_number)
+                );
+                CREATE TABLE IF NOT EXISTS search_documents (
+                    document_id TEXT PRIMARY KEY,
+                    questions INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS search_documents_indexed_at ON search_documents (indexed_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                    question_text, options_text, explanation_text, topic_name,
+                    content='search_questions', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS search_questions_insert AFTER INSERT ON search_questions BEGIN
+                    INSERT INTO search_fts (rowid, question_text, options_text, explanation_text, topic_name)
+                    VALUES (new.id, new.question_text, new.options_text, new.explanation_text, new.topic_name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS search_questions_delete AFTER DELETE ON search_questions BEGIN
+                    INSERT INTO search_fts (search_fts, rowid, question_text, options_text, explanation_text, topic_name)
+                    VALUES ('delete', old.id, old.question_text, old.options_text, old.explanation_text, old.topic_name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS search_questions_update AFTER UPDATE ON search_questions BEGIN
+                    INSERT INTO search_fts (search_fts, rowid, question_text, options_text, explanation_text, topic_name)
+                    VALUES ('delete', old.id, old.question_text, old.options_text, old.explanation_text, old.topic_name);
+                    INSERT INTO search_fts (rowid, question_text, options_text, explanation_text, topic_name)
+                    VALUES (new.id, new.question_text, new.options_text, new.explanation_text, new.topic_name);
+                END;
+                """
+            )
+
+    @classmethod
+    def from_env(cls) -> Optional["SearchIndex"]:
+        """
+        Build an index from the environment.
+
+        SEARCH_INDEX_PATH: SQLite file (default: unset, the index is disabled)
+        SEARCH_INDEX_MAX_QUESTIONS: questions kept before the least recently
+            indexed documents are dropped (default: 1000000, 0 = unbounded)
+        """
+        path = os.getenv("SEARCH_INDEX_PATH", "")
+        max_questions = int(os.getenv("SEARCH_INDEX_MAX_QUESTIONS", 1000000))
+        return cls(path, max_questions) if path else None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Posting lists are read straight from the mapped file instead of
+        # being copied through SQLite's page cache
+        conn.execute("PRAGMA mmap_size=268435456")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_topics(self, topics: Dict, document_id: str, filename: str, replace: bool = True) -> int:
+        """
+        Index (or re-index) the questions of a process_text result.
+
+        With ``replace`` the topics are the whole document and its questions
+        indexed before are dropped first; without it they are one part of
+        it (see pipeline.run_pipeline_range) and are added to the rest.
+
+        Returns:
+            Number of questions indexed
+        """
+        rows = []
+        for key, topic in topics.items():
+            for question in topic["questions"]:
+                texts = [searchable_text(text) for text in question_texts(question)]
+                rows.append((
+                    document_id, filename, key, question["question_number"],
+                    texts[0], "\n".join(texts[1:]), searchable_text(question.get("explanation", "")),
+                    topic.get("topic_name", ""), topic.get("case_study", ""), to_json(question),
+                ))
+        with self._connect() as conn:
+            if replace:
+                conn.execute("DELETE FROM search_questions WHERE document_id = ?", (document_id,))
+            conn.executemany(
+                """
+                INSERT INTO search_questions (
+                    document_id, filename, topic, question_number, question_text, options_text,
+                    explanation_text, topic_name, case_study, record
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (document_id, topic, question_number) DO UPDATE SET
+                    filename = excluded.filename,
+                    question_text = excluded.question_text,
+                    options_text = excluded.options_text,
+                    explanation_text = excluded.explanation_text,
+                    topic_name = excluded.topic_name,
+                    case_study = excluded.case_study,
+                    record = excluded.record
+                """,
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO search_documents (document_id, questions, indexed_at) "
+                "SELECT ?, COUNT(*), ? FROM search_questions WHERE document_id = ?",
+                (document_id, time.time(), document_id),
+            )
+            self._evict(conn)
+        return len(rows)
+
+    def has_document(self, document_id: str) -> bool:
+        """Whether ``document_id`` has questions in the index (it may have been evicted since)."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT 1 FROM search_documents WHERE document_id = ?", (document_id,)).fetchone() is not None
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if not self.max_questions:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(questions), 0) FROM search_documents").fetchone()[0]
+        if total <= self.max_questions:
+            return
+        for document_id, questions in conn.execute(
+                "SELECT document_id, questions FROM search_documents ORDER BY indexed_at").fetchall():
+            conn.execute("DELETE FROM search_questions WHERE document_id = ?", (document_id,))
+            conn.execute("DELETE FROM search_documents WHERE document_id = ?", (document_id,))
+            total -= questions
+            if total <= self.max_questions:
+                break
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, document_id: Optional[str] = None) -> Dict:
+        """
+        Questions matching every word of ``query``, best first.
+
+        Args:
+            query: Free text, see match_expression
+            limit, offset: The page of results to return
+            document_id: Only search the questions of this document
+
+        Returns:
+            {"total": number of matches, "results": [{"score", "document_id",
+            "filename", "topic", "topic_name", "case_study", "question"}]};
+            a higher score is a better match. Past MAX_RANKED_MATCHES
+            matches, only the most recently indexed ones are ranked, so
+            newer uploads win on broad queries.
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return {"total": 0, "results": []}
+
+        where = "search_fts MATCH ?"
+        params: List = [expression]
+        if document_id is not None:
+            where += " AND search_fts.rowid IN (SELECT id FROM search_questions WHERE document_id = ?)"
+            params.append(document_id)
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        window = max(MAX_RANKED_MATCHES, offset + limit)
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM search_fts WHERE {where}", params).fetchone()[0]
+            if total <= offset:
+                return {"total": total, "results": []}
+            if total > window:
+                # Walking the matches in rowid order is cheap, scoring them is not
+                oldest = conn.execute(
+                    f"SELECT rowid FROM search_fts WHERE {where} ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                    params + [window - 1],
+                ).fetchone()[0]
+                where += " AND search_fts.rowid >= ?"
+                params.append(oldest)
+            rows: List[Tuple] = conn.execute(
+                f"SELECT ranked.score, q.document_id, q.filename, q.topic, q.topic_name, q.case_study, q.record "
+                f"FROM (SELECT rowid AS id, bm25(search_fts, {weights}) AS score FROM search_fts "
+                f"      WHERE {where} ORDER BY score LIMIT ? OFFSET ?) AS ranked "
+                f"JOIN search_questions q ON q.id = ranked.id ORDER BY ranked.score",
+                params + [limit, offset],
+            ).fetchall()
+
+        return {
+            "total": total,
+            "results": [
+                {
+                    # bm25 is negative, more so for better matches
+                    "score": round(-score, 4),
+                    "document_id": document_id,
+                    "filename": filename,
+                    "topic": topic,
+                    "topic_name": topic_name,
+                    "case_study": case_study,
+                    "question": from_json(record),
+                }
+                for score, document_id, filename, topic, topic_name, case_study, record in rows
+            ],
+        }
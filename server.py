@@ -0,0 +1,121 @@
+"""
+Production server: several uvicorn workers under gunicorn.
+
+``main.start()`` uses this when SERVER_MODE=production. gunicorn imports
+the app once in the master (preload) and forks the workers from it, so
+PyMuPDF and the compiled parser patterns are loaded once and shared
+copy-on-write. Each worker is replaced after a number of requests, or as
+soon as its resident memory passes a limit, and every shutdown or
+replacement lets the requests in flight finish first.
+
+Settings (environment):
+
+- WEB_CONCURRENCY: worker processes (default: CPU count)
+- SERVER_MAX_REQUESTS: requests before a worker is replaced (default: 1000, 0 = never),
+  plus a random 0..SERVER_MAX_REQUESTS_JITTER (default: 10%) so workers do not restart together
+- SERVER_MAX_RSS_MB: resident memory above which a worker is replaced (default: 1024, 0 = never);
+  also the default PDF_WORKER_MAX_RSS_MB, so the PDF processes each worker
+  starts, where PyMuPDF does its work, are held to the same limit
+- SERVER_GRACEFUL_TIMEOUT: seconds in-flight requests get to finish on shutdown (default: 120)
+- SERVER_TIMEOUT: seconds a silent worker is left before it is killed (default: 60)
+"""
+import importlib
+import os
+import signal
+from typing import Dict
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from worker_pool import process_rss_mib
+
+MAX_RSS_MB = int(os.getenv("SERVER_MAX_RSS_MB", 1024))
+
+
+def preload() -> None:
+    """Import and warm up what every worker needs, before gunicorn forks them."""
+    # PyMuPDF itself comes with the app module, which load() imports next
+    from parse_pdf_into_json import LineTopicProcessor, TopicProcessor
+
+    # Instances compile their patterns; re keeps them cached for the workers
+    TopicProcessor()
+    LineTopicProcessor()
+
+
+class RecyclingUvicornWorker(UvicornWorker):
+    """
+    UvicornWorker that drains in-flight requests within the graceful
+    timeout and leaves once its RSS passes SERVER_MAX_RSS_MB.
+
+    The RSS check runs on gunicorn's heartbeat (every ``timeout / 2``
+    seconds). Leaving means SIGTERM to itself: uvicorn stops accepting,
+    finishes the requests in flight, and gunicorn starts a replacement.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Leave the lifespan shutdown (which waits for the PDF worker pool) time to run
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - 5, 1)
+        self._recycling = False
+        self._checked_rss = False
+
+    async def callback_notify(self) -> None:
+        self.notify()
+        if MAX_RSS_MB <= 0 or self._recycling:
+            return
+        rss = process_rss_mib()
+        if rss is None or rss <= MAX_RSS_MB:
+            self._checked_rss = True
+            return
+        self._recycling = True
+        if not self._checked_rss:
+            # Over the limit before serving anything: restarting would only loop
+            self.log.warning("SERVER_MAX_RSS_MB=%d is below a fresh worker's %.0f MiB RSS, ignoring it",
+                             MAX_RSS_MB, rss)
+            return
+        self.log.info("Worker %s at %.0f MiB RSS (limit %d MiB), restarting", self.pid, rss, MAX_RSS_MB)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+class ProductionServer(BaseApplication):
+    """gunicorn running ``app_path`` ("module:attribute") with the settings above."""
+
+    def __init__(self, app_path: str, options: Dict):
+        self.app_path = app_path
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        preload()
+        module_name, attribute = self.app_path.split(":")
+        return getattr(importlib.import_module(module_name), attribute)
+
+
+def server_options(port: int, workers: int) -> Dict:
+    max_requests = int(os.getenv("SERVER_MAX_REQUESTS", 1000))
+    return {
+        "bind": f"0.0.0.0:{port}",
+        "workers": workers,
+        "worker_class": "server.RecyclingUvicornWorker",
+        "preload_app": True,
+        "max_requests": max_requests,
+        "max_requests_jitter": int(os.getenv("SERVER_MAX_REQUESTS_JITTER", max_requests // 10)),
+        "graceful_timeout": int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 120)),
+        "timeout": int(os.getenv("SERVER_TIMEOUT", 60)),
+        "accesslog": "-",
+    }
+
+
+def run(app_path: str, port: int) -> None:
+    """Serve ``app_path`` with WEB_CONCURRENCY workers until gunicorn is stopped."""
+    cpus = os.cpu_count() or 1
+    workers = max(int(os.getenv("WEB_CONCURRENCY", cpus)), 1)
+    # Every worker has its own PDF process pool: split the cores between them
+    # unless PDF_WORKERS says otherwise (read when the app is imported, below)
+    os.environ.setdefault("PDF_WORKERS", str(max(cpus // workers, 1)))
+    os.environ.setdefault("PDF_WORKER_MAX_RSS_MB", str(MAX_RSS_MB))
+    ProductionServer(app_path, server_options(port, workers)).run()
@@ -0,0 +1,48 @@
+"""
+Near-duplicate matching of questions that refer to images.
+"""
+from remove_duplicate_question import make_duplicate_index, remove_duplicate_questions
+
+
+def exhibit_document(image_url: str) -> dict:
+    question = {
+        "question_number": "1",
+        "question": f"Refer to the exhibit.\n{image_url}\nWhich configuration change resolves the issue shown?",
+        "options": ["A. Enable the firewall rule", "B. Restart the service", "C. Add a route", "D. Renew the lease"],
+        "answer": ["C"],
+        "explanation": "",
+    }
+    return {"topics": {"topic1": {"topic_name": "", "case_study": "", "questions": [question]}}}
+
+
+def test_same_xref_in_another_document_is_another_image():
+    index = make_duplicate_index("similar")
+    duplicates = []
+    for document, document_id in (("first", "a" * 64), ("second", "b" * 64)):
+        remove_duplicate_questions(
+            exhibit_document(f"/documents/{document_id}/images/12"), duplicates=duplicates, index=index,
+            document=document)
+
+    assert duplicates == []
+
+
+def test_same_image_path_is_a_duplicate():
+    index = make_duplicate_index("similar")
+    duplicates = []
+    for document in ("first", "second"):
+        remove_duplicate_questions(
+            exhibit_document(f"/documents/{'a' * 64}/images/12"), duplicates=duplicates, index=index,
+            document=document)
+
+    assert [(duplicate["matched_document"], duplicate["similarity"]) for duplicate in duplicates] == [("first", 1.0)]
+
+
+def test_full_mode_images_of_other_pdfs_differ():
+    index = make_duplicate_index("similar")
+    duplicates = []
+    for document in ("first", "second"):
+        remove_duplicate_questions(
+            exhibit_document(f"/static/images/{document}/page_3_img_1.png"), duplicates=duplicates, index=index,
+            document=document)
+
+    assert duplicates == []
@@ -0,0 +1,60 @@
+"""
+The regex and linear parser engines against test_json.json and each other.
+"""
+import copy
+import json
+import re
+
+import pytest
+
+from benchmarks.bench_parser import FIXTURE, render_dump_text
+from benchmarks.synthetic_pdf import build_exam_lines
+from parse_pdf_into_json import LineTopicProcessor, TopicProcessor
+from result_model import from_json, to_json
+
+# A bare "B." line, which the regex engine glues to the option before it
+BARE_OPTION_LETTER = re.compile(r"\n(?=[A-G]\.\n)")
+
+
+@pytest.fixture(scope="module")
+def fixture_topics() -> dict:
+    with open(FIXTURE, encoding="utf-8") as f:
+        return json.load(f)["topics"]
+
+
+def parse(processor: TopicProcessor, text: str) -> dict:
+    # Through the serializer, as the API returns it: plain dicts and lists
+    return from_json(to_json(processor.process_text(text)))
+
+
+def test_regex_engine_reproduces_the_fixture(fixture_topics):
+    assert parse(TopicProcessor(), render_dump_text(fixture_topics)) == fixture_topics
+
+
+def test_linear_engine_reproduces_the_fixture(fixture_topics):
+    # Apart from the documented difference (see LineTopicProcessor): a bare
+    # "B." line starts option B instead of continuing the option before it
+    expected = copy.deepcopy(fixture_topics)
+    split = 0
+    for topic in expected.values():
+        for question in topic["questions"]:
+            options = [re.sub(r"^([A-G])\.\n", r"\1. ", part)
+                       for option in question["options"] for part in BARE_OPTION_LETTER.split(option)]
+            split += len(options) != len(question["options"])
+            question["options"] = options
+
+    assert split
+    assert parse(LineTopicProcessor(), render_dump_text(fixture_topics)) == expected
+
+
+@pytest.mark.parametrize("dump", [
+    {"questions": 300, "topics": 3},
+    {"questions": 500, "topics": 5, "case_studies": 3},
+    {"questions": 60, "topics": 1, "options": 7, "seed": 3},
+])
+def test_engines_agree_on_well_formed_dumps(dump):
+    text = "\n".join(build_exam_lines(**dump))
+    regex, linear = parse(TopicProcessor(), text), parse(LineTopicProcessor(), text)
+
+    assert sum(len(topic["questions"]) for topic in regex.values()) == dump["questions"]
+    assert linear == regex
@@ -0,0 +1,74 @@
+"""
+Paging a document through run_pipeline_range with next_cursor.
+"""
+import pytest
+
+import pipeline
+from benchmarks.synthetic_pdf import generate_exam_pdf
+
+DOCUMENT_ID = "c" * 64
+
+
+@pytest.fixture(scope="module")
+def dump(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("dump") / "dump.pdf")
+    generate_exam_pdf(path, questions=120, topics=4, case_studies=2, images_every=3)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def no_stores(monkeypatch):
+    monkeypatch.setattr(pipeline, "QUESTION_BANK", None)
+    monkeypatch.setattr(pipeline, "SEARCH_INDEX", None)
+
+
+def questions(topics: dict) -> list:
+    return [
+        (key, topic["topic_name"], topic["case_study"], question)
+        for key, topic in topics.items()
+        for question in topic["questions"]
+    ]
+
+
+@pytest.mark.parametrize("max_questions", [1, 7, 50])
+def test_ranges_return_every_question_once_in_order(dump, tmp_path, max_questions):
+    expected = {}
+    for event in pipeline.iter_pipeline(dump, str(tmp_path), "dump", DOCUMENT_ID, images="none"):
+        if event["type"] == "topic":
+            expected[event["topic"]] = {
+                "topic_name": event["topic_name"], "case_study": event["case_study"], "questions": []}
+        elif event["type"] == "question":
+            expected[event["topic"]]["questions"].append(event["question"])
+
+    paged, ranges, cursor, end = [], 0, None, 0
+    while True:
+        payload = pipeline.run_pipeline_range(
+            dump, str(tmp_path), "dump", max_questions=max_questions, cursor=cursor, document_id=DOCUMENT_ID,
+            images="none")
+        ranges += 1
+        page_questions = questions(payload["result"]["topics"])
+        assert payload["pages"]["start"] >= end
+        end = payload["pages"]["end"]
+        if payload["next_cursor"] is None:
+            assert len(page_questions) <= max_questions
+            break
+        assert len(page_questions) == max_questions
+        paged.extend(page_questions)
+        cursor = pipeline.decode_cursor(payload["next_cursor"], DOCUMENT_ID)
+    paged.extend(page_questions)
+
+    assert end == payload["pages"]["total"]
+    assert len(paged) == 120
+    assert paged == questions(expected)
+    assert ranges == -(-120 // max_questions)
+
+
+def test_cursor_past_the_last_page_is_rejected(dump, tmp_path):
+    first = pipeline.run_pipeline_range(dump, str(tmp_path), "dump", max_questions=5, document_id=DOCUMENT_ID,
+                                        images="none")
+    cursor = pipeline.decode_cursor(first["next_cursor"], DOCUMENT_ID)
+    cursor["page"] = first["pages"]["total"]
+
+    with pytest.raises(pipeline.InvalidRangeError):
+        pipeline.run_pipeline_range(dump, str(tmp_path), "dump", cursor=cursor, document_id=DOCUMENT_ID,
+                                    images="none")
@@ -0,0 +1,77 @@
+"""
+Known-question detection across documents processed with images="refs".
+"""
+import fitz
+import pytest
+
+import pipeline
+from benchmarks.synthetic_pdf import generate_exam_pdf
+from near_duplicates import question_images
+from question_bank import QuestionBank
+
+
+@pytest.fixture
+def question_bank(tmp_path, monkeypatch):
+    bank = QuestionBank(str(tmp_path / "questions.sqlite3"))
+    monkeypatch.setattr(pipeline, "QUESTION_BANK", bank)
+    monkeypatch.setattr(pipeline, "SEARCH_INDEX", None)
+    return bank
+
+
+def reissued(source: str, path: str) -> None:
+    """Save the PDF at ``source`` behind a blank first page: same questions and images, other xrefs."""
+    with fitz.open(source) as original, fitz.open() as doc:
+        doc.new_page()
+        doc.insert_pdf(original)
+        doc.save(path, deflate=True)
+
+
+def image_xrefs(path: str) -> set:
+    with fitz.open(path) as doc:
+        return {image[0] for page in doc for image in page.get_images()}
+
+
+def question_ids(payload: dict) -> list:
+    return [
+        question["question_id"]
+        for topic in payload["result"]["topics"].values()
+        for question in topic["questions"]
+    ]
+
+
+def test_refs_questions_are_known_in_another_document(tmp_path, question_bank):
+    first, second = str(tmp_path / "first.pdf"), str(tmp_path / "second.pdf")
+    generate_exam_pdf(first, questions=30, images_every=1)
+    reissued(first, second)
+    assert image_xrefs(first).isdisjoint(image_xrefs(second))
+
+    runs = [
+        pipeline.run_pipeline(path, str(tmp_path / "images"), name, document_id=document_id, images="refs")
+        for path, name, document_id in ((first, "first", "a" * 32), (second, "second", "b" * 32))
+    ]
+
+    assert all(run["image_refs"] for run in runs)
+    assert runs[0]["question_bank"]["known"] == 0
+    assert runs[1]["question_bank"] == {"new": 0, "known": 30, "dropped": 0}
+    assert question_ids(runs[0]) == question_ids(runs[1])
+
+
+def test_refs_image_changes_the_question_id(tmp_path, question_bank):
+    first, second = str(tmp_path / "first.pdf"), str(tmp_path / "second.pdf")
+    generate_exam_pdf(first, questions=30, images_every=1)
+    generate_exam_pdf(second, questions=30, images_every=1, image_size=48)
+
+    runs = [
+        pipeline.run_pipeline(path, str(tmp_path / "images"), name, document_id=document_id, images="refs")
+        for path, name, document_id in ((first, "first", "a" * 32), (second, "second", "b" * 32))
+    ]
+
+    with_images = [
+        index for index, question in enumerate(
+            question for topic in runs[0]["result"]["topics"].values() for question in topic["questions"])
+        if question_images(question)
+    ]
+    assert with_images
+    ids = [question_ids(run) for run in runs]
+    assert all(ids[0][index] != ids[1][index] for index in with_images)
+    assert runs[1]["question_bank"]["known"] == 30 - len(with_images)
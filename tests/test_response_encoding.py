@@ -0,0 +1,37 @@
+"""
+Result ETags follow the content coding a response actually goes out with.
+"""
+import asyncio
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from response_encoding import COMPRESS_MIN_BYTES, encode_response, matching_result_etag, result_etag
+
+
+def encoded(body: bytes, encoding) -> Response:
+    return asyncio.run(encode_response(Response(content=body), encoding, "key"))
+
+
+def revalidation(etag: str) -> Request:
+    return Request({"type": "http", "headers": [(b"if-none-match", etag.encode())]})
+
+
+def test_small_bodies_keep_the_identity_etag():
+    response = encoded(b"{}", "zstd")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == result_etag("key", None)
+    assert response.headers["etag"] == encoded(b"{}", None).headers["etag"]
+
+
+def test_compressed_bodies_carry_their_coding_in_the_etag():
+    response = encoded(b"x" * COMPRESS_MIN_BYTES, "zstd")
+    assert response.headers["content-encoding"] == "zstd"
+    assert response.headers["etag"] == result_etag("key", "zstd")
+
+
+def test_revalidation_accepts_the_etag_actually_sent():
+    for body in (b"{}", b"x" * COMPRESS_MIN_BYTES):
+        etag = encoded(body, "gzip").headers["etag"]
+        assert matching_result_etag(revalidation(etag), "key", "gzip") == etag
+    assert matching_result_etag(revalidation(result_etag("key", "zstd")), "key", "gzip") is None
@@ -0,0 +1,53 @@
+"""
+Re-indexing and retention of the search index.
+"""
+import pipeline
+from search_index import SearchIndex
+
+
+def document(*questions: str) -> dict:
+    return {"topic1": {"topic_name": "Networking", "case_study": "", "questions": [
+        {"question_number": str(number), "question": text, "options": ["A. yes", "B. no"], "answer": ["A"],
+         "explanation": ""}
+        for number, text in enumerate(questions, start=1)
+    ]}}
+
+
+def test_reindexing_a_document_replaces_its_questions(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    index.add_topics(document("Which subnet mask?", "Which gateway?"), "doc", "dump")
+    index.add_topics(document("Which subnet prefix?"), "doc", "dump")
+
+    assert index.search("gateway")["total"] == 0
+    assert [result["question"]["question"] for result in index.search("subnet")["results"]] == ["Which subnet prefix?"]
+
+
+def test_ranges_add_to_the_document(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    index.add_topics(document("Which subnet mask?"), "doc", "dump", replace=False)
+    index.add_topics({"topic2": document("Which subnet gateway?")["topic1"]}, "doc", "dump", replace=False)
+
+    assert index.search("subnet")["total"] == 2
+
+
+def test_least_recently_indexed_documents_are_dropped(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"), max_questions=3)
+    index.add_topics(document("Which subnet mask?", "Which subnet gateway?"), "old", "dump")
+    index.add_topics(document("Which subnet prefix?"), "middle", "dump")
+    index.add_topics(document("Which subnet route?"), "new", "dump")
+
+    found = index.search("subnet")
+    assert found["total"] == 2
+    assert {result["document_id"] for result in found["results"]} == {"middle", "new"}
+
+
+def test_cached_results_are_indexed_once(tmp_path, monkeypatch):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    monkeypatch.setattr(pipeline, "SEARCH_INDEX", index)
+
+    pipeline.index_cached_questions(document("Which subnet mask?"), "doc", "dump")
+    assert index.has_document("doc")
+    # Already indexed: a cached result does not overwrite what is there
+    pipeline.index_cached_questions(document("Which gateway?"), "doc", "dump")
+    assert index.search("subnet")["total"] == 1
+    assert index.search("gateway")["total"] == 0
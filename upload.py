@@ -0,0 +1,220 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from typing import BinaryIO, List, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+# Reject request bodies larger than this while they are still streaming in
+MAX_UPLOAD_BYTES = int(os.getenv("PDF_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+# PDFs up to this size are handed to PyMuPDF as an in-memory stream;
+# larger ones are spooled to a temporary file first
+IN_MEMORY_MAX_BYTES = int(os.getenv("PDF_IN_MEMORY_MAX_BYTES", 64 * 1024 * 1024))
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def upload_too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum upload size is {limit} bytes"
+    )
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware enforcing a hard request body limit.
+
+    Requests announcing a larger Content-Length are rejected before any of
+    the body is read; bodies without (or lying about) a Content-Length are
+    counted as they stream in and aborted as soon as they cross the limit,
+    so multipart parsing never buffers an oversized upload.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise upload_too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send) -> None:
+        body = f'{{"detail":"File too large. Maximum upload size is {self.max_bytes} bytes"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class SpooledPDF:
+    """
+    An uploaded PDF kept in memory, or on disk once it outgrows ``in_memory_max``.
+
+    The SHA-256 of the content is computed while the bytes are copied, so
+    callers get the cache key without a second read.
+    """
+
+    def __init__(self, filename: str, in_memory_max: int = IN_MEMORY_MAX_BYTES):
+        self.filename = filename
+        self.in_memory_max = in_memory_max
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._chunks: List[bytes] = []
+        self._temp_dir: Optional[str] = None
+        self._file = None
+        self.path: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self.in_memory_max:
+            # Switch to disk: flush what we buffered so far
+            self._temp_dir = tempfile.mkdtemp()
+            self.path = os.path.join(self._temp_dir, os.path.basename(self.filename))
+            self._file = open(self.path, "wb")
+            for buffered in self._chunks:
+                self._file.write(buffered)
+            self._chunks = []
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def content_hash(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def source(self) -> Union[str, bytes]:
+        """The PDF as bytes (in memory) or as a file path (spooled to disk)."""
+        if self.path is not None:
+            return self.path
+        if len(self._chunks) != 1:
+            self._chunks = [b"".join(self._chunks)]
+        return self._chunks[0]
+
+    def save_to(self, path: str) -> None:
+        """Persist the PDF at ``path`` (moving the spooled file when there is one)."""
+        if self.path is not None:
+            shutil.move(self.path, path)
+            self.path = path
+            return
+        with open(path, "wb") as f:
+            for chunk in self._chunks:
+                f.write(chunk)
+
+    def cleanup(self) -> None:
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+        self._chunks = []
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    in_memory_max: int = IN_MEMORY_MAX_BYTES
+) -> SpooledPDF:
+    """
+    Read an UploadFile in chunks into a SpooledPDF, enforcing ``max_bytes``.
+
+    Raises:
+        HTTPException: 413 if the file exceeds ``max_bytes``
+    """
+    spooled = SpooledPDF(file.filename, in_memory_max)
+    try:
+        while True:
+            chunk = await file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if max_bytes > 0 and spooled.size + len(chunk) > max_bytes:
+                raise upload_too_large(max_bytes)
+            spooled.write(chunk)
+        spooled.finish()
+    except BaseException:
+        spooled.cleanup()
+        raise
+    return spooled
+
+
+def spool_zip_pdfs(
+    archive: BinaryIO,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    in_memory_max: int = IN_MEMORY_MAX_BYTES
+) -> List[SpooledPDF]:
+    """
+    Spool every PDF inside a ZIP archive, in archive order.
+
+    Entries are named by their base name; folders, macOS resource forks and
+    non-PDF files are skipped. The extracted PDFs together may not exceed
+    ``max_bytes`` (counted while decompressing, so a ZIP bomb is cut off
+    early rather than trusted by its declared sizes).
+
+    Raises:
+        HTTPException: 400 if the archive is not a valid ZIP, 413 if the
+            extracted PDFs are too large
+    """
+    spooled_pdfs: List[SpooledPDF] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive) as entries:
+            for info in entries.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith("__MACOSX/") \
+                        or not name.lower().endswith(".pdf"):
+                    continue
+                spooled = SpooledPDF(name, in_memory_max)
+                spooled_pdfs.append(spooled)
+                with entries.open(info) as entry:
+                    while True:
+                        chunk = entry.read(READ_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        total += len(chunk)
+                        if max_bytes > 0 and total > max_bytes:
+                            raise upload_too_large(max_bytes)
+                        spooled.write(chunk)
+                spooled.finish()
+    except BaseException as e:
+        for spooled in spooled_pdfs:
+            spooled.cleanup()
+        # Corrupt, truncated, encrypted or unsupported archives
+        if isinstance(e, (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError)):
+            raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {e}")
+        raise
+    return spooled_pdfs
@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+def process_rss_mib(pid: Union[int, str] = "self") -> Optional[float]:
+    """Resident memory of process ``pid``, or None where /proc is not available (or it has exited)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class WorkerPool:
+    """
+    Runs CPU-bound callables off the event loop with a bounded backlog.
+
+    With ``max_workers > 0`` jobs run in a process pool so PyMuPDF extraction
+    and regex parsing scale across cores. With ``max_workers == 0`` jobs run
+    in Starlette's thread pool instead (useful for debugging and tiny
+    containers). In both modes at most ``max_workers + max_queue`` jobs are
+    accepted at once; anything beyond that raises PoolSaturatedError, unless
+    the caller asks to wait for a free slot instead.
+
+    With ``max_tasks``, the worker processes are replaced by fresh ones
+    after that many jobs, which returns whatever memory PyMuPDF held on to.
+    With ``max_rss_mb`` they are also replaced as soon as one of them has
+    grown past that resident size (checked as each job is handed out).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, max_tasks: int = 0, max_rss_mb: int = 0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self._executor_tasks = 0
+        self.capacity = max(max_workers, 1) + max_queue
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slot_freed: Optional[asyncio.Condition] = None
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        """
+        Build a pool from the environment.
+
+        PDF_WORKERS: number of worker processes (default: CPU count, 0 = thread mode)
+        PDF_MAX_QUEUE: jobs allowed to wait for a free worker (default: 2 * workers)
+        PDF_WORKER_MAX_TASKS: jobs after which the worker processes are replaced (default: 0 = never)
+        PDF_WORKER_MAX_RSS_MB: resident memory of a worker process above which
+            they are replaced (default: 0 = never)
+        """
+        max_workers = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+        max_queue = int(os.getenv("PDF_MAX_QUEUE", 2 * max(max_workers, 1)))
+        max_tasks = int(os.getenv("PDF_WORKER_MAX_TASKS", 0))
+        max_rss_mb = int(os.getenv("PDF_WORKER_MAX_RSS_MB", 0))
+        return cls(max_workers=max_workers, max_queue=max_queue, max_tasks=max_tasks, max_rss_mb=max_rss_mb)
+
+    def _over_rss_limit(self) -> bool:
+        if not self.max_rss_mb or self._executor is None:
+            return False
+        # ProcessPoolExecutor has no public list of its processes
+        for pid in list(getattr(self._executor, "_processes", None) or ()):
+            rss = process_rss_mib(pid)
+            if rss is not None and rss > self.max_rss_mb:
+                return True
+        return False
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is not None and (
+                (self.max_tasks and self._executor_tasks >= self.max_tasks) or self._over_rss_limit()):
+            # The old processes finish the jobs they have and exit; new jobs
+            # go to fresh ones
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        # Created lazily so importing the app never forks/spawns anything
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._executor_tasks = 0
+        self._executor_tasks += 1
+        return self._executor
+
+    def check_capacity(self) -> None:
+        """Raise PoolSaturatedError if no job could be accepted right now."""
+        if self.in_flight >= self.capacity:
+            raise PoolSaturatedError(
+                f"All {self.capacity} processing slots are busy")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, wait: bool = False) -> Any:
+        """
+        Run ``fn(*args)`` off the event loop.
+
+        Raises PoolSaturatedError when no slot is free, or with ``wait=True``
+        waits until one is (used by background jobs, which have no client
+        to send a 503 to).
+        """
+        if wait:
+            if self._slot_freed is None:
+                self._slot_freed = asyncio.Condition()
+            async with self._slot_freed:
+                await self._slot_freed.wait_for(lambda: self.in_flight < self.capacity)
+        self.check_capacity()
+        self.in_flight += 1
+        try:
+            if self.max_workers == 0:
+                return await run_in_threadpool(fn, *args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            if self._slot_freed is not None:
+                async with self._slot_freed:
+                    self._slot_freed.notify()
+
+    async def iterate(self, fn: Callable[..., Iterator[Any]], *args: Any) -> AsyncIterator[Any]:
+        """
+        Drive the generator ``fn(*args)`` from a thread, holding a slot until it ends.
+
+        Generators cannot be handed to a worker process, so streaming work
+        always runs in the thread pool, but it still counts against the
+        pool's capacity. Raises PoolSaturatedError when no slot is free.
+        """
+        self.check_capacity()
+        self.in_flight += 1
+        iterator = fn(*args)
+        try:
+            async for item in iterate_in_threadpool(iterator):
+                yield item
+        finally:
+            # Release file handles early when the consumer stops (client gone)
+            with suppress(ValueError):
+                iterator.close()
+            self.in_flight -= 1
+            if self._slot_freed is not None:
+                async with self._slot_freed:
+                    self._slot_freed.notify()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, waiting for running jobs to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None